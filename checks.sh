@@ -47,12 +47,15 @@ tooldir=Tools/LT            # Python scripts and private dictionaries
 txtdir=../Tex2txt           # directory for extraction of raw text 
                             # (subdirectories will be created if necessary)
 ext=txt                     # file name extension for raw text
+                            # (fixed by batch mode of tex2txt.py)
 num=lin                     # ... for line number information
 chr=chr                     # ... for character position information
 foreign=en                  # ... for foreign-language text
 ori=ori                     # ... for original dictionary files in LT tree
 
 #   Tex2txt script
+#   - faster for many files: client of running conversion daemon
+#     tex2txt_py=$tooldir/t2t_daemon.py
 #
 tex2txt_py=$tooldir/tex2txt.py
 tex2txt_repl="--repl $tooldir/repls.txt"
@@ -179,97 +182,25 @@ then
     cat $priv_prohib_native >> $lt_prohib_native
 fi
 
-#   Python3:
 #   add original line numbers to messages
 #   - argv[1]:  RE search pattern;
 #               first () group must contain the number;
 #               text till second () group is removed
-#   - argv[2]: file with original line numbers
+#   - argv[2]:  extension of file with original line numbers
+#   - argv[3]:  LaTeX file
 #
-repl_lines='
-import re, sys
-expr = sys.argv[1]
-numbers = open(sys.argv[2]).readlines()
-def repl(m):
-    lin = int(m.group(1)) - 1
-    if lin >= 0 and lin < len(numbers):
-        n = numbers[lin].strip()
-        return (m.string[m.start(0):m.end(1)] + " [" + n + "]"
-                    + m.string[m.end(2):m.end(0)])
-    return m.group(0)
-for lin in sys.stdin:
-    sys.stdout.write(re.sub(expr, repl, lin))
-'
+repl_lines() {
+    python3 $tex2txt_py --translate "$1" --outdir $txtdir --nums $2 $3
+}
 
-#
-#   Python3:
 #   replace line and column numbers
-#   - argv[1]: regular expression:
-#              matching group 1 is line number, group 2 is column number
-#   - argv[2]: original LaTeX file
-#   - argv[3]: derived file with plain text
-#   - argv[4]: file with character offset mapping
+#   - argv[1]:  RE search pattern:
+#               group 1 is line number, group 2 is column number
+#   - argv[2]:  LaTeX file
 #
-repl_lines_columns='
-
-import re, sys
-
-expr = sys.argv[1]
-tex = open(sys.argv[2]).read()
-plain = open(sys.argv[3]).read()
-def f(s):
-    s = s.strip()
-    if s[-1] == "+":
-        return -int(s[:-1])
-    return int(s)
-map = list(f(s) for s in open(sys.argv[4]))
-starts = list(m.start(0) for m in re.finditer(r"\n", "\n" + plain))
-
-def f(m):
-    def ret(s1, s2):
-        s = m.group(0)
-        return (s[:m.start(1)] + "[" + s1 + "]" + s[m.end(1):m.start(2)]
-                    + "[" + s2 + "]" + s[m.end(2):])
-    def unkn():
-        return ret("?", "?")
-
-    lin = int(m.group(1))
-    col = int(m.group(2))
-    if lin < 1 or col < 1:
-        return unkn()
-
-    # find start of line number lin in plain file
-    if lin > len(starts):
-        return unkn()
-    n = starts[lin - 1]
-
-    # add column number col
-    s = plain[n:]
-    i = s.find("\n")
-    if i >= 0 and col > i or i < 0 and col > len(s):
-        return unkn()
-    n += col - 1
-
-    # map to character position in tex file
-    if n >= len(map):
-        return unkn()
-    n = map[n]
-    mark = ""
-    if n < 0:
-        mark = "+"
-        n = -n
-
-    # get line and column in tex file
-    if n > len(tex):
-        return unkn()
-    s = tex[:n]
-    lin = s.count("\n") + 1
-    col = len(s) - (s.rfind("\n") + 1)
-    return ret(str(lin) + mark, str(col) + mark)
-
-for s in sys.stdin:
-    sys.stdout.write(re.sub(expr, f, s))
-'
+repl_lines_columns() {
+    python3 $tex2txt_py --translate "$1" --char --outdir $txtdir --nums $chr $2
+}
 
 #   Python3:
 #   - scan given files for inclusion macros
@@ -349,14 +280,20 @@ do
     # extract raw text, save line numbers / character positions
     #####################################################
 
-    python3 $tex2txt_py \
-        $tex2txt_repl $tex2txt_defs --nums $txtdir/$i.$num $i \
-        > $txtdir/$i.$ext
+    #   a single run of tex2txt.py writes text, line numbers,
+    #   character positions, and foreign-language text with line numbers;
+    #   option --repl is not applied to the foreign-language text
+    #
+    char_nums=
     if [ -n "${options[--columns]}" ]
     then
-        python3 $tex2txt_py \
-            $tex2txt_repl $tex2txt_defs --char --nums $txtdir/$i.$chr $i \
-            > /dev/null
+        char_nums="--char-nums $chr"
+    fi
+    if ! python3 $tex2txt_py \
+        $tex2txt_repl $tex2txt_defs --outdir $txtdir --nums $num $char_nums \
+        --extr-out $foreign_macro:$foreign $i
+    then
+        exit 1
     fi
 
     #####################################################
@@ -400,9 +337,7 @@ do
     #   check foreign-language text with hunspell
     #####################################################
 
-    errs_foreign=$(python3 $tex2txt_py $tex2txt_defs \
-        --extr $foreign_macro --nums $txtdir/$i.$foreign.$num $i \
-        | grep -n '^' \
+    errs_foreign=$(grep -n '^' $txtdir/$i.$foreign.$ext \
         | hunspell -L -d $hunsp_foreign_lang -p $priv_dic_foreign)
 
     #####################################################
@@ -425,7 +360,7 @@ do
         echo 'Single letters'
         echo '=============='
         echo "$single_letters" \
-            | python3 -c "$repl_lines" '^(\d+)():' $txtdir/$i.$num
+            | repl_lines '^(\d+)():' $num $i
         echo
     fi
     if [ -n "$errs_foreign" ]
@@ -434,7 +369,7 @@ do
         echo 'Errors in foreign-language text'
         echo '==============================='
         echo "$errs_foreign" \
-            | python3 -c "$repl_lines" '^(\d+)():' $txtdir/$i.$foreign.$num
+            | repl_lines '^(\d+)():' $foreign.$num $i
         echo
     fi
     if [[ "$LT_output_lines" > 1 ]]
@@ -442,11 +377,10 @@ do
         if [ -z "${options[--columns]}" ]
         then
             echo "$LT_output" \
-                | python3 -c "$repl_lines" "$LT_info_line" $txtdir/$i.$num
+                | repl_lines "$LT_info_line" $num $i
         else
             echo "$LT_output" \
-                | python3 -c "$repl_lines_columns" "$LT_info_line" \
-                        $i $txtdir/$i.txt $txtdir/$i.$chr
+                | repl_lines_columns "$LT_info_line" $i
         fi
         echo
     fi
@@ -458,7 +392,7 @@ do
         grep -n '^' $txtdir/$i.$ext \
             | sed -E $repls_hunspell \
             | hunspell -L -p $priv_dic_native \
-            | python3 -c "$repl_lines" '^(\d+)():' $txtdir/$i.$num
+            | repl_lines '^(\d+)():' $num $i
         echo
         echo '============='
         echo 'Unknown words'
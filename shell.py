@@ -57,6 +57,7 @@ default_option_language = 'en-GB'
 default_option_encoding = 'utf-8'
 default_option_disable = 'WHITESPACE_RULE'
 default_option_context = 2
+default_option_jobs = 1
 
 # option --include: inclusion macros
 #
@@ -120,6 +121,8 @@ import urllib.parse
 import urllib.request
 import time
 import signal
+import threading
+import concurrent.futures
 
 # parse command line
 #
@@ -128,7 +131,10 @@ parser.add_argument('--html', action='store_true')
 parser.add_argument('--link', action='store_true')
 parser.add_argument('--context', type=int)
 parser.add_argument('--include', action='store_true')
+parser.add_argument('--project', action='store_true')
 parser.add_argument('--skip')
+parser.add_argument('--include-cache')
+parser.add_argument('--include-deps')
 parser.add_argument('--plain', action='store_true')
 parser.add_argument('--list-unknown', action='store_true')
 parser.add_argument('--language')
@@ -144,6 +150,7 @@ parser.add_argument('--equation-punctuation')
 parser.add_argument('--server')
 parser.add_argument('--lt-server-options')
 parser.add_argument('--textgears')
+parser.add_argument('--jobs', type=int)
 parser.add_argument('file', nargs='+')
 
 try:
@@ -166,13 +173,22 @@ if cmdline.disable is None:
     cmdline.disable = default_option_disable
 if cmdline.context is None:
     cmdline.context = default_option_context
+if cmdline.jobs is None:
+    cmdline.jobs = default_option_jobs
+if cmdline.jobs < 1:
+    tex2txt.fatal('argument of --jobs has to be a positive number')
 if cmdline.context < 0:
     # huge context: display whole text
     cmdline.context = int(1e8)
 if cmdline.server is not None and cmdline.server not in ('lt', 'my', 'stop'):
     tex2txt.fatal('mode for --server has to be one of lt, my, stop')
-if cmdline.plain and (cmdline.include or cmdline.replace):
-    tex2txt.fatal('cannot handle --plain together with --include or --replace')
+if cmdline.plain and (cmdline.include or cmdline.replace or cmdline.project):
+    tex2txt.fatal('cannot handle --plain together with --include, --replace,'
+                    + ' or --project')
+if cmdline.include and cmdline.project:
+    tex2txt.fatal('cannot handle --include together with --project')
+if (cmdline.include_cache or cmdline.include_deps) and not cmdline.include:
+    tex2txt.fatal('--include-cache and --include-deps need --include')
 if cmdline.single_letters and cmdline.single_letters.endswith('||'):
     cmdline.single_letters += equation_replacements
 if cmdline.replace:
@@ -215,42 +231,34 @@ ltcommand += ['-']
 if cmdline.lt_server_options:
     ltserver_local_cmd += ' ' + cmdline.lt_server_options[1:]
 
-# on option --include: add included files to work list
+# on option --include: add included files to work list,
+# see LAB:INCLUSIONS in tex2txt.py; the file contents read are
+# passed to run_proofreader()
 # otherwise: remove duplicates
 #
-if cmdline.include:
-    sys.stderr.write('=== checking for file inclusions ... ')
-    sys.stderr.flush()
-    opts = tex2txt.Options(extr=inclusion_macros, repl=cmdline.replace,
-                            defs=cmdline.define, lang=cmdline.t2t_lang)
-
 def skip_file(fn):
     # does file name match regex from option --skip?
     return cmdline.skip and re.search(r'\A' + cmdline.skip + r'\Z', fn)
 
-todo = cmdline.file
-done = []
-while todo:
-    f = todo.pop(0)
-    if f in done or skip_file(f):
-        continue
-    done.append(f)
-    if not cmdline.include:
-        continue
-    fp = tex2txt.myopen(f, encoding=cmdline.encoding)
-    tex = fp.read()
-    fp.close()
-    (plain, _) = tex2txt.tex2txt(tex, opts)
-    for f in plain.split():
-        if not f.endswith('.tex'):
-            f += '.tex'
-        if f not in done + todo and not skip_file(f):
-            todo.append(f)
-
-cmdline.file = done
+texts = {}
 if cmdline.include:
+    sys.stderr.write('=== checking for file inclusions ... ')
+    sys.stderr.flush()
+    graph = tex2txt.inclusion_graph(cmdline.file, cmdline.encoding,
+                                    skip=skip_file,
+                                    cache=cmdline.include_cache,
+                                    macros=inclusion_macros.split(','))
+    cmdline.file = graph.files
+    texts = graph.texts
     sys.stderr.write(', '.join(cmdline.file) + '\n')
     sys.stderr.flush()
+    if cmdline.include_deps:
+        f = tex2txt.myopen(cmdline.include_deps, encoding='utf-8', mode='w')
+        tex2txt.write_dependencies(graph, f)
+        f.close()
+else:
+    cmdline.file = [f for (i, f) in enumerate(cmdline.file)
+                        if f not in cmdline.file[:i] and not skip_file(f)]
 
 # prepare options for tex2txt()
 #
@@ -278,21 +286,27 @@ def json_get(dic, item, typ):
 #   - read file
 #   - extract plain text
 #   - call proofreading program
+#   - argument tex: LaTeX text, if already read
+#   - on option --jobs: runs in several threads at the same time,
+#     but tex2txt() must only run once at each point in time
 #
-def run_proofreader(file):
+tex2txt_lock = threading.Lock()
+def run_proofreader(file, tex=None):
 
     sys.stderr.write('=== ' + file + '\n')
     sys.stderr.flush()
-    f = tex2txt.myopen(file, encoding=cmdline.encoding)
-    tex = f.read()
-    f.close()
+    if tex is None:
+        f = tex2txt.myopen(file, encoding=cmdline.encoding)
+        tex = f.read()
+        f.close()
     if not tex.endswith('\n'):
         tex += '\n'
 
     if cmdline.plain:
         (plain, charmap) = (tex, list(range(1, len(tex) + 1)))
     else:
-        (plain, charmap) = tex2txt.tex2txt(tex, options)
+        with tex2txt_lock:
+            (plain, charmap) = tex2txt.tex2txt(tex, options)
         if cmdline.list_unknown:
             # only look for unknown macros and environemnts
             return (tex, plain, charmap, [])
@@ -321,6 +335,54 @@ def run_proofreader(file):
 
     return (tex, plain, charmap, matches)
 
+#   return list of (tex, plain, charmap, matches, file) for reports
+#   - on option --project: check given file with all included files
+#     in one run (see LAB:PROJECT in tex2txt.py), and split the result
+#     into parts for the single files
+#
+def run_proofreader_parts(file):
+    if not cmdline.project:
+        return [run_proofreader(file, texts.pop(file, None)) + (file,)]
+    project = tex2txt.read_project(file, encoding=cmdline.encoding,
+                                        skip=skip_file)
+    (tex, plain, charmap, matches) = run_proofreader(file, project.tex)
+    if cmdline.list_unknown:
+        return [(tex, plain, charmap, matches, file)]
+    # matches for each file; bad offsets are reported for the root file
+    found = [[] for _ in project.files]
+    for m in matches:
+        off = json_get(m, 'offset', int)
+        fid = 0
+        if 0 <= off < len(charmap):
+            fid = tex2txt.project_origin(project, abs(charmap[off]) - 1)[0]
+        found[fid].append(m)
+    parts = []
+    for (fid, fn) in enumerate(project.files):
+        cmap = tex2txt.ProjectCharmap(project, charmap, fid)
+        parts.append((project.texts[fid], plain, cmap, found[fid], fn))
+    return parts
+
+#   generate run_proofreader_parts() for all files in given order
+#   - on option --jobs: files are checked by a pool of threads; the result
+#     for a file is returned as soon as it and the results for all
+#     previous files are available
+#
+def run_proofreader_all(files):
+    if cmdline.jobs == 1:
+        for file in files:
+            yield run_proofreader_parts(file)
+        return
+    pool = concurrent.futures.ThreadPoolExecutor(cmdline.jobs)
+    futures = [pool.submit(run_proofreader_parts, file) for file in files]
+    try:
+        for future in futures:
+            # re-raises SystemExit from tex2txt.fatal() in thread
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown()
+
 #   translation between CLI option names and HTML request fields,
 #   see package pyLanguagetool for field names
 #
@@ -341,7 +403,8 @@ def run_languagetool(plain):
         if cmdline.server == 'lt':
             server = ltserver
         else:
-            start_local_lt_server()
+            with ltserver_local_lock:
+                start_local_lt_server()
             server = ltserver_local
         data = {'text': plain, 'language': cmdline.language}
         if cmdline.disable:
@@ -386,6 +449,7 @@ def run_languagetool(plain):
 #   start local LT server, if none is running
 #
 ltserver_local_running = False
+ltserver_local_lock = threading.Lock()
 def start_local_lt_server():
     def check_server():
         # check for running server
@@ -588,19 +652,19 @@ def create_message(m, rule, msg, repl):
 #   - XXX: some code duplication with begin_match()
 #
 def output_text_report(tex, plain, charmap, matches, file):
-    starts = tex2txt.get_line_starts(plain)
+    offsets = [json_get(m, 'offset', int) for m in matches]
+    lcs = tex2txt.translate_offsets(tex, plain, charmap, offsets)
 
-    for (nr, m) in enumerate(matches, 1):
-        offset = json_get(m, 'offset', int)
-        lin = plain.count('\n', 0, offset) + 1
-        nl = plain.rfind('\n', 0, offset) + 1
-        col = offset - nl + 1
-        lc = tex2txt.translate_numbers(tex, plain, charmap, starts, lin, col)
+    for (nr, (m, lc)) in enumerate(zip(matches, lcs), 1):
+        if lc is None:
+            tex2txt.fatal('output_text_report():'
+                            + ' bad message read from proofreader')
+        (lin, col, _) = lc
 
         rule = json_get(m, 'rule', dict)
         print('=== ' + file + ' ===')
 
-        s = (str(nr) + '.) Line ' + str(lc.lin) + ', column ' + str(lc.col)
+        s = (str(nr) + '.) Line ' + str(lin) + ', column ' + str(col)
                 + ', Rule ID: ' + json_get(rule, 'id', str))
         if 'subId' in rule:
                 s += '[' + json_get(rule, 'subId', str) + ']'
@@ -640,12 +704,13 @@ def output_list_unknown(unkn, file):
 if not cmdline.html or cmdline.list_unknown:
     if cmdline.server == 'lt':
         sys.stderr.write(msg_LT_server_txt)
-    for file in cmdline.file:
-        (tex, plain, charmap, matches) = run_proofreader(file)
-        if cmdline.list_unknown:
-            output_list_unknown(plain, file)
-        else:
-            output_text_report(tex, plain, charmap, matches, file)
+    for parts in run_proofreader_all(cmdline.file):
+        for (tex, plain, charmap, matches, fn) in parts:
+            if cmdline.list_unknown:
+                output_list_unknown(plain, fn)
+            else:
+                output_text_report(tex, plain, charmap, matches, fn)
+        sys.stdout.flush()
     sys.exit()
 
 
@@ -854,9 +919,9 @@ def add_line_numbers(s, line_numbers):
 #   generate HTML report: a part for each file
 #
 html_report_parts = []
-for file in cmdline.file:
-    (tex, plain, charmap, matches) = run_proofreader(file)
-    html_report_parts.append(generate_html(tex, charmap, matches, file))
+for parts in run_proofreader_all(cmdline.file):
+    for (tex, plain, charmap, matches, fn) in parts:
+        html_report_parts.append(generate_html(tex, charmap, matches, fn))
 
 #   ensure UTF-8 encoding for stdout
 #   (not standard with Windows Python)
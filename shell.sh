@@ -16,36 +16,23 @@ then
     exit 1
 fi
 
-#   Python3:
-#   add original line numbers to messages
-#   - argv[1]:  RE search pattern;
-#               first () group must contain the number;
-#               text till second () group is removed
-#   - argv[2]: file with original line numbers
+# output files are written next to $file by batch mode of tex2txt.py,
+# thus it runs in the directory of $file (compare option --outdir)
 #
-repl_lines='
-import re, sys
-expr = sys.argv[1]
-numbers = open(sys.argv[2]).readlines()
-def repl(m):
-    lin = int(m.group(1)) - 1
-    if lin >= 0 and lin < len(numbers):
-        n = numbers[lin].strip()
-        return (m.string[m.start(0):m.end(1)] + " [" + n + "]"
-                    + m.string[m.end(2):m.end(0)])
-    return m.group(0)
-for lin in sys.stdin:
-    sys.stdout.write(re.sub(expr, repl, lin))
-'
+tex2txt=$PWD/tex2txt.py
+dir=$(dirname "$file")
+base=$(basename "$file")
 
 # extract raw text, write line number information
 #
-python3 tex2txt.py --lang en --nums $file.lin $file > $file.txt
+(cd "$dir" && python3 "$tex2txt" --lang en --outdir . --nums lin "$base")
 
 # call language checker, filter line numbers in output;
-# LT produces: '1.) Line 25, column 13, ...'
+# LT produces: '1.) Line 25, column 13, ...';
+# the text till end of second group is removed
 #
 java -jar ../LT/LanguageTool-4.4/languagetool-commandline.jar \
-    --encoding utf-8 --language en-GB --disable WHITESPACE_RULE $file.txt \
-    | python3 -c "$repl_lines" '^\d+\.\) Line (\d+), column (\d+)' $file.lin
+    --encoding utf-8 --language en-GB --disable WHITESPACE_RULE "$file.txt" \
+    | (cd "$dir" && python3 "$tex2txt" --translate \
+        '^\d+\.\) Line (\d+), column (\d+)' --outdir . --nums lin "$base")
 
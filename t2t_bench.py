@@ -0,0 +1,544 @@
+#
+#   Tex2txt, a flexible LaTeX filter
+#   Copyright (C) 2018-2020 Matthias Baumann
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#
+#   Python3:
+#   benchmark of tex2txt() on generated LaTeX documents
+#
+#   - python3 t2t_bench.py [options] result.json
+#   - a seeded generator produces documents of the sizes from option
+#     --sizes, with tunable density of macros, nesting depth, numbers
+#     of \verb and equations, and generated files for --defs and --repl
+#   - for each size and mode (line numbers, character offsets), the
+#     best time of --repeat runs, throughput, and on option --memory
+#     the peak memory (see LAB:MEMORY in tex2txt.py) are recorded
+#   - from the times, the exponent of a fitted power law
+#     seconds ~ chars^exponent is computed; a value clearly above 1
+#     indicates quadratic behaviour
+#   - the results are written as JSON; option --compare prints the
+#     ratios to a former result, option --plot draws the scaling curves
+#     (needs Python module matplotlib)
+#   - the exit status is 1, if an exponent exceeds option --max-exponent;
+#     note that the loop in LAB:VERBATIM rescans the text for each
+#     \verb, such that --verbs raises the exponent
+#
+#   Usage: see README.md
+#
+
+# version of the JSON result
+#
+result_version = 1
+
+# vocabulary for generated text
+#
+words = ('the', 'of', 'and', 'a', 'to', 'in', 'is', 'we', 'that', 'for',
+        'this', 'with', 'as', 'on', 'be', 'are', 'by', 'it', 'an', 'which',
+        'result', 'method', 'value', 'function', 'section', 'example',
+        'theorem', 'proof', 'model', 'system', 'given', 'following',
+        'shown', 'number', 'case', 'space', 'order', 'first', 'second',
+        'small', 'large', 'data', 'time', 'point', 'set', 'line', 'term')
+
+# macros with one braced argument that is kept or removed
+#
+text_macros = ('textbf', 'emph', 'textit', 'underline', 'footnote')
+ref_macros = ('ref', 'cite', 'label', 'eqref')
+
+# environments for nesting
+#
+nest_environments = ('itemize', 'enumerate', 'quote', 'center')
+
+
+#####################################################################
+#
+#   implementation
+#
+#####################################################################
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tex2txt
+
+#   parameters of the generator, see create_parser()
+#
+class Params:
+    def __init__(self, seed=1, size=10000, macros=0.1, depth=3,
+                    verbs=0.3, equations=0.3, defs=0, repl=0):
+        self.seed = seed            # seed of random generator
+        self.size = size            # minimum size in characters
+        self.macros = macros        # probability of a macro per word
+        self.depth = depth          # maximum nesting depth
+        self.verbs = verbs          # \verb per paragraph
+        self.equations = equations  # displayed equations per paragraph
+        self.defs = defs            # number of macros declared for --defs
+        self.repl = repl            # number of lines for --repl
+
+def defs_name(i):
+    # macro names contain letters only
+    return 'bench' + ''.join(chr(ord('a') + int(c)) for c in str(i))
+
+#   code for option --defs: Macro() declarations of project macros
+#
+def generate_defs(params):
+    lines = ['defs.project_macros = (\n']
+    for i in range(params.defs):
+        if i % 2:
+            lines.append("    Macro('" + defs_name(i)
+                            + "', 'OA', r'\\2'),\n")
+        else:
+            lines.append("    Macro('" + defs_name(i) + "', 'A', ''),\n")
+    lines.append(')\n')
+    return ''.join(lines)
+
+#   lines for option --repl: phrases of two words from the vocabulary
+#
+def generate_repl(params):
+    rnd = random.Random(params.seed)
+    lines = ['# generated by t2t_bench.py\n']
+    for _ in range(params.repl):
+        lines.append(rnd.choice(words) + ' ' + rnd.choice(words) + ' & '
+                        + rnd.choice(words) + '\n')
+    return lines
+
+#   generated LaTeX document with at least params.size characters
+#
+def generate(params):
+    rnd = random.Random(params.seed)
+    macros = list(text_macros) + [defs_name(i) for i in range(params.defs)]
+
+    def count(mean):
+        # number of events with given mean
+        n = int(mean)
+        return n + (rnd.random() < mean - n)
+
+    def phrase(n, depth):
+        out = []
+        for _ in range(n):
+            r = rnd.random()
+            if r < params.macros and depth < params.depth:
+                mac = rnd.choice(macros)
+                out.append('\\' + mac + '{'
+                            + phrase(rnd.randint(1, 4), depth + 1) + '}')
+            elif r < params.macros * 1.3:
+                out.append('\\' + rnd.choice(ref_macros) + '{'
+                            + rnd.choice(words) + str(rnd.randint(1, 99))
+                            + '}')
+            elif r < params.macros * 1.6:
+                out.append('$' + rnd.choice('abcxyz') + '_'
+                            + str(rnd.randint(1, 9)) + '$')
+            else:
+                out.append(rnd.choice(words))
+        return ' '.join(out)
+
+    def sentence(depth):
+        s = phrase(rnd.randint(5, 15), depth)
+        return s[0].upper() + s[1:] + '.'
+
+    def plain(n):
+        return ' '.join(rnd.choice(words) for _ in range(n))
+
+    def equation():
+        n = rnd.randint(1, 3)
+        env = 'align' if n > 1 else 'equation'
+        eq = ' &= ' if n > 1 else ' = '
+        rows = []
+        for _ in range(n):
+            rows.append(rnd.choice('abcxyz') + eq + '\\frac{'
+                            + rnd.choice('abc') + '}{' + rnd.choice('xyz')
+                            + '} + \\text{' + rnd.choice(words) + '}')
+        return ('\\begin{' + env + '}\n' + ' \\\\\n'.join(rows) + '.\n'
+                    + '\\end{' + env + '}\n')
+
+    def verb():
+        body = ''.join(rnd.choice('ab{}\\$%') for _ in range(8))
+        return '\\verb|' + body + '|'
+
+    def paragraph(depth):
+        lines = []
+        for _ in range(rnd.randint(2, 5)):
+            s = sentence(depth)
+            for _ in range(count(params.verbs / 3)):
+                s += ' ' + verb()
+            if rnd.random() < 0.1:
+                s += ' % ' + plain(3)
+            lines.append(s)
+        for _ in range(count(params.equations)):
+            lines.append(equation() + phrase(3, depth) + '.')
+        if depth < params.depth and rnd.random() < 0.2:
+            env = rnd.choice(nest_environments)
+            body = []
+            for _ in range(rnd.randint(1, 3)):
+                pre = '\\item ' if env in ('itemize', 'enumerate') else ''
+                body.append(pre + paragraph(depth + 1))
+            lines.append('\\begin{' + env + '}\n' + '\n'.join(body)
+                            + '\n\\end{' + env + '}')
+        return '\n'.join(lines)
+
+    out = ['\\documentclass{article}\n\\begin{document}\n']
+    size = len(out[0])
+    nsec = 0
+    while size < params.size:
+        if nsec == 0 or rnd.random() < 0.1:
+            nsec += 1
+            s = '\\section{' + plain(3).capitalize() + '}\n\n'
+        else:
+            s = paragraph(0) + '\n\n'
+        out.append(s)
+        size += len(s)
+    out.append('\\end{document}\n')
+    return ''.join(out)
+
+#   Options object for tex2txt() with generated --defs and --repl
+#
+def create_options(params, char, **kw):
+    defs = tex2txt.Definitions(generate_defs(params), 'bench-defs')
+    repl = (generate_repl(params), 'bench-repl') if params.repl else None
+    return tex2txt.Options(char=char, defs=defs, repl=repl, lang='en', **kw)
+
+#   run benchmark for one document and mode
+#
+def measure(txt, params, char, repeat, memory):
+    options = create_options(params, char)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tex2txt.tex2txt(txt, options)
+        t = time.perf_counter() - start
+        best = t if best is None else min(best, t)
+    res = {'mode': 'char' if char else 'lin', 'chars': len(txt),
+            'seconds': round(best, 6),
+            'chars_per_second': round(len(txt) / best) if best else None}
+    if memory:
+        reports = []
+        options = create_options(params, char, memory=True,
+                                    profile=reports.append)
+        tex2txt.tex2txt(txt, options)
+        res['peak_bytes'] = reports[0]['peak_bytes']
+    return res
+
+#   exponent of power law fitted to (chars, seconds) by least squares
+#   in log-log scale
+#
+def fit_exponent(results):
+    pts = [(math.log(r['chars']), math.log(r['seconds']))
+                for r in results if r['seconds'] > 0]
+    if len(pts) < 2:
+        return None
+    mx = sum(x for (x, _) in pts) / len(pts)
+    my = sum(y for (_, y) in pts) / len(pts)
+    sxx = sum((x - mx) ** 2 for (x, _) in pts)
+    if not sxx:
+        return None
+    return round(sum((x - mx) * (y - my) for (x, y) in pts) / sxx, 3)
+
+def run_benchmark(params, sizes, modes, repeat=3, memory=False,
+                    log=None):
+    # compile the regular expressions before the first measurement
+    for mode in modes:
+        p = Params(**dict(vars(params), size=1000))
+        tex2txt.tex2txt(generate(p), create_options(p, mode == 'char'))
+    results = []
+    for size in sizes:
+        p = Params(**dict(vars(params), size=size))
+        txt = generate(p)
+        for mode in modes:
+            res = measure(txt, p, mode == 'char', repeat, memory)
+            results.append(res)
+            if log:
+                log.write('{:5} {:10d} chars {:10.4f} s {:12} chars/s\n'
+                            .format(mode, res['chars'], res['seconds'],
+                                str(res['chars_per_second'])))
+                log.flush()
+    exponents = {m: fit_exponent([r for r in results if r['mode'] == m])
+                    for m in modes}
+    return {'version': result_version,
+            'params': dict(vars(params), size=None),
+            'sizes': sizes,
+            'python': platform.python_version(),
+            'results': results,
+            'exponents': exponents}
+
+#   print ratios of times to a former result
+#
+def compare(old, new, f):
+    times = {(r['mode'], r['chars']): r['seconds'] for r in old['results']}
+    f.write('=== comparison: old seconds, new seconds, new / old\n')
+    for r in new['results']:
+        t = times.get((r['mode'], r['chars']))
+        if t is None:
+            continue
+        f.write('{:5} {:10d} chars {:10.4f} {:10.4f} {:8.2f}\n'.format(
+                    r['mode'], r['chars'], t, r['seconds'],
+                    r['seconds'] / t if t else float('inf')))
+    for (m, e) in new['exponents'].items():
+        f.write('=== exponent ' + m + ': ' + str(old['exponents'].get(m))
+                    + ' -> ' + str(e) + '\n')
+
+def plot(result, fn):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        tex2txt.fatal('option --plot needs Python module matplotlib')
+    (fig, ax) = plt.subplots()
+    for m in result['exponents']:
+        rs = [r for r in result['results'] if r['mode'] == m]
+        ax.loglog([r['chars'] for r in rs], [r['seconds'] for r in rs],
+                    marker='o', label=m + ', exponent '
+                        + str(result['exponents'][m]))
+    ax.set_xlabel('characters')
+    ax.set_ylabel('seconds')
+    ax.legend()
+    fig.savefig(fn)
+
+#   worst cases: adversarial documents with time limits (option --worst)
+#   - each case generates a document from a scale n; the conversion is
+#     stopped at the time limit via Options.timeout, and the result names
+#     the stage and line (see LAB:TIMEOUT in tex2txt.py), as well as the
+#     most costly expression from the profile (see LAB:PROFILE)
+#   - the limits are about five times the durations on a typical machine,
+#     option --limit-factor adapts them; option --scale changes the sizes
+#   - cases braces_unclosed and comments grow superlinearly with the
+#     current version; their sizes show the problem, and their limits
+#     are only about twice the durations
+#
+class WorstCase:
+    def __init__(self, name, about, make, n, limit):
+        self.name = name        # name for option --cases
+        self.about = about      # short description
+        self.make = make        # function: scale n -> LaTeX text
+        self.n = n              # default scale
+        self.limit = limit      # time limit in seconds
+
+def worst_nested(pre, post, depth, n):
+    return ((pre * depth + 'x' + post * depth + '\n') * n)
+
+worst_cases = (
+    WorstCase('braces_unclosed', 'unclosed \\textbf{ on one line',
+        lambda n: 'Start.\n\n' + 'x \\textbf{' * n + 'a\n',
+        20000, 5),
+    WorstCase('braces_depth', 'braces nested up to the limit,'
+                + ' last brace missing',
+        lambda n: worst_nested('\\textbf{', '}',
+                        tex2txt.parms.max_depth_br - 1, n)
+                        .replace('}\n', '\n'),
+        100, 4),
+    WorstCase('brackets_depth', 'unclosed brackets and braces in'
+                + ' optional argument',
+        lambda n: ('\\section[' + '{[' * (tex2txt.parms.max_depth_br // 2
+                        - 1) + 'x\n') * n,
+        2000, 2),
+    WorstCase('equation_line', 'long line of \\\\ and & in align',
+        lambda n: ('\\begin{align}\n' + 'a &= b & c \\\\ ' * n
+                        + '\n\\end{align}\n'),
+        2000, 2),
+    WorstCase('equation_braces', '\\\\ and & in braces in align'
+                + ' (known BUG with warning)',
+        lambda n: ('\\begin{align}\n' + '\\mbox{a & b \\\\ c} ' * n
+                        + '\n\\end{align}\n'),
+        2000, 2),
+    WorstCase('verbs_line', 'many \\verb on one line',
+        lambda n: 'Text ' + '\\verb|x{y| ' * n + '\n',
+        400, 4),
+    WorstCase('dollar_braces', '$ in braces of inline maths'
+                + ' (known BUG with warning)',
+        lambda n: '$x \\text{ for $x>0$}$ and ' * n + '\n',
+        2000, 2),
+    WorstCase('dollars_odd', 'unbalanced $ on one line',
+        lambda n: 'a $b ' * n + '\n',
+        5000, 2),
+    WorstCase('environments_depth', 'environments nested up to the limit',
+        lambda n: worst_nested('\\begin{itemize}\\item ', '\\end{itemize}',
+                        tex2txt.parms.max_depth_env - 1, n),
+        100, 4),
+    WorstCase('environments_unclosed', 'environments without end',
+        lambda n: '\\begin{itemize}\\item x\n' * n,
+        2000, 2),
+    WorstCase('linebreaks', 'long line of \\\\ in text',
+        lambda n: 'Text' + '\\\\' * n + '\n',
+        5000, 2),
+    WorstCase('comments', 'backslashes before % comments',
+        lambda n: ('x' + '\\' * 11 + '% y\n') * n,
+        4000, 12),
+)
+
+def run_worst(cases, char=False, factor=1, scale=1, log=None):
+    # compile the regular expressions before the first measurement
+    tex2txt.tex2txt(generate(Params(size=1000)),
+                        tex2txt.Options(lang='en', char=char))
+    results = []
+    for case in cases:
+        txt = case.make(max(1, int(case.n * scale)))
+        limit = case.limit * factor
+        reports = []
+        options = tex2txt.Options(lang='en', char=char, timeout=limit,
+                                    profile=reports.append)
+        res = {'case': case.name, 'mode': 'char' if char else 'lin',
+                'chars': len(txt), 'limit': limit}
+        err = io.StringIO()
+        save_stderr = sys.stderr
+        sys.stderr = err
+        start = time.perf_counter()
+        try:
+            tex2txt.tex2txt(txt, options)
+            res['status'] = 'ok'
+        except tex2txt.ConversionTimeout as e:
+            res.update(status='timeout', stage=e.stage, line=e.line)
+        except SystemExit:
+            tex2txt.warning_or_error.msg = ''
+            res['status'] = 'error'
+        finally:
+            sys.stderr = save_stderr
+        res['seconds'] = round(time.perf_counter() - start, 6)
+        res['warnings'] = err.getvalue().count('\n*** ')
+        if reports:
+            r = reports[-1]
+            if 'stage' not in res and r['stages']:
+                res['stage'] = max(r['stages'],
+                                    key=lambda s: s['seconds'])['stage']
+            if r['patterns']:
+                p = r['patterns'][0]
+                res['origin'] = p['origin']
+                res['pattern'] = p['pattern']
+        results.append(res)
+        if log:
+            log.write('{:22} {:4} {:7} {:8.3f} s of {:5.1f} s  {:12}  {}\n'
+                        .format(case.name, res['mode'], res['status'],
+                            res['seconds'], limit, str(res.get('stage')),
+                            res.get('origin')))
+            log.flush()
+    return results
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('result')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sizes', default='25000,50000,100000,200000',
+                            help='comma-separated sizes in characters')
+    parser.add_argument('--modes', default='lin,char')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--macros', type=float, default=0.1,
+                            help='probability of a macro per word')
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--verbs', type=float, default=0.3,
+                            help='\\verb per paragraph')
+    parser.add_argument('--equations', type=float, default=0.3,
+                            help='equations per paragraph')
+    parser.add_argument('--defs', type=int, default=0,
+                            help='declared project macros')
+    parser.add_argument('--repl', type=int, default=0,
+                            help='lines for option --repl')
+    parser.add_argument('--memory', action='store_true')
+    parser.add_argument('--compare')
+    parser.add_argument('--plot')
+    parser.add_argument('--max-exponent', type=float)
+    parser.add_argument('--save-docs',
+                            help='directory for generated files')
+    parser.add_argument('--worst', action='store_true',
+                            help='run worst cases instead')
+    parser.add_argument('--cases',
+                            help='comma-separated names of worst cases')
+    parser.add_argument('--limit-factor', type=float, default=1)
+    parser.add_argument('--scale', type=float, default=1,
+                            help='factor for sizes of worst cases')
+    return parser
+
+def main_worst(cmdline, modes):
+    cases = worst_cases
+    if cmdline.cases:
+        names = cmdline.cases.split(',')
+        for name in names:
+            if name not in [c.name for c in worst_cases]:
+                tex2txt.fatal('option --cases: unknown case "' + name + '"')
+        cases = [c for c in worst_cases if c.name in names]
+    if cmdline.save_docs:
+        os.makedirs(cmdline.save_docs, exist_ok=True)
+        for c in cases:
+            fn = os.path.join(cmdline.save_docs, 'worst-' + c.name + '.tex')
+            with open(fn, mode='w', encoding='utf-8') as f:
+                f.write(c.make(max(1, int(c.n * cmdline.scale))))
+    results = []
+    for mode in modes:
+        results += run_worst(cases, mode == 'char', cmdline.limit_factor,
+                                cmdline.scale, sys.stdout)
+    with open(cmdline.result, mode='w', encoding='utf-8') as f:
+        json.dump({'version': result_version,
+                    'python': platform.python_version(),
+                    'worst': results}, f, indent=1)
+        f.write('\n')
+    failed = [r for r in results if r['status'] != 'ok']
+    if failed:
+        print('=== failed worst cases: ' + str(len(failed)))
+        return 1
+    return 0
+
+def main(argv=None):
+    cmdline = create_parser().parse_args(argv)
+    params = Params(seed=cmdline.seed, macros=cmdline.macros,
+                    depth=cmdline.depth, verbs=cmdline.verbs,
+                    equations=cmdline.equations, defs=cmdline.defs,
+                    repl=cmdline.repl)
+    sizes = [int(s) for s in cmdline.sizes.split(',')]
+    modes = cmdline.modes.split(',')
+    if any(m not in ('lin', 'char') for m in modes):
+        tex2txt.fatal('option --modes: only lin and char')
+    if cmdline.worst:
+        return main_worst(cmdline, modes)
+
+    if cmdline.save_docs:
+        os.makedirs(cmdline.save_docs, exist_ok=True)
+        def save(name, s):
+            fn = os.path.join(cmdline.save_docs, name)
+            with open(fn, mode='w', encoding='utf-8') as f:
+                f.write(s)
+        for size in sizes:
+            save('bench-' + str(size) + '.tex',
+                    generate(Params(**dict(vars(params), size=size))))
+        save('bench-defs.py', generate_defs(params))
+        save('bench-repl.txt', ''.join(generate_repl(params)))
+
+    result = run_benchmark(params, sizes, modes, cmdline.repeat,
+                                cmdline.memory, sys.stdout)
+    with open(cmdline.result, mode='w', encoding='utf-8') as f:
+        json.dump(result, f, indent=1)
+        f.write('\n')
+    for (m, e) in result['exponents'].items():
+        print('=== exponent ' + m + ': ' + str(e))
+    if cmdline.compare:
+        with open(cmdline.compare, encoding='utf-8') as f:
+            compare(json.load(f), result, sys.stdout)
+    if cmdline.plot:
+        plot(result, cmdline.plot)
+    if cmdline.max_exponent is not None and any(e is not None
+                and e > cmdline.max_exponent
+                for e in result['exponents'].values()):
+        print('=== exponent exceeds ' + str(cmdline.max_exponent))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+#
+#   Tex2txt, a flexible LaTeX filter
+#   Copyright (C) 2018-2020 Matthias Baumann
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#
+#   Python3:
+#   resumable conversion of a directory tree of LaTeX files
+#
+#   - python3 t2t_corpus.py [options] srcdir outdir
+#   - each file srcdir/x.tex is converted to outdir/x.tex.txt
+#     by a pool of worker processes
+#   - for each file, status, duration and SHA-256 hashes of the output
+#     are appended to a manifest file in outdir;
+#     if the job is started again, files already in the manifest with
+#     unchanged size and modification time are skipped
+#   - a file that exceeds the time limit (option --timeout) or the memory
+#     limit (option --memory) is quarantined: its worker is replaced,
+#     and the file is recorded in the manifest with status 'timeout',
+#     'memory' or 'crash'; on the time limit, the conversion normally
+#     stops itself, and the message names stage and line, compare
+#     LAB:TIMEOUT in tex2txt.py; otherwise, the worker is killed after
+#     a grace period (see timeout_factor)
+#   - a summary is printed at the end
+#
+#   Usage: see README.md
+#
+
+# name of manifest file in output directory
+#
+manifest_name = 't2t-manifest.jsonl'
+
+# number of slowest files listed in summary
+#
+summary_slowest = 10
+
+# time between checks of running workers in seconds
+#
+poll_interval = 0.1
+
+# the worker process is killed if it has not reported after
+# timeout_factor * timeout + timeout_grace seconds, so that a conversion
+# that stops itself on the time limit can still send its result
+#
+timeout_factor = 1.5
+timeout_grace = 1.0
+
+
+#####################################################################
+#
+#   implementation
+#
+#####################################################################
+
+import argparse
+import fnmatch
+import hashlib
+import io
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tex2txt
+
+parser = argparse.ArgumentParser()
+parser.add_argument('srcdir')
+parser.add_argument('outdir')
+parser.add_argument('--pattern', default='*.tex')
+parser.add_argument('--jobs', type=int)
+parser.add_argument('--timeout', type=float,
+                        help='seconds per file')
+parser.add_argument('--memory', type=int,
+                        help='megabytes per worker process')
+parser.add_argument('--retry', action='store_true',
+                        help='convert again files without status ok')
+parser.add_argument('--nums')
+parser.add_argument('--char', action='store_true')
+parser.add_argument('--low-memory', action='store_true')
+parser.add_argument('--defs')
+parser.add_argument('--repl')
+parser.add_argument('--extr')
+parser.add_argument('--lang')
+parser.add_argument('--ienc', default='utf-8')
+parser.add_argument('--placeholders', choices=['rotate', 'local'],
+                        default='rotate')
+
+#   list of files to convert: paths relative to srcdir, sorted
+#
+def find_files(srcdir, pattern):
+    files = []
+    for (dirpath, dirnames, filenames) in os.walk(srcdir):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if fnmatch.fnmatch(fn, pattern):
+                rel = os.path.relpath(os.path.join(dirpath, fn), srcdir)
+                files.append(rel)
+    return files
+
+#   read manifest: return dictionary with last entry for each file
+#
+def read_manifest(fn):
+    entries = {}
+    try:
+        f = open(fn, encoding='utf-8')
+    except OSError:
+        return entries
+    with f:
+        for lin in f:
+            try:
+                e = json.loads(lin)
+                entries[e['file']] = e
+            except (ValueError, KeyError, TypeError):
+                # e.g. incomplete last line after a crash
+                continue
+    return entries
+
+def file_stamp(fn):
+    st = os.stat(fn)
+    return (st.st_size, st.st_mtime_ns)
+
+
+#####################################################################
+#
+#   worker process
+#
+#####################################################################
+
+def worker_main(conn, cmdline):
+    if cmdline.memory:
+        try:
+            import resource
+            limit = cmdline.memory * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+    options = tex2txt.Options(char=cmdline.char,
+                repl=tex2txt.read_replacements(cmdline.repl, cmdline.ienc),
+                defs=tex2txt.read_definitions(cmdline.defs, 'utf-8'),
+                extr=cmdline.extr, lang=cmdline.lang,
+                placeholders=cmdline.placeholders,
+                timeout=cmdline.timeout, lowmem=cmdline.low_memory)
+    while True:
+        try:
+            rel = conn.recv()
+        except EOFError:
+            return
+        if rel is None:
+            return
+        res = convert(rel, options, cmdline)
+        conn.send(res)
+        if res['status'] == 'memory':
+            # state of process may be damaged
+            return
+
+def convert(rel, options, cmdline):
+    src = os.path.join(cmdline.srcdir, rel)
+    res = {'status': 'ok'}
+    err = io.StringIO()
+    save_stderr = sys.stderr
+    sys.stderr = err
+    tex2txt.warning_or_error.msg = ''
+    try:
+        f = tex2txt.myopen(src, encoding=cmdline.ienc)
+        txt = f.read()
+        f.close()
+        text = tex2txt.tex2txt(txt, options)
+        out = io.StringIO()
+        nums = io.StringIO() if cmdline.nums else None
+        tex2txt.write_output(text, out, nums)
+        write_file(cmdline, rel, tex2txt.batch_text_ext, out.getvalue(), res)
+        if nums:
+            write_file(cmdline, rel, cmdline.nums, nums.getvalue(), res)
+    except MemoryError:
+        res = {'status': 'memory'}
+    except tex2txt.ConversionTimeout as e:
+        # stopped by the worker itself, see LAB:TIMEOUT in tex2txt.py
+        res = {'status': 'timeout', 'message': str(e)}
+    except SystemExit:
+        # message from tex2txt.raise_error()
+        res = {'status': 'error'}
+    except Exception as e:
+        res = {'status': 'error', 'message': repr(e)}
+    finally:
+        sys.stderr = save_stderr
+    if err.getvalue().strip():
+        res['message'] = (res.get('message', '') + err.getvalue()).strip()
+    return res
+
+def write_file(cmdline, rel, ext, s, res):
+    fn = os.path.join(cmdline.outdir, rel + '.' + ext)
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    data = s.encode('utf-8')
+    with open(fn, mode='wb') as f:
+        f.write(data)
+    res['sha256_' + ext] = hashlib.sha256(data).hexdigest()
+
+
+#####################################################################
+#
+#   job control
+#
+#####################################################################
+
+class Worker:
+    def __init__(self, cmdline):
+        (self.conn, child) = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(target=worker_main,
+                                    args=(child, cmdline), daemon=True)
+        self.proc.start()
+        child.close()
+        self.rel = None
+        self.start = None
+
+    def submit(self, rel):
+        self.rel = rel
+        self.start = time.monotonic()
+        self.conn.send(rel)
+
+    def stop(self, kill=False):
+        if kill:
+            self.proc.terminate()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.proc.join()
+        self.conn.close()
+
+def run_job(cmdline):
+    os.makedirs(cmdline.outdir, exist_ok=True)
+    manifest_fn = os.path.join(cmdline.outdir, manifest_name)
+    entries = read_manifest(manifest_fn)
+    todo = []
+    for rel in find_files(cmdline.srcdir, cmdline.pattern):
+        e = entries.get(rel)
+        stamp = file_stamp(os.path.join(cmdline.srcdir, rel))
+        if (e and [e.get('size'), e.get('mtime_ns')] == list(stamp)
+                and (e.get('status') == 'ok' or not cmdline.retry)):
+            continue
+        todo.append((rel, stamp))
+    stamps = dict(todo)
+    todo = [rel for (rel, _) in todo]
+    todo.reverse()
+
+    manifest = open(manifest_fn, mode='a', encoding='utf-8')
+    results = []
+    def record(w, res):
+        res['file'] = w.rel
+        (res['size'], res['mtime_ns']) = stamps[w.rel]
+        res['seconds'] = round(time.monotonic() - w.start, 6)
+        manifest.write(json.dumps(res, sort_keys=True) + '\n')
+        manifest.flush()
+        results.append(res)
+        if res['status'] != 'ok':
+            sys.stderr.write('=== ' + w.rel + ': ' + res['status'] + '\n')
+            if res.get('message'):
+                sys.stderr.write(res['message'] + '\n')
+            sys.stderr.flush()
+        w.rel = None
+
+    jobs = max(1, min(cmdline.jobs or os.cpu_count() or 1, len(todo)))
+    workers = [Worker(cmdline) for _ in range(jobs)] if todo else []
+    t_start = time.monotonic()
+    try:
+        while True:
+            for w in workers:
+                if w.rel is None and todo:
+                    w.submit(todo.pop())
+            busy = [w for w in workers if w.rel is not None]
+            if not busy:
+                break
+            ready = multiprocessing.connection.wait(
+                            [w.conn for w in busy], timeout=poll_interval)
+            for (i, w) in enumerate(workers):
+                if w.rel is None:
+                    continue
+                res = None
+                if w.conn in ready:
+                    try:
+                        res = w.conn.recv()
+                    except (EOFError, OSError):
+                        res = {'status': 'crash'}
+                elif (cmdline.timeout
+                        and time.monotonic() - w.start > timeout_factor
+                                * cmdline.timeout + timeout_grace):
+                    res = {'status': 'timeout'}
+                elif not w.proc.is_alive():
+                    res = {'status': 'crash'}
+                if res is None:
+                    continue
+                record(w, res)
+                if res['status'] != 'ok' and res['status'] != 'error':
+                    # quarantine file, replace worker
+                    w.stop(kill=True)
+                    workers[i] = Worker(cmdline)
+    finally:
+        for w in workers:
+            w.stop(kill=w.rel is not None)
+        manifest.close()
+    summary(results, time.monotonic() - t_start)
+    return 0 if all(r['status'] == 'ok' for r in results) else 1
+
+def summary(results, seconds):
+    n = len(results)
+    size = sum(r['size'] for r in results)
+    print('=== converted files: ' + str(n) + ' in '
+                + '{:.2f}'.format(seconds) + ' s')
+    for status in ('ok', 'error', 'timeout', 'memory', 'crash'):
+        c = sum(1 for r in results if r['status'] == status)
+        if c:
+            print('=== ' + status + ': ' + str(c))
+    if seconds > 0:
+        print('=== throughput: ' + '{:.2f}'.format(n / seconds) + ' files/s, '
+                + '{:.3f}'.format(size / seconds / 1e6) + ' MB/s')
+    slow = sorted(results, key=lambda r: r['seconds'], reverse=True)
+    if slow:
+        print('=== slowest files:')
+    for r in slow[:summary_slowest]:
+        print('{:10.3f} s  {:10d} bytes  {}  {}'.format(r['seconds'],
+                    r['size'], r['status'], r['file']))
+    sys.stdout.flush()
+
+if __name__ == '__main__':
+    sys.exit(run_job(parser.parse_args()))
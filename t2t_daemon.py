@@ -0,0 +1,351 @@
+#
+#   Tex2txt, a flexible LaTeX filter
+#   Copyright (C) 2018-2020 Matthias Baumann
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#
+#   Python3:
+#   long-running conversion daemon for tex2txt.py, and a thin client
+#
+#   - python3 t2t_daemon.py --serve
+#     start daemon in foreground, stop with --stop or SIGINT
+#   - python3 t2t_daemon.py --stop
+#     stop running daemon
+#   - python3 t2t_daemon.py [options of tex2txt.py] [texfile ...]
+#     client: same command line as tex2txt.py, same output;
+#     if no daemon is running, tex2txt.py is run in this process
+#
+#   The daemon imports tex2txt.py only once and keeps the files
+#   from options --defs and --repl in memory;
+#   they are read again, when modification time or size change.
+#   For each set of options, it keeps the Options object and the
+#   compiled regular expressions from the previous requests.
+#   Requests are handled one after the other, since tex2txt()
+#   must only run once at each point in time.
+#
+#   Usage: see README.md
+#
+
+# address of daemon: path of Unix socket, or 'host:port' for TCP;
+# can be overwritten by environment variable in daemon_env
+# - '{uid}' is replaced by the numerical user ID
+# - the directory of a Unix socket is created with access only for the
+#   own user; if it already exists, it must belong to the own user
+# - ATTENTION: with TCP, every local user can run code from --defs files
+#   under the account of the daemon
+#
+daemon_address = '/tmp/t2t-daemon-{uid}/socket'
+daemon_env = 'T2T_DAEMON'
+
+# number of option sets with prepared Options object and compiled
+# regular expressions, see prepared_options()
+#
+prepared_max = 8
+
+
+#####################################################################
+#
+#   implementation
+#
+#   - client part: keep imports small, tex2txt is only imported
+#     by the daemon or on fallback
+#
+#####################################################################
+
+import json
+import os
+import socket
+import stat
+import sys
+
+#   parse address: return (socket family, address)
+#
+def get_address():
+    addr = os.environ.get(daemon_env) or daemon_address
+    addr = addr.replace('{uid}', str(os.getuid() if hasattr(os, 'getuid')
+                                        else 0))
+    (host, sep, port) = addr.rpartition(':')
+    if sep and port.isdecimal():
+        return (socket.AF_INET, (host or 'localhost', int(port)))
+    return (socket.AF_UNIX, addr)
+
+#   messages: JSON objects, one per line
+#
+def send_msg(f, msg):
+    f.write(json.dumps(msg).encode('utf-8') + b'\n')
+    f.flush()
+
+def recv_msg(f):
+    lin = f.readline()
+    if not lin:
+        return None
+    return json.loads(lin.decode('utf-8'))
+
+#   directory of Unix socket: return error message, if it is not a
+#   directory of the own user
+#
+def check_dir(addr):
+    d = os.path.dirname(os.path.abspath(addr))
+    try:
+        st = os.lstat(d)
+    except OSError:
+        return 'directory "' + d + '" of socket not found'
+    if not stat.S_ISDIR(st.st_mode):
+        return '"' + d + '" of socket is not a directory'
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        return 'directory "' + d + '" of socket belongs to another user'
+    return None
+
+def connect():
+    (family, addr) = get_address()
+    if family == socket.AF_UNIX and (not hasattr(socket, 'AF_UNIX')
+                                        or check_dir(addr)):
+        # do not talk to a daemon of another user
+        return None
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    try:
+        sock.connect(addr)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+#####################################################################
+#
+#   client
+#
+#####################################################################
+
+def run_local(argv):
+    # no daemon running: behave like tex2txt.py
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import tex2txt
+    tex2txt.main(argv)
+
+def client(argv):
+    sock = connect()
+    if sock is None:
+        run_local(argv)
+        return 0
+    f = sock.makefile(mode='rwb')
+    send_msg(f, {'argv': argv, 'argv0': sys.argv[0], 'cwd': os.getcwd()})
+    reply = recv_msg(f)
+    if reply and 'stdin' in reply:
+        # daemon asks for standard input, in the given encoding
+        import io
+        s = io.TextIOWrapper(sys.stdin.buffer, encoding=reply['stdin'])
+        send_msg(f, {'stdin': s.read()})
+        reply = recv_msg(f)
+    f.close()
+    sock.close()
+    if reply is None:
+        sys.stderr.write('*** ' + sys.argv[0]
+                            + ': connection to daemon lost\n')
+        return 1
+    sys.stdout.buffer.write(reply['stdout'].encode('utf-8'))
+    sys.stdout.flush()
+    sys.stderr.write(reply['stderr'])
+    return reply['status']
+
+def stop():
+    sock = connect()
+    if sock is None:
+        sys.stderr.write('*** ' + sys.argv[0] + ': no daemon running\n')
+        return 1
+    f = sock.makefile(mode='rwb')
+    send_msg(f, {'stop': True})
+    recv_msg(f)
+    f.close()
+    sock.close()
+    return 0
+
+
+#####################################################################
+#
+#   daemon
+#
+#####################################################################
+
+#   cache results of tex2txt.read_definitions() and
+#   tex2txt.read_replacements() by file name and modification time
+#
+def cached_reader(read, cache):
+    def f(fn, encoding):
+        if not fn:
+            return read(fn, encoding)
+        try:
+            st = os.stat(fn)
+        except OSError:
+            # let tex2txt produce the error message
+            return read(fn, encoding)
+        key = (os.path.abspath(fn), encoding)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if key in cache and cache[key][0] == stamp:
+            return cache[key][1]
+        ret = read(fn, encoding)
+        cache[key] = (stamp, ret)
+        return ret
+    return f
+
+#   cache results of tex2txt.create_options() for the option set of a
+#   command line, including the files from --defs and --repl with their
+#   modification times; with the Options object, a dictionary of
+#   compiled regular expressions is installed as rx.patterns of tex2txt
+#
+options_attrs = ('repl', 'char', 'defs', 'extr', 'lang', 'ienc', 'unkn',
+                    'cache_dir', 'cache_size', 'jobs', 'placeholders',
+                    'timeout', 'regex', 'atomic', 'profile', 'heatmap',
+                    'memory', 'low_memory')
+
+def options_key(cmdline):
+    key = [getattr(cmdline, a) for a in options_attrs]
+    key.append(bool(cmdline.outdir))    # decides on option --jobs
+    for fn in (cmdline.defs, cmdline.repl):
+        if fn:
+            try:
+                st = os.stat(fn)
+            except OSError:
+                return None
+            key.append((os.path.abspath(fn), st.st_mtime_ns, st.st_size))
+    return tuple(key)
+
+def prepared_options(create, rx, cache):
+    def f(cmdline):
+        key = options_key(cmdline)
+        if key is None:
+            # let tex2txt produce the error message
+            rx.patterns = None
+            return create(cmdline)
+        if key in cache:
+            cache[key] = cache.pop(key)     # most recently used at end
+        else:
+            if len(cache) >= prepared_max:
+                del cache[next(iter(cache))]
+            cache[key] = (create(cmdline), {})
+        (options, rx.patterns) = cache[key]
+        return options
+    return f
+
+def serve():
+    (family, addr) = get_address()
+    if family == socket.AF_UNIX:
+        try:
+            os.mkdir(os.path.dirname(os.path.abspath(addr)), 0o700)
+        except OSError:
+            pass    # existing directory or error: see check_dir()
+        msg = check_dir(addr)
+        if msg:
+            sys.stderr.write('*** ' + sys.argv[0] + ': ' + msg + '\n')
+            return 1
+        if connect():
+            sys.stderr.write('*** ' + sys.argv[0] + ': daemon already running'
+                                + ' at "' + addr + '"\n')
+            return 1
+        if os.path.exists(addr):
+            os.remove(addr)
+
+    import io
+    import socketserver
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import tex2txt
+
+    tex2txt.read_definitions = cached_reader(tex2txt.read_definitions, {})
+    tex2txt.read_replacements = cached_reader(tex2txt.read_replacements, {})
+    tex2txt.create_options = prepared_options(tex2txt.create_options,
+                                                tex2txt.rx, {})
+
+    def convert(req, f):
+        # run tex2txt.main() for a request, return reply
+        argv = req['argv']
+        out = io.StringIO()
+        err = io.StringIO()
+        (save_argv, save_stderr) = (sys.argv, sys.stderr)
+        status = 0
+        try:
+            os.chdir(req['cwd'])
+            sys.argv = [req.get('argv0', 'tex2txt.py')] + argv
+            sys.stderr = err
+            # message may remain from an aborted previous request
+            tex2txt.warning_or_error.msg = ''
+            cmdline = tex2txt.create_parser().parse_args(argv)
+            stdin = None
+            if tex2txt.needs_stdin(cmdline):
+                send_msg(f, {'stdin': cmdline.ienc or 'utf-8'})
+                stdin = io.StringIO(recv_msg(f)['stdin'])
+            tex2txt.main(argv, stdin=stdin, stdout=out)
+        except SystemExit as e:
+            # like the interpreter: None is success, other codes
+            # are printed
+            status = (0 if e.code is None else e.code
+                        if isinstance(e.code, int) else 1)
+            if not isinstance(e.code, (int, type(None))):
+                err.write(str(e.code) + '\n')
+        except Exception:
+            import traceback
+            err.write(traceback.format_exc())
+            status = 1
+        finally:
+            (sys.argv, sys.stderr) = (save_argv, save_stderr)
+        return {'stdout': out.getvalue(), 'stderr': err.getvalue(),
+                    'status': status}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            f = self.connection.makefile(mode='rwb')
+            try:
+                req = recv_msg(f)
+                if req is None:
+                    return
+                if req.get('stop'):
+                    send_msg(f, {'status': 0})
+                    self.server.stop = True
+                    return
+                send_msg(f, convert(req, f))
+            except (OSError, ValueError):
+                pass
+            finally:
+                f.close()
+
+    if family == socket.AF_UNIX:
+        os.umask(0o077)     # socket only accessible for own user
+        server = socketserver.UnixStreamServer(addr, Handler)
+        os.chmod(addr, 0o600)
+    else:
+        socketserver.TCPServer.allow_reuse_address = True
+        server = socketserver.TCPServer(addr, Handler)
+    server.stop = False
+    sys.stderr.write('=== t2t_daemon: listening at ' + str(addr) + '\n')
+    sys.stderr.flush()
+    cwd = os.getcwd()
+    try:
+        while not server.stop:
+            server.handle_request()
+            os.chdir(cwd)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.remove(addr)
+    return 0
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--serve']:
+        sys.exit(serve())
+    if sys.argv[1:] == ['--stop']:
+        sys.exit(stop())
+    sys.exit(client(sys.argv[1:]))
@@ -0,0 +1,296 @@
+#
+#   Tex2txt, a flexible LaTeX filter
+#   Copyright (C) 2018-2020 Matthias Baumann
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#
+#   Python3:
+#   differential test of two versions or option sets of tex2txt.py
+#
+#   - python3 t2t_diff.py [options] [texfile|directory ...]
+#   - each document is converted by a reference and a candidate side;
+#     a side is a copy of tex2txt.py (options --reference, --candidate,
+#     default: the tex2txt.py next to this script) together with
+#     command-line options (--reference-options, --candidate-options)
+#   - an older tex2txt.py without create_parser() and create_options()
+#     gets its Options object from the options of the command line that
+#     are known to its class Options; other options lead to an error
+#   - plain text, line numbers, character offsets and the messages on
+#     standard error must be identical
+#   - the input of a failing document is reduced by delta debugging to
+#     a small input that still shows a difference; it is written to
+#     the directory from option --outdir
+#   - the durations of both sides are summed up for each document
+#   - documents are given as files, directories (searched for *.tex),
+#     or are generated by option --generate, compare t2t_bench.py
+#   - the exit status is 1, if a difference has been found
+#
+#   Usage: see README.md
+#
+
+# maximum number of test conversions for minimization of one document
+#
+minimize_tests = 300
+
+
+#####################################################################
+#
+#   implementation
+#
+#####################################################################
+
+import argparse
+import importlib.util
+import inspect
+import io
+import os
+import shlex
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tex2txt
+
+#   a side of the comparison: module and options
+#
+class Side:
+    def __init__(self, name, fn, args):
+        self.name = name
+        if fn:
+            spec = importlib.util.spec_from_file_location('t2t_diff_' + name,
+                                                            fn)
+            self.module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(self.module)
+        else:
+            self.module = tex2txt
+        old = not hasattr(self.module, 'create_options')
+        parser = (tex2txt if old else self.module).create_parser()
+        cmdline = parser.parse_args(shlex.split(args))
+        if not cmdline.ienc:
+            cmdline.ienc = 'utf-8'
+        self.options = {}
+        self.seconds = 0
+        for char in (False, True):
+            cmdline.char = char
+            if old:
+                self.options[char] = old_options(self.module, cmdline, fn)
+            else:
+                self.options[char] = self.module.create_options(cmdline)
+            # compile the regular expressions before the measurements
+            self.convert('Text $x$ \\textbf{y}.\n', char)
+
+    #   result of conversion: (plain text, numbers, messages),
+    #   or (None, None, messages) after an error exit or exception
+    #
+    def convert(self, txt, char):
+        mod = self.module
+        err = io.StringIO()
+        save_stderr = sys.stderr
+        sys.stderr = err
+        start = time.perf_counter()
+        try:
+            (plain, nums) = mod.tex2txt(txt, self.options[char])
+            nums = list(nums)
+        except SystemExit:
+            mod.warning_or_error.msg = ''
+            (plain, nums) = (None, None)
+        except Exception as e:
+            # e.g. a crash of the candidate
+            err.write('=== exception ' + type(e).__name__ + ': ' + str(e))
+            (plain, nums) = (None, None)
+        finally:
+            sys.stderr = save_stderr
+            self.seconds += time.perf_counter() - start
+        return (plain, nums, err.getvalue())
+
+#   Options object of an older tex2txt.py from a command line parsed by
+#   the current version
+#
+def old_options(module, cmdline, fn):
+    known = inspect.signature(module.Options).parameters
+    default = vars(tex2txt.Options())
+    for (name, value) in vars(tex2txt.create_options(cmdline)).items():
+        if name not in known and value != default[name]:
+            tex2txt.fatal('option for "' + name + '" not supported by ' + fn)
+    kw = dict(
+            repl=module.read_replacements(cmdline.repl,
+                                            encoding=cmdline.ienc),
+            char=cmdline.char,
+            defs=module.read_definitions(cmdline.defs, encoding='utf-8'),
+            extr=cmdline.extr,
+            lang=cmdline.lang,
+            unkn=cmdline.unkn)
+    return module.Options(**{k: v for (k, v) in kw.items() if k in known})
+
+#   compare both sides: return description of first difference or None
+#
+def compare(ref, cand, txt):
+    res = [(char, ref.convert(txt, char), cand.convert(txt, char))
+                for char in (False, True)]
+    for (char, r, c) in res:
+        for (i, what) in enumerate(('plain text', 'numbers', 'messages')):
+            if r[i] == c[i]:
+                continue
+            if i == 1 and r[0] is not None:
+                what = 'character offsets' if char else 'line numbers'
+            pos = first_difference(r[i], c[i])
+            return (what + ' differ at index ' + str(pos) + ': '
+                        + excerpt(r[i], pos) + ' != ' + excerpt(c[i], pos))
+    return None
+
+def first_difference(a, b):
+    if a is None or b is None:
+        return 0
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+def excerpt(a, pos):
+    if a is None:
+        return 'None (error exit)'
+    return repr(a[pos:pos+20])
+
+#   delta debugging: reduce list items, as long as fails(items) is true,
+#   by removal of chunks; at most max_tests calls of fails()
+#
+def minimize(items, fails, max_tests=minimize_tests):
+    tests = 0
+    n = 2
+    while len(items) >= 2 and tests < max_tests:
+        size = (len(items) + n - 1) // n
+        for beg in range(0, len(items), size):
+            rest = items[:beg] + items[beg+size:]
+            tests += 1
+            if fails(rest):
+                items = rest
+                n = max(n - 1, 2)
+                break
+            if tests >= max_tests:
+                break
+        else:
+            if n >= len(items):
+                break
+            n = min(2 * n, len(items))
+    return items
+
+#   reduce failing input: first lines, then characters
+#
+def minimize_input(ref, cand, txt, max_tests=minimize_tests):
+    def fails(parts):
+        return compare(ref, cand, ''.join(parts)) is not None
+    lines = minimize(txt.splitlines(keepends=True), fails, max_tests)
+    return ''.join(minimize(list(''.join(lines)), fails, max_tests))
+
+#   documents: list of (name, text)
+#
+def find_documents(paths, encoding):
+    docs = []
+    for path in paths:
+        if os.path.isdir(path):
+            fns = []
+            for (dirpath, dirnames, filenames) in os.walk(path):
+                dirnames.sort()
+                fns += [os.path.join(dirpath, fn) for fn in sorted(filenames)
+                            if fn.endswith('.tex')]
+        else:
+            fns = [path]
+        for fn in fns:
+            with open(fn, encoding=encoding) as f:
+                docs.append((fn, f.read()))
+    return docs
+
+def generate_documents(count, size, seed):
+    import t2t_bench
+    return [('generated-' + str(seed + i),
+                t2t_bench.generate(t2t_bench.Params(seed=seed + i,
+                                                    size=size)))
+                for i in range(count)]
+
+#   run comparison for all documents, write minimized inputs to outdir;
+#   return number of failed documents
+#
+def run_diff(ref, cand, docs, outdir=None, log=None,
+                max_tests=minimize_tests):
+    log = log or sys.stdout
+    failed = 0
+    (total_ref, total_cand) = (0, 0)
+    for (name, txt) in docs:
+        (ref.seconds, cand.seconds) = (0, 0)
+        diff = compare(ref, cand, txt)
+        (total_ref, total_cand) = (total_ref + ref.seconds,
+                                    total_cand + cand.seconds)
+        log.write('{:10.4f} s {:10.4f} s {:8} {}\n'.format(ref.seconds,
+                    cand.seconds, ratio(ref.seconds, cand.seconds), name))
+        if diff is None:
+            continue
+        failed += 1
+        log.write('=== ' + name + ': ' + diff + '\n')
+        small = minimize_input(ref, cand, txt, max_tests)
+        log.write('=== minimized input (' + str(len(small)) + ' characters): '
+                    + repr(small[:200]) + '\n')
+        log.write('=== ' + compare(ref, cand, small) + '\n')
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+            fn = os.path.join(outdir, os.path.basename(name) + '.min.tex')
+            with open(fn, mode='w', encoding='utf-8') as f:
+                f.write(small)
+        log.flush()
+    log.write('=== documents: ' + str(len(docs)) + ', differences: '
+                + str(failed) + '\n')
+    log.write('=== total: {:.4f} s reference, {:.4f} s candidate,'
+                ' candidate / reference: {}\n'.format(total_ref, total_cand,
+                    ratio(total_ref, total_cand)))
+    log.flush()
+    return failed
+
+def ratio(ref, cand):
+    return '{:.3f}'.format(cand / ref) if ref else '-'
+
+def create_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', nargs='*')
+    parser.add_argument('--reference', help='file tex2txt.py')
+    parser.add_argument('--candidate', help='file tex2txt.py')
+    parser.add_argument('--reference-options', default='',
+                            help='options of tex2txt.py, as one argument')
+    parser.add_argument('--candidate-options', default='',
+                            help='options of tex2txt.py, as one argument')
+    parser.add_argument('--generate', type=int, default=0,
+                            help='number of generated documents')
+    parser.add_argument('--size', type=int, default=20000,
+                            help='size of generated documents')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--ienc', default='utf-8')
+    parser.add_argument('--outdir', help='directory for minimized inputs')
+    parser.add_argument('--max-tests', type=int, default=minimize_tests)
+    return parser
+
+def main(argv=None):
+    cmdline = create_parser().parse_args(argv)
+    docs = find_documents(cmdline.file, cmdline.ienc)
+    docs += generate_documents(cmdline.generate, cmdline.size, cmdline.seed)
+    if not docs:
+        tex2txt.fatal('no documents: give files or option --generate')
+    ref = Side('reference', cmdline.reference, cmdline.reference_options)
+    cand = Side('candidate', cmdline.candidate, cmdline.candidate_options)
+    failed = run_diff(ref, cand, docs, cmdline.outdir,
+                        max_tests=cmdline.max_tests)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
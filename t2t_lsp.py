@@ -0,0 +1,420 @@
+#
+#   Tex2txt, a flexible LaTeX filter
+#   Copyright (C) 2018-2020 Matthias Baumann
+#
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+#
+#   Python3:
+#   Language Server Protocol front end for tex2txt.py and LanguageTool
+#
+#   - python3 t2t_lsp.py [--server url] [--language lang] [--delay ms] ...
+#     is started by the editor, communication via stdin / stdout
+#   - documents are kept in memory and updated with incremental changes
+#   - after a pause in typing (option --delay), a document is split
+#     into regions at safe blank lines, see tex2txt.region_starts();
+#     only regions with changed LaTeX text are converted again,
+#     and only regions with changed plain text are sent to LT
+#     (in a single HTTP request)
+#   - LT matches are mapped back to LaTeX positions and published
+#     as diagnostics
+#
+#   Usage: see README.md
+#
+
+# default address of LT server, compare shell.py
+#
+ltserver_local = 'http://localhost:8081/v2/check'
+
+# separator between regions in a joint request to LT
+#
+region_separator = '\n\n'
+
+# maximum number of entries in the caches for conversion and LT results
+#
+cache_entries = 5000
+
+
+#####################################################################
+#
+#   implementation
+#
+#####################################################################
+
+import argparse
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import tex2txt
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--server', default=ltserver_local)
+parser.add_argument('--language', default='en-GB')
+parser.add_argument('--t2t-lang')
+parser.add_argument('--disable')
+parser.add_argument('--defs')
+parser.add_argument('--repl')
+parser.add_argument('--encoding', default='utf-8')
+parser.add_argument('--delay', type=int, default=500,
+                        help='milliseconds to wait after last change')
+
+def log(msg):
+    sys.stderr.write('=== t2t_lsp: ' + msg + '\n')
+    sys.stderr.flush()
+
+#####################################################################
+#
+#   JSON-RPC messages with Content-Length header
+#
+#####################################################################
+
+def read_message(f):
+    length = None
+    while True:
+        lin = f.readline()
+        if not lin:
+            return None
+        lin = lin.decode('ascii').strip()
+        if not lin:
+            break
+        (name, _, value) = lin.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    if length is None:
+        return None
+    return json.loads(f.read(length).decode('utf-8'))
+
+write_lock = threading.Lock()
+def write_message(f, msg):
+    s = json.dumps(msg).encode('utf-8')
+    with write_lock:
+        f.write(b'Content-Length: ' + str(len(s)).encode('ascii')
+                    + b'\r\n\r\n' + s)
+        f.flush()
+
+#####################################################################
+#
+#   positions: LSP counts UTF-16 code units in a line
+#
+#####################################################################
+
+def utf16_len(s):
+    return len(s.encode('utf-16-le')) // 2
+
+class Document:
+    def __init__(self, uri, text, version):
+        self.uri = uri
+        self.version = version
+        self.set_text(text)
+
+    def set_text(self, text):
+        self.text = text
+        self.line_starts = [0]
+        i = text.find('\n')
+        while i >= 0:
+            self.line_starts.append(i + 1)
+            i = text.find('\n', i + 1)
+
+    def offset(self, pos):
+        # LSP position -> offset in self.text
+        lin = pos['line']
+        if lin >= len(self.line_starts):
+            return len(self.text)
+        beg = self.line_starts[lin]
+        end = (self.line_starts[lin+1] - 1 if lin + 1 < len(self.line_starts)
+                    else len(self.text))
+        units = pos['character']
+        i = beg
+        while i < end and units > 0:
+            units -= 2 if ord(self.text[i]) > 0xffff else 1
+            i += 1
+        return i
+
+    def position(self, off):
+        # offset in self.text -> LSP position
+        lin = bisect.bisect_right(self.line_starts, off) - 1
+        beg = self.line_starts[lin]
+        return {'line': lin, 'character': utf16_len(self.text[beg:off])}
+
+    def apply_change(self, change):
+        if 'range' not in change:
+            self.set_text(change['text'])
+            return
+        beg = self.offset(change['range']['start'])
+        end = self.offset(change['range']['end'])
+        self.set_text(self.text[:beg] + change['text'] + self.text[end:])
+
+#####################################################################
+#
+#   conversion and checking
+#
+#   - caches: LaTeX text of region -> (plain, charmap),
+#     plain text of region -> LT matches
+#
+#####################################################################
+
+class Cache(dict):
+    def put(self, key, value):
+        if len(self) >= cache_entries:
+            self.clear()
+        self[key] = value
+
+conversions = Cache()
+lt_results = Cache()
+
+def convert_region(tex, options):
+    if tex in conversions:
+        return conversions[tex]
+    try:
+        # message may remain from aborted previous conversion
+        tex2txt.warning_or_error.msg = ''
+        (plain, charmap) = tex2txt.tex2txt(tex, options)
+    except SystemExit:
+        # error message has been written to stderr
+        (plain, charmap) = ('', [])
+    conversions.put(tex, (plain, charmap))
+    return (plain, charmap)
+
+def split_regions(tex, options):
+    starts = [0] + tex2txt.region_starts(tex, options)
+    ends = starts[1:] + [len(tex)]
+    return [(beg, tex[beg:end]) for (beg, end) in zip(starts, ends)
+                if beg < end]
+
+def run_languagetool(plains, cmdline):
+    # check new plain texts in one request, return list of match lists
+    offsets = []
+    pos = 0
+    for plain in plains:
+        offsets.append(pos)
+        pos += len(plain) + len(region_separator)
+    data = {'text': region_separator.join(plains),
+            'language': cmdline.language}
+    if cmdline.disable:
+        data['disabledRules'] = cmdline.disable
+    data = urllib.parse.urlencode(data).encode(encoding='ascii')
+    request = urllib.request.Request(cmdline.server, data=data)
+    try:
+        reply = urllib.request.urlopen(request)
+        out = reply.read()
+        reply.close()
+        matches = json.loads(out.decode('utf-8'))['matches']
+    except Exception as e:
+        log('error connecting to "' + cmdline.server + '": ' + str(e))
+        return None
+    results = [[] for _ in plains]
+    for m in matches:
+        try:
+            off = m['offset']
+            length = m['length']
+        except (KeyError, TypeError):
+            continue
+        i = bisect.bisect_right(offsets, off) - 1
+        if i < 0 or off + length > offsets[i] + len(plains[i]):
+            # match in or across separator
+            continue
+        m = dict(m)
+        m['offset'] = off - offsets[i]
+        results[i].append(m)
+    return results
+
+def create_diagnostic(doc, beg, tex, plain, charmap, m):
+    # compare generate_html() in shell.py
+    off = m['offset']
+    end = off + max(1, m['length'])
+    if off >= len(charmap) or not charmap:
+        return None
+    end = min(end, len(charmap))
+    unsure = (charmap[off] < 0 or charmap[max(off, end - 1)] < 0)
+    b = abs(charmap[off]) - 1
+    e = abs(charmap[max(off, end - 1)])
+    if unsure or e <= b:
+        e = b + 1
+    msg = m.get('message', '')
+    repls = [r.get('value', '') for r in m.get('replacements', [])[:5]]
+    if repls:
+        msg += '\nSuggestion: ' + ' | '.join(repls)
+    rule = m.get('rule', {}).get('id', '')
+    return {
+        'range': {'start': doc.position(beg + b),
+                    'end': doc.position(beg + min(e, len(tex)))},
+        'severity': 2,
+        'source': 'LanguageTool',
+        'code': rule,
+        'message': msg,
+    }
+
+def check_document(doc, options, cmdline):
+    tex = doc.text
+    if not tex.endswith('\n'):
+        tex += '\n'
+    regions = [(beg, t) + convert_region(t, options)
+                    for (beg, t) in split_regions(tex, options)]
+    new = list(set(plain for (_, _, plain, _) in regions
+                    if plain.strip() and plain not in lt_results))
+    if new:
+        results = run_languagetool(new, cmdline)
+        if results is None:
+            return None
+        for (plain, matches) in zip(new, results):
+            lt_results.put(plain, matches)
+    diags = []
+    for (beg, t, plain, charmap) in regions:
+        for m in lt_results.get(plain, []):
+            d = create_diagnostic(doc, beg, t, plain, charmap, m)
+            if d:
+                diags.append(d)
+    return diags
+
+#####################################################################
+#
+#   server: main thread reads messages, worker thread checks
+#   documents after a pause; tex2txt() is only called by the worker
+#
+#####################################################################
+
+class Server:
+    def __init__(self, cmdline, fin, fout):
+        self.cmdline = cmdline
+        self.fin = fin
+        self.fout = fout
+        self.docs = {}
+        self.pending = {}       # uri -> time of last change
+        self.cond = threading.Condition()
+        self.stop = False
+        self.options = tex2txt.Options(char=True, lang=cmdline.t2t_lang,
+                defs=tex2txt.read_definitions(cmdline.defs, cmdline.encoding),
+                repl=tex2txt.read_replacements(cmdline.repl, cmdline.encoding))
+
+    def notify(self, method, params):
+        write_message(self.fout, {'jsonrpc': '2.0', 'method': method,
+                                    'params': params})
+
+    def schedule(self, uri):
+        with self.cond:
+            self.pending[uri] = time.monotonic()
+            self.cond.notify()
+
+    def worker(self):
+        delay = self.cmdline.delay / 1000
+        while True:
+            with self.cond:
+                while not self.stop:
+                    now = time.monotonic()
+                    due = [u for (u, t) in self.pending.items()
+                                if t + delay <= now]
+                    if due:
+                        break
+                    timeout = (min(self.pending.values()) + delay - now
+                                if self.pending else None)
+                    self.cond.wait(timeout)
+                if self.stop:
+                    return
+                uri = due[0]
+                del self.pending[uri]
+                doc = self.docs.get(uri)
+                if doc is None:
+                    continue
+                # snapshot: document may change during check
+                snap = Document(uri, doc.text, doc.version)
+            try:
+                diags = check_document(snap, self.options, self.cmdline)
+            except KeyboardInterrupt:
+                raise
+            except BaseException:
+                # keep worker alive: report and go on with next document
+                import traceback
+                self.notify('window/logMessage', {'type': 1,
+                        'message': 't2t_lsp: check of ' + uri + ' failed:\n'
+                                    + traceback.format_exc()})
+                continue
+            if diags is None:
+                continue
+            with self.cond:
+                if uri in self.pending or uri not in self.docs:
+                    # outdated
+                    continue
+            self.notify('textDocument/publishDiagnostics',
+                    {'uri': uri, 'version': snap.version,
+                        'diagnostics': diags})
+
+    def handle(self, msg):
+        method = msg.get('method')
+        params = msg.get('params', {})
+        if method == 'initialize':
+            return {'capabilities': {
+                        'textDocumentSync': {'openClose': True, 'change': 2}},
+                    'serverInfo': {'name': 't2t_lsp'}}
+        if method == 'shutdown':
+            return None
+        if method == 'textDocument/didOpen':
+            td = params['textDocument']
+            with self.cond:
+                self.docs[td['uri']] = Document(td['uri'], td['text'],
+                                                    td.get('version'))
+            self.schedule(td['uri'])
+        elif method == 'textDocument/didChange':
+            uri = params['textDocument']['uri']
+            with self.cond:
+                doc = self.docs.get(uri)
+                if doc is None:
+                    return None
+                for change in params['contentChanges']:
+                    doc.apply_change(change)
+                doc.version = params['textDocument'].get('version')
+            self.schedule(uri)
+        elif method == 'textDocument/didClose':
+            uri = params['textDocument']['uri']
+            with self.cond:
+                self.docs.pop(uri, None)
+                self.pending.pop(uri, None)
+            self.notify('textDocument/publishDiagnostics',
+                            {'uri': uri, 'diagnostics': []})
+        return None
+
+    def run(self):
+        thread = threading.Thread(target=self.worker, daemon=True)
+        thread.start()
+        while True:
+            msg = read_message(self.fin)
+            if msg is None or msg.get('method') == 'exit':
+                break
+            try:
+                result = self.handle(msg)
+                error = None
+            except Exception as e:
+                (result, error) = (None, {'code': -32603, 'message': str(e)})
+            if 'id' in msg and 'method' in msg:
+                reply = {'jsonrpc': '2.0', 'id': msg['id']}
+                if error:
+                    reply['error'] = error
+                else:
+                    reply['result'] = result
+                write_message(self.fout, reply)
+        with self.cond:
+            self.stop = True
+            self.cond.notify()
+        thread.join()
+
+if __name__ == '__main__':
+    cmdline = parser.parse_args()
+    Server(cmdline, sys.stdin.buffer, sys.stdout.buffer).run()
@@ -0,0 +1,65 @@
+#
+#   tex2txt.py:
+#   test of batch mode with options --outdir and --jobs
+#
+
+import os
+import subprocess
+import sys
+
+script = os.path.abspath('tex2txt.py')
+
+files = {
+    'a.tex': 'Only few people\\footnote{We use\n\\textcolor{red}{redx}}\n',
+    'b.tex': 'Text $x$ and $y$.\n\n\\begin{equation}\na=b.\n\\end{equation}\n',
+    'sub/c.tex': '\\section{Title}\nText\\,text.\n',
+}
+
+def run(cwd, args):
+    out = subprocess.run([sys.executable, script] + args, cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+def read(fn):
+    with open(fn, encoding='utf-8') as f:
+        return f.read()
+
+def test_batch(tmp_path):
+    cwd = str(tmp_path)
+    for f in files:
+        fn = os.path.join(cwd, f)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        with open(fn, mode='w', encoding='utf-8') as fp:
+            fp.write(files[f])
+
+    for (outdir, jobs) in (('seq', '1'), ('par', '3')):
+        (ret, _) = run(cwd, ['--lang', 'en', '--char', '--nums', 'chr',
+                        '--outdir', outdir, '--jobs', jobs] + list(files))
+        assert ret == 0
+
+    for f in files:
+        (ret, out) = run(cwd, ['--lang', 'en', '--char',
+                                '--nums', 'single.chr', f])
+        assert ret == 0
+        for outdir in ('seq', 'par'):
+            fn = os.path.join(cwd, outdir, f)
+            assert read(fn + '.txt') == out
+            assert read(fn + '.chr') == read(os.path.join(cwd, 'single.chr'))
+
+def test_batch_outside(tmp_path):
+    cwd = tmp_path / 'work'
+    cwd.mkdir()
+    (tmp_path / 'x.tex').write_text('Text.\n', encoding='utf-8')
+    (ret, _) = run(str(cwd), ['--outdir', 'out', '--nums', 'lin', '../x.tex',
+                                str(tmp_path / 'x.tex')])
+    assert ret == 0
+    assert read(str(cwd / 'out' / '__' / 'x.tex.txt')) == 'Text.\n'
+    assert os.path.exists(str(cwd / 'out' / '__' / 'x.tex.lin'))
+    fn = str(cwd / 'out') + str(tmp_path / 'x.tex.txt')
+    assert read(fn) == 'Text.\n'
+
+    # output next to input file, as in shell.sh
+    (cwd / 'y.tex').write_text('Text.\n', encoding='utf-8')
+    (ret, _) = run(str(cwd), ['--outdir', '.', 'y.tex'])
+    assert ret == 0
+    assert read(str(cwd / 'y.tex.txt')) == 'Text.\n'
@@ -0,0 +1,73 @@
+#
+#   t2t_bench.py:
+#   test of document generator and benchmark
+#
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import t2t_bench
+import tex2txt
+
+bench_py = os.path.abspath('t2t_bench.py')
+
+def test_generate():
+    params = t2t_bench.Params(seed=3, size=5000, verbs=2, equations=1,
+                                defs=4, repl=5)
+    txt = t2t_bench.generate(params)
+    assert txt == t2t_bench.generate(params)
+    assert len(txt) >= 5000
+    assert txt.count('\\verb|') > 10
+    assert '\\begin{equation}' in txt and '\\begin{align}' in txt
+    assert '\\benchd{' in txt
+    assert txt != t2t_bench.generate(t2t_bench.Params(seed=4, size=5000))
+    assert len(t2t_bench.generate_repl(params)) == 6
+
+    # generated macros are declared for option --defs
+    options = t2t_bench.create_options(params, False, unkn=True)
+    unknowns = tex2txt.tex2txt(txt, options)[0].split()
+    assert '\\emph' in unknowns
+    assert not [u for u in unknowns if u.startswith('\\bench')]
+    options = t2t_bench.create_options(params, True)
+    (plain, nums) = tex2txt.tex2txt(txt, options)
+    assert '\\benchd' not in plain and '\\verb' not in plain
+
+def test_benchmark():
+    params = t2t_bench.Params(depth=2)
+    log = io.StringIO()
+    # memory tracing needs Python 3.9+, see LAB:MEMORY in tex2txt.py
+    memory = sys.version_info >= (3, 9)
+    res = t2t_bench.run_benchmark(params, [2000, 4000], ['lin', 'char'],
+                                    repeat=1, memory=memory, log=log)
+    assert [(r['mode'], r['chars'] >= s) for (s, r) in zip(
+                [2000, 2000, 4000, 4000], res['results'])] == [
+                ('lin', True), ('char', True), ('lin', True), ('char', True)]
+    if memory:
+        assert all(r['peak_bytes'] > 0 for r in res['results'])
+    assert set(res['exponents']) == {'lin', 'char'}
+    assert len(log.getvalue().splitlines()) == 4
+    assert t2t_bench.fit_exponent([{'chars': 10, 'seconds': 1},
+                                    {'chars': 100, 'seconds': 100}]) == 2
+
+def test_script(tmp_path):
+    def run(args):
+        return subprocess.run([sys.executable, bench_py] + args,
+                    cwd=str(tmp_path), stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE)
+    args = ['--sizes', '1000,2000', '--repeat', '1', '--defs', '2']
+    out = run(args + ['--save-docs', 'docs', 'a.json'])
+    assert out.returncode == 0
+    assert sorted(os.listdir(str(tmp_path / 'docs'))) == ['bench-1000.tex',
+                    'bench-2000.tex', 'bench-defs.py', 'bench-repl.txt']
+    with open(str(tmp_path / 'a.json'), encoding='utf-8') as f:
+        res = json.load(f)
+    assert res['version'] == t2t_bench.result_version
+    assert res['params']['defs'] == 2 and res['sizes'] == [1000, 2000]
+
+    out = run(args + ['--compare', 'a.json', '--max-exponent', '-5',
+                        'b.json'])
+    assert out.returncode == 1
+    assert b'=== comparison:' in out.stdout
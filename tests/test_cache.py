@@ -0,0 +1,63 @@
+#
+#   tex2txt.py:
+#   test of on-disk result cache, see LAB:CACHE
+#
+
+import array
+import os
+import tex2txt
+
+latex = r"""
+Only few people\footnote{We use
+\textcolor{red}{redx colour.}}
+is lazy.
+"""
+
+def test_cache_hit(tmp_path):
+    for char in (False, True):
+        options = tex2txt.Options(lang='en', char=char,
+                                    cache_dir=str(tmp_path))
+        ref = tex2txt.tex2txt(latex, tex2txt.Options(lang='en', char=char))
+        miss = tex2txt.tex2txt(latex, options)
+        hit = tex2txt.tex2txt(latex, options)
+        assert miss == ref
+        assert hit == ref
+    # one entry for each tracking mode
+    assert len(os.listdir(str(tmp_path))) == 2
+
+def test_cache_lowmem(tmp_path):
+    # hit and miss give the same type of number array
+    options = tex2txt.Options(lang='en', char=True, lowmem=True,
+                                cache_dir=str(tmp_path))
+    miss = tex2txt.tex2txt(latex, options)
+    hit = tex2txt.tex2txt(latex, options)
+    assert type(miss[1]) is array.array
+    assert type(hit[1]) is array.array
+    assert hit == miss
+
+def test_cache_key():
+    options = tex2txt.Options(lang='en')
+    key = tex2txt.cache_key(latex, options)
+    assert key == tex2txt.cache_key(latex, tex2txt.Options(lang='en'))
+    assert key != tex2txt.cache_key(latex + ' ', options)
+    assert key != tex2txt.cache_key(latex, tex2txt.Options(lang='de'))
+    assert key != tex2txt.cache_key(latex, tex2txt.Options(lang='en',
+                                                extr='footnote'))
+    defs = tex2txt.Definitions('defs.project_macros = ()', 'x.py')
+    assert key != tex2txt.cache_key(latex, tex2txt.Options(lang='en',
+                                                defs=defs))
+
+def test_cache_eviction(tmp_path):
+    options = tex2txt.Options(lang='en', cache_dir=str(tmp_path),
+                                cache_size=1)
+    tex2txt.tex2txt(latex, options)
+    tex2txt.tex2txt(latex + 'x', options)
+    assert len(os.listdir(str(tmp_path))) == 0
+
+def test_cache_corrupt(tmp_path):
+    options = tex2txt.Options(lang='en', cache_dir=str(tmp_path))
+    ref = tex2txt.tex2txt(latex, options)
+    fn = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    with open(fn, mode='r+b') as f:
+        f.truncate(10)
+    assert tex2txt.tex2txt(latex, options) == ref
@@ -0,0 +1,79 @@
+#
+#   t2t_corpus.py:
+#   test of resumable corpus conversion
+#
+
+import json
+import os
+import subprocess
+import sys
+
+corpus_py = os.path.abspath('t2t_corpus.py')
+tex2txt_py = os.path.abspath('tex2txt.py')
+
+latex = 'Text \\textbf{bold} $x$.\n'
+slow = ''.join('\\section{S%d}\nText $x_%d$ \\emph{e}.\n\n' % (i, i)
+                    for i in range(4000))
+
+def run(args, cwd):
+    out = subprocess.run([sys.executable, corpus_py] + args, cwd=cwd,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+def manifest(out):
+    with open(os.path.join(out, 't2t-manifest.jsonl')) as f:
+        return [json.loads(lin) for lin in f]
+
+def test_corpus(tmp_path):
+    cwd = str(tmp_path)
+    src = tmp_path / 'src'
+    (src / 'sub').mkdir(parents=True)
+    for fn in ('a.tex', 'sub/b.tex', 'sub/c.tex'):
+        (src / fn).write_text(latex + fn + '\n')
+    (src / 'sub' / 'd.txt').write_text('not converted')
+
+    (status, stdout) = run(['--jobs', '2', '--nums', 'lin', 'src', 'out'],
+                                cwd)
+    assert status == 0
+    assert '=== converted files: 3 ' in stdout
+    assert '=== slowest files:' in stdout
+    entries = manifest(os.path.join(cwd, 'out'))
+    assert sorted(e['file'] for e in entries) == [
+                        'a.tex', os.path.join('sub', 'b.tex'),
+                        os.path.join('sub', 'c.tex')]
+    assert all(e['status'] == 'ok' and 'sha256_txt' in e
+                    and 'sha256_lin' in e for e in entries)
+    expect = subprocess.run([sys.executable, tex2txt_py, 'src/sub/b.tex'],
+                cwd=cwd, stdout=subprocess.PIPE).stdout.decode('utf-8')
+    assert (tmp_path / 'out' / 'sub' / 'b.tex.txt').read_text() == expect
+
+    # resume: only changed and new files are converted
+    (src / 'sub' / 'b.tex').write_text(latex + 'changed\n')
+    (src / 'e.tex').write_text(latex)
+    (status, stdout) = run(['--nums', 'lin', 'src', 'out'], cwd)
+    assert status == 0
+    assert '=== converted files: 2 ' in stdout
+    assert len(manifest(os.path.join(cwd, 'out'))) == 5
+
+def test_quarantine(tmp_path):
+    cwd = str(tmp_path)
+    src = tmp_path / 'src'
+    src.mkdir()
+    (src / 'a.tex').write_text(latex)
+    (src / 'slow.tex').write_text(slow)
+    (src / 'z.tex').write_text(latex)
+
+    (status, stdout) = run(['--jobs', '1', '--timeout', '0.5', 'src', 'out'],
+                                cwd)
+    assert status == 1
+    assert '=== timeout: 1' in stdout
+    entries = {e['file']: e['status']
+                    for e in manifest(os.path.join(cwd, 'out'))}
+    assert entries == {'a.tex': 'ok', 'slow.tex': 'timeout', 'z.tex': 'ok'}
+
+    # quarantined files are skipped on resume, unless --retry is given
+    (status, stdout) = run(['src', 'out'], cwd)
+    assert status == 0
+    assert '=== converted files: 0 ' in stdout
+    (status, stdout) = run(['--retry', '--timeout', '0.5', 'src', 'out'], cwd)
+    assert '=== converted files: 1 ' in stdout
@@ -0,0 +1,139 @@
+#
+#   t2t_daemon.py:
+#   test of conversion daemon and client
+#
+
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+tex2txt_py = os.path.abspath('tex2txt.py')
+daemon_py = os.path.abspath('t2t_daemon.py')
+
+latex = 'Text\\footnote{We \\abc\n\\textcolor{red}{redx}} $x$.\n'
+
+def run(cmd, cwd, env, inp=''):
+    out = subprocess.run([sys.executable] + cmd, cwd=cwd, env=env,
+                input=inp.encode('utf-8'), stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='no Unix sockets')
+def test_daemon(tmp_path):
+    cwd = str(tmp_path)
+    env = dict(os.environ)
+    env['T2T_DAEMON'] = os.path.join(cwd, 'run', 'sock')
+    with open(os.path.join(cwd, 'defs.py'), mode='w') as f:
+        f.write('defs.project_macros = (Simple("abc", "ABC"),)\n')
+    with open(os.path.join(cwd, 'x.tex'), mode='w') as f:
+        f.write(latex)
+
+    # without daemon: fallback to tex2txt.py
+    args = ['--defs', 'defs.py', '--char', '--nums', 'n', 'x.tex']
+    expect = run([tex2txt_py] + args, cwd, env)
+    with open(os.path.join(cwd, 'n')) as f:
+        expect_nums = f.read()
+    assert run([daemon_py] + args, cwd, env) == expect
+
+    server = subprocess.Popen([sys.executable, daemon_py, '--serve'],
+                cwd=cwd, env=env, stderr=subprocess.DEVNULL)
+    try:
+        for i in range(100):
+            if os.path.exists(env['T2T_DAEMON']):
+                break
+            time.sleep(0.1)
+        # private directory and socket
+        assert os.stat(os.path.join(cwd, 'run')).st_mode & 0o777 == 0o700
+        assert os.stat(env['T2T_DAEMON']).st_mode & 0o777 == 0o600
+
+        os.remove(os.path.join(cwd, 'n'))
+        assert run([daemon_py] + args, cwd, env) == expect
+        with open(os.path.join(cwd, 'n')) as f:
+            assert f.read() == expect_nums
+
+        # standard input
+        assert run([daemon_py, '--defs', 'defs.py'], cwd, env, latex) \
+                    == run([tex2txt_py, '--defs', 'defs.py'], cwd, env, latex)
+
+        # errors
+        assert run([daemon_py, 'missing.tex'], cwd, env)[0] == 1
+        assert run([daemon_py, 'x.tex'], cwd, env)[1].startswith('Text')
+
+        # changed file from --defs is read again
+        time.sleep(0.01)
+        with open(os.path.join(cwd, 'defs.py'), mode='w') as f:
+            f.write('defs.project_macros = (Simple("abc", "XYZXYZ"),)\n')
+        assert 'XYZXYZ' in run([daemon_py, '--defs', 'defs.py', 'x.tex'],
+                                    cwd, env)[1]
+    finally:
+        subprocess.run([sys.executable, daemon_py, '--stop'], env=env)
+        server.wait(timeout=10)
+    assert not os.path.exists(env['T2T_DAEMON'])
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='no user IDs')
+def test_foreign_dir(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(os.path.dirname(daemon_py))
+    import t2t_daemon
+    addr = str(tmp_path / 'sock')
+    assert t2t_daemon.check_dir(addr) is None
+    assert 'not found' in t2t_daemon.check_dir(str(tmp_path / 'x' / 'sock'))
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    assert 'another user' in t2t_daemon.check_dir(addr)
+    monkeypatch.setenv('T2T_DAEMON', addr)
+    assert t2t_daemon.serve() == 1
+    assert t2t_daemon.connect() is None
+
+class CountCompile:
+    def __init__(self, module):
+        self.module = module
+        self.n = 0
+    def compile(self, expr, flags=0):
+        self.n += 1
+        return self.module.compile(expr, flags)
+
+def test_prepared(tmp_path, monkeypatch):
+    monkeypatch.syspath_prepend(os.path.dirname(daemon_py))
+    import t2t_daemon
+    import tex2txt
+    monkeypatch.chdir(tmp_path)
+    with open('x.tex', mode='w') as f:
+        f.write(latex)
+
+    def convert(argv):
+        out = io.StringIO()
+        tex2txt.main(argv, stdout=out)
+        return out.getvalue()
+
+    expect = convert(['--char', 'x.tex'])
+    create_options = tex2txt.create_options
+    created = []
+    def create(cmdline):
+        created.append(cmdline)
+        return create_options(cmdline)
+    monkeypatch.setattr(tex2txt, 'create_options',
+                t2t_daemon.prepared_options(create, tex2txt.rx, {}))
+    monkeypatch.setattr(tex2txt.rx, 'patterns', None)
+    monkeypatch.setattr(tex2txt.rx, 'module', CountCompile(tex2txt.re))
+
+    assert convert(['--char', 'x.tex']) == expect
+    assert len(created) == 1
+    assert tex2txt.rx.module.n > 0
+
+    # second request: same Options object and compiled expressions
+    patterns = tex2txt.rx.patterns
+    tex2txt.rx.module.n = 0
+    assert convert(['--char', 'x.tex']) == expect
+    assert len(created) == 1
+    assert tex2txt.rx.module.n == 0
+    assert tex2txt.rx.patterns is patterns
+
+    # other options: new set
+    convert(['--lang', 'en', 'x.tex'])
+    assert len(created) == 2
+    assert tex2txt.rx.patterns is not patterns
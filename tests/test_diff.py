@@ -0,0 +1,91 @@
+#
+#   t2t_diff.py:
+#   test of differential comparison and minimization
+#
+
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import t2t_diff
+import tex2txt
+
+diff_py = os.path.abspath('t2t_diff.py')
+
+latex = r"""Text with \textbf{bold} and $x$.
+
+A~B and \emph{x}.
+\begin{itemize}
+\item First
+\end{itemize}
+"""
+
+def test_minimize():
+    calls = []
+    def fails(items):
+        calls.append(1)
+        return 'x' in items and 'y' in items
+    items = list('abcxdefghyijk')
+    assert t2t_diff.minimize(items, fails) == ['x', 'y']
+    assert t2t_diff.minimize(items, fails, 3) != ['x', 'y']
+    assert len(calls) < 100
+
+@pytest.mark.parametrize('opts', ['--low-memory', '--atomic --low-memory'])
+def test_equal(opts):
+    if '--atomic' in opts and sys.version_info < (3, 11):
+        pytest.skip('atomic groups need Python 3.11+')
+    ref = t2t_diff.Side('reference', None, '')
+    cand = t2t_diff.Side('candidate', None, opts)
+    docs = [('latex', latex)] + t2t_diff.generate_documents(2, 3000, 1)
+    log = io.StringIO()
+    assert t2t_diff.run_diff(ref, cand, docs, log=log) == 0
+    assert '=== documents: 3, differences: 0' in log.getvalue()
+
+def test_old_reference(tmp_path, monkeypatch):
+    # reference: tex2txt.py of the first commit, without create_options()
+    out = subprocess.run(['git', 'rev-list', '--max-parents=0', 'HEAD'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode:
+        pytest.skip('no git repository')
+    root = out.stdout.decode('ascii').split()[-1]
+    out = subprocess.run(['git', 'show', root + ':tex2txt.py'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode or b'def create_options' in out.stdout:
+        pytest.skip('no older tex2txt.py')
+    fn = str(tmp_path / 'old.py')
+    with open(fn, mode='wb') as f:
+        f.write(out.stdout)
+
+    ref = t2t_diff.Side('reference', fn, '--lang en')
+    cand = t2t_diff.Side('candidate', None, '--lang en')
+    assert ref.module.Options is not tex2txt.Options
+    log = io.StringIO()
+    assert t2t_diff.run_diff(ref, cand, [('latex', latex)], log=log) == 0
+    # message of the error is restored for the following tests
+    monkeypatch.setattr(tex2txt.warning_or_error, 'msg', '')
+    with pytest.raises(SystemExit):
+        t2t_diff.Side('reference', fn, '--placeholders local')
+
+def test_difference(tmp_path):
+    # candidate: a copy of tex2txt.py with a small change
+    with open('tex2txt.py', encoding='utf-8') as f:
+        code = f.read()
+    old = r"mysub(r'(?<!\\)~', mark_deleted + utf8_nbsp, text)"
+    assert old in code
+    with open(str(tmp_path / 'cand.py'), mode='w', encoding='utf-8') as f:
+        f.write(code.replace(old, old.replace('utf8_nbsp', "' '")))
+    with open(str(tmp_path / 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+
+    out = subprocess.run([sys.executable, diff_py, '--candidate', 'cand.py',
+                            '--outdir', 'min', '--generate', '1', '--size',
+                            '1000', 'x.tex'], cwd=str(tmp_path),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    assert out.returncode == 1
+    assert b'=== documents: 2, differences: 1' in out.stdout
+    with open(str(tmp_path / 'min' / 'x.tex.min.tex'),
+                encoding='utf-8') as f:
+        assert f.read() == '~'
@@ -0,0 +1,80 @@
+#
+#   tex2txt.py:
+#   test of Options.heatmap and option --heatmap
+#
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+# unclosed braces in line 4 lead to long searches
+latex = ('Text with \\textbf{bold} and $x$.\n\n'
+            + 'Another \\emph{paragraph}.\n'
+            + 'Slow: ' + 'x \\textbf{' * 2000 + 'a\n\n'
+            + '\\begin{itemize}\n\\item Last\n\\end{itemize}\n')
+
+def convert(char, multi):
+    reports = []
+    options = tex2txt.Options(lang='en', char=char, heatmap=True,
+                                profile=reports.append)
+    if multi:
+        tex2txt.tex2txt_multi(latex, options, [])
+    else:
+        tex2txt.tex2txt(latex, options)
+    assert len(reports) == 1
+    return reports[0]
+
+@pytest.mark.parametrize('char,multi', [(False, False), (True, False),
+                            (False, True)], ids=['lin', 'char', 'multi'])
+def test_heatmap(char, multi):
+    r = convert(char, multi)
+    lines = r['lines']
+    assert len(lines) == latex.count('\n') + 1
+    assert min(lines) >= 0
+    assert sum(lines) <= r['seconds'] + 1e-3
+    assert max(range(len(lines)), key=lambda i: lines[i]) == 3
+    assert lines[3] > sum(lines) / 2
+
+def test_no_heatmap():
+    reports = []
+    tex2txt.tex2txt(latex, tex2txt.Options(profile=reports.append))
+    assert 'lines' not in reports[0]
+
+def run(cwd, args):
+    out = subprocess.run([sys.executable, script] + args, cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+def read(fn):
+    with open(fn, encoding='utf-8') as f:
+        return f.read()
+
+def test_option(tmp_path):
+    cwd = str(tmp_path)
+    with open(os.path.join(cwd, 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+    (ret, out) = run(cwd, ['--lang', 'en', '--heatmap', 'h.txt', 'x.tex'])
+    assert ret == 0
+    assert out == tex2txt.tex2txt(latex, tex2txt.Options(lang='en'))[0]
+    h = read(os.path.join(cwd, 'h.txt')).split('\n')
+    assert h[0].startswith('=== x.tex: ')
+    assert h[2] == '=== paragraphs by cost'
+    assert 'lines 3-4' in h[3] and 'Another' in h[3]
+    i = h.index('=== lines by cost')
+    assert 'line 4 ' in h[i + 1] and 'Slow: ' in h[i + 1]
+
+    (ret, _) = run(cwd, ['--lang', 'en', '--heatmap', 'h.html', 'x.tex'])
+    assert ret == 0
+    h = read(os.path.join(cwd, 'h.html'))
+    assert h.count('<span title=') == latex.count('\n') + 1
+    assert '    4  Slow: ' in h
+
+    for args in (['--outdir', 'out'], ['--project']):
+        (ret, _) = run(cwd, args + ['--heatmap', 'h.txt', 'x.tex'])
+        assert ret == 1
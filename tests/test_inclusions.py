@@ -0,0 +1,109 @@
+#
+#   tex2txt.py:
+#   test of inclusion_graph() and write_dependencies(),
+#   and of shell.py --include with options --include-cache, --include-deps
+#
+
+import io
+import os
+import re
+import subprocess
+import sys
+
+import tex2txt
+
+shell = os.path.abspath('shell.py')
+
+files = {
+    'main.tex': '\\input{a}\n% \\input{no}\n\\include {b}\n'
+                    + '\\verb?\\input{no}? \\input{fig}\n',
+    'a.tex': 'A \\unknownA\n\\input{b}\\input{c.tex}\n',
+    'b.tex': 'B \\unknownB\n\\input{a}\n',
+    'c.tex': 'C\n',
+    'fig.tex': 'F\n',
+}
+
+def skip(fn):
+    return re.search(r'\Afig\.tex\Z', fn)
+
+def write_files(tmp_path):
+    for (name, txt) in files.items():
+        with open(str(tmp_path / name), mode='w', encoding='utf-8') as f:
+            f.write(txt)
+
+def test_graph(tmp_path, monkeypatch):
+    write_files(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    cache = str(tmp_path / 'cache.json')
+    edges = {
+        'main.tex': ['a.tex', 'b.tex'],
+        'a.tex': ['b.tex', 'c.tex'],
+        'b.tex': ['a.tex'],
+        'c.tex': [],
+    }
+    graph = tex2txt.inclusion_graph(['main.tex', 'c.tex'], 'utf-8',
+                                    skip=skip, cache=cache)
+    assert graph.files == ['main.tex', 'c.tex', 'a.tex', 'b.tex']
+    assert graph.edges == edges
+    assert graph.texts == {fn: files[fn] for fn in edges}
+
+    # unchanged files are not read again
+    graph = tex2txt.inclusion_graph(['main.tex'], 'utf-8', skip=skip,
+                                    cache=cache)
+    assert graph.edges == edges
+    assert graph.texts == {}
+
+    # changed file is read and scanned
+    with open('c.tex', mode='a', encoding='utf-8') as f:
+        f.write('\\input{fig}\\input{d}\n')
+    with open('d.tex', mode='w', encoding='utf-8') as f:
+        f.write('D\n')
+    graph = tex2txt.inclusion_graph(['main.tex'], 'utf-8', skip=skip,
+                                    cache=cache)
+    assert graph.files == ['main.tex', 'a.tex', 'b.tex', 'c.tex', 'd.tex']
+    assert sorted(graph.texts) == ['c.tex', 'd.tex']
+
+    # other inclusion macros: cache entries are not used
+    graph = tex2txt.inclusion_graph(['main.tex'], 'utf-8', cache=cache,
+                                    macros=['include'])
+    assert graph.files == ['main.tex', 'b.tex']
+
+    f = io.StringIO()
+    tex2txt.write_dependencies(tex2txt.inclusion_graph(['main.tex'], 'utf-8'),
+                                    f)
+    assert f.getvalue().splitlines()[0] == 'main.tex: a.tex b.tex fig.tex'
+    assert tex2txt.make_quote('a b$c#d.tex') == 'a\\ b$$c\\#d.tex'
+
+def test_project_compatible(tmp_path):
+    # read_project() uses the same tokenizer
+    write_files(tmp_path)
+    root = str(tmp_path / 'a.tex')
+    graph = tex2txt.inclusion_graph([root], 'utf-8', directory=str(tmp_path))
+    assert graph.edges[root] == [str(tmp_path / 'b.tex'),
+                                    str(tmp_path / 'c.tex')]
+    files['b.tex'] = 'B\n'
+    try:
+        write_files(tmp_path)
+        project = tex2txt.read_project(root, 'utf-8')
+    finally:
+        files['b.tex'] = 'B \\unknownB\n\\input{a}\n'
+    assert project.tex == 'A \\unknownA\nB\nC\n\n'
+
+def test_shell(tmp_path):
+    write_files(tmp_path)
+    def run():
+        out = subprocess.run([sys.executable, shell, '--include',
+                                '--list-unknown', '--skip', 'fig.tex',
+                                '--include-cache', 'cache.json',
+                                '--include-deps', 'deps.mk', 'main.tex'],
+                                cwd=str(tmp_path), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+        assert out.returncode == 0
+        return out.stdout.decode('utf-8')
+    out = run()
+    assert out == ('=== a.tex ===\n\\unknownA\n\n'
+                    + '=== b.tex ===\n\\unknownB\n\n')
+    assert run() == out
+    with open(str(tmp_path / 'deps.mk'), encoding='utf-8') as f:
+        assert f.read() == ('main.tex: a.tex b.tex\na.tex: b.tex c.tex\n'
+                                + 'b.tex: a.tex\n')
@@ -0,0 +1,160 @@
+#
+#   t2t_lsp.py:
+#   test of Language Server Protocol front end with fake LT server
+#
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import urllib.parse
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+lsp_py = os.path.abspath('t2t_lsp.py')
+
+#   fake LT server: reports each "isx", records texts of requests;
+#   a broken match for "crashx"
+#
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        text = urllib.parse.parse_qs(data.decode('ascii'))['text'][0]
+        self.server.texts.append(text)
+        matches = []
+        i = text.find('isx')
+        while i >= 0:
+            matches.append({'offset': i, 'length': 3, 'message': 'Error',
+                            'rule': {'id': 'ISX'},
+                            'replacements': [{'value': 'is'}]})
+            i = text.find('isx', i + 1)
+        if 'crashx' in text:
+            matches.append({'offset': text.find('crashx'), 'length': 6,
+                            'rule': 'broken'})
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'matches': matches}).encode('ascii'))
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def lt_server():
+    httpd = HTTPServer(('localhost', 0), Handler)
+    httpd.texts = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+class Client:
+    def __init__(self, url):
+        self.proc = subprocess.Popen([sys.executable, lsp_py,
+                        '--server', url, '--delay', '50'],
+                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.id = 0
+    def send(self, method, params, request=False):
+        msg = {'jsonrpc': '2.0', 'method': method, 'params': params}
+        if request:
+            self.id += 1
+            msg['id'] = self.id
+        s = json.dumps(msg).encode('utf-8')
+        self.proc.stdin.write(b'Content-Length: ' + str(len(s)).encode()
+                                + b'\r\n\r\n' + s)
+        self.proc.stdin.flush()
+    def receive(self):
+        length = None
+        while True:
+            lin = self.proc.stdout.readline().strip()
+            if not lin:
+                break
+            (name, _, value) = lin.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return json.loads(self.proc.stdout.read(length).decode('utf-8'))
+    def close(self):
+        self.send('shutdown', None, request=True)
+        self.receive()
+        self.send('exit', None)
+        self.proc.stdin.close()
+        self.proc.wait(timeout=10)
+        self.proc.stdout.close()
+
+uri = 'file:///x.tex'
+
+latex = r"""This isx a \textbf{test}.
+
+Second paragraph with $x$ and \ä.
+
+Third \emph{one} isx here.
+"""
+
+def ranges(msg):
+    assert msg['method'] == 'textDocument/publishDiagnostics'
+    return [(d['range']['start']['line'], d['range']['start']['character'],
+                d['range']['end']['line'], d['range']['end']['character'])
+                for d in msg['params']['diagnostics']]
+
+def test_lsp(lt_server):
+    url = 'http://localhost:' + str(lt_server.server_port) + '/v2/check'
+    c = Client(url)
+    c.send('initialize', {}, request=True)
+    caps = c.receive()['result']['capabilities']
+    assert caps['textDocumentSync']['change'] == 2
+
+    c.send('textDocument/didOpen', {'textDocument': {'uri': uri,
+                    'languageId': 'latex', 'version': 1, 'text': latex}})
+    assert ranges(c.receive()) == [(0, 5, 0, 8), (4, 17, 4, 20)]
+    assert len(lt_server.texts) == 1
+
+    # change in second paragraph: only this one is checked again;
+    # position in UTF-16 code units after non-ASCII character
+    c.send('textDocument/didChange', {
+                'textDocument': {'uri': uri, 'version': 2},
+                'contentChanges': [{'range': {
+                        'start': {'line': 2, 'character': 33},
+                        'end': {'line': 2, 'character': 33}},
+                    'text': ' It isx'}]})
+    assert ranges(c.receive()) == [(0, 5, 0, 8), (2, 37, 2, 40),
+                                    (4, 17, 4, 20)]
+    assert len(lt_server.texts) == 2
+    assert 'This' not in lt_server.texts[1]
+    assert 'Third' not in lt_server.texts[1]
+    assert 'Second' in lt_server.texts[1]
+
+    # no new LT request, if only LaTeX markup changes
+    c.send('textDocument/didChange', {
+                'textDocument': {'uri': uri, 'version': 3},
+                'contentChanges': [{'range': {
+                        'start': {'line': 4, 'character': 6},
+                        'end': {'line': 4, 'character': 16}},
+                    'text': r'\textit{one}'}]})
+    assert ranges(c.receive()) == [(0, 5, 0, 8), (2, 37, 2, 40),
+                                    (4, 19, 4, 22)]
+    assert len(lt_server.texts) == 2
+    c.close()
+
+def test_error(lt_server):
+    url = 'http://localhost:' + str(lt_server.server_port) + '/v2/check'
+    c = Client(url)
+    c.send('initialize', {}, request=True)
+    c.receive()
+
+    # exception in check of document is logged
+    c.send('textDocument/didOpen', {'textDocument': {'uri': uri,
+                    'languageId': 'latex', 'version': 1,
+                    'text': 'This crashx.\n'}})
+    msg = c.receive()
+    assert msg['method'] == 'window/logMessage'
+    assert msg['params']['type'] == 1
+    assert 'AttributeError' in msg['params']['message']
+
+    # worker goes on with next document
+    c.send('textDocument/didChange', {
+                'textDocument': {'uri': uri, 'version': 2},
+                'contentChanges': [{'text': 'This isx.\n'}]})
+    assert ranges(c.receive()) == [(0, 5, 0, 8)]
+    c.close()
@@ -0,0 +1,105 @@
+#
+#   tex2txt.py:
+#   test of Options.memory, Options.lowmem and options --memory,
+#   --low-memory
+#
+
+import array
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+latex = r"""Text with \textbf{bold \emph{x}} and $x$,
+only few\footnote{We use \textcolor{red}{redx}.} people.
+% comment
+\begin{itemize}
+\item[A.] First item\\ second line \verb?\x?
+\item Second
+\end{itemize}
+\begin{verbatim}
+\verbatim text
+\end{verbatim}
+\begin{equation}
+a = b, \quad \text{for all} x.
+\end{equation}
+Last \unknown{macro} line, \"a and \'{e}.
+"""
+
+@pytest.mark.parametrize('jobs', [None, 4])
+@pytest.mark.parametrize('lang', ['de', 'en'])
+def test_lowmem(monkeypatch, jobs, lang):
+    monkeypatch.setattr(tex2txt, 'parallel_min_chunk', 1)
+    (plain, nums) = tex2txt.tex2txt(latex, tex2txt.Options(char=True,
+                                        lang=lang, jobs=jobs, lowmem=True))
+    assert type(nums) is array.array
+    assert (plain, list(nums)) == tex2txt.tex2txt(latex,
+                    tex2txt.Options(char=True, lang=lang, jobs=jobs))
+
+    # line numbers are not affected
+    assert (tex2txt.tex2txt(latex, tex2txt.Options(lowmem=True))
+                == tex2txt.tex2txt(latex, tex2txt.Options()))
+
+def peak(txt, lowmem):
+    # compile the regular expressions beforehand
+    tex2txt.tex2txt(latex, tex2txt.Options(char=True, lowmem=lowmem))
+    reports = []
+    tex2txt.tex2txt(txt, tex2txt.Options(char=True, lowmem=lowmem,
+                        memory=True, profile=reports.append))
+    r = reports[0]
+    for s in r['stages']:
+        assert 0 <= s['peak_bytes'] <= r['peak_bytes']
+        assert type(s['alloc_bytes']) is int
+    assert max(s['peak_bytes'] for s in r['stages']) == r['peak_bytes']
+    return r['peak_bytes']
+
+needs_reset_peak = pytest.mark.skipif(sys.version_info < (3, 9),
+                                reason='tracemalloc.reset_peak() missing')
+
+@needs_reset_peak
+def test_memory():
+    txt = latex * 50
+    assert peak(txt, True) < 0.6 * peak(txt, False)
+
+    reports = []
+    tex2txt.tex2txt(latex, tex2txt.Options(profile=reports.append))
+    assert 'peak_bytes' not in reports[0]
+    assert 'peak_bytes' not in reports[0]['stages'][0]
+
+@pytest.mark.skipif(sys.version_info >= (3, 9), reason='Python 3.9+')
+def test_old_python(monkeypatch):
+    # message of the error is restored for the following tests
+    monkeypatch.setattr(tex2txt.warning_or_error, 'msg', '')
+    reports = []
+    with pytest.raises(SystemExit):
+        tex2txt.tex2txt(latex, tex2txt.Options(memory=True,
+                                                profile=reports.append))
+    assert not tex2txt.profile_data.active
+
+@needs_reset_peak
+def test_option(tmp_path):
+    with open(str(tmp_path / 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+    def run(args):
+        out = subprocess.run([sys.executable, script] + args,
+                        cwd=str(tmp_path), stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE)
+        return (out.returncode, out.stdout.decode('utf-8'))
+    expect = run(['--char', '--nums', 'a.nums', 'x.tex'])
+    assert expect[0] == 0
+    assert run(['--char', '--low-memory', '--nums', 'b.nums', '--profile',
+                    'p.json', '--memory', 'x.tex']) == expect
+    nums = []
+    for fn in ('a.nums', 'b.nums'):
+        with open(str(tmp_path / fn), encoding='utf-8') as f:
+            nums.append(f.read())
+    assert nums[0] == nums[1]
+    with open(str(tmp_path / 'p.json'), encoding='utf-8') as f:
+        assert json.load(f)[0]['peak_bytes'] > 0
+    assert run(['--memory', 'x.tex'])[0] == 1
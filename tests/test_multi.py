@@ -0,0 +1,102 @@
+#
+#   tex2txt.py:
+#   test of tex2txt_multi() and options --char-nums, --extr-out
+#
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+latex = r"""Text \engl{with English} and $x$,
+only few\footnote{We use
+\textcolor{red}{redx} and \engl{Englisch}.}
+people.
+
+\begin{itemize}
+\item[A.] First item\\ second line \verb?\x? % comment
+\item Second
+\end{itemize}
+\begin{equation}
+a = b, \quad \text{for all} x.
+\end{equation}
+Last \unknown{macro} line.
+"""
+
+extrs = ['engl', 'footnote', 'engl,textcolor', 'footnote,engl']
+
+@pytest.mark.parametrize('extr', [None, 'textcolor', 'footnote'])
+def test_multi(extr):
+    texts = tex2txt.tex2txt_multi(latex, tex2txt.Options(lang='en',
+                                    extr=extr), extrs)
+    assert len(texts) == len(extrs) + 1
+    for (e, text) in zip([extr] + extrs, texts):
+        lins = tex2txt.tex2txt(latex, tex2txt.Options(lang='en', extr=e))
+        chars = tex2txt.tex2txt(latex, tex2txt.Options(lang='en', extr=e,
+                                    char=True))
+        assert text == (lins[0], (lins[1], chars[1]))
+
+def test_repl(tmp_path):
+    # option --repl only for main text, compare checks.sh
+    fn = str(tmp_path / 'repls.txt')
+    with open(fn, mode='w', encoding='utf-8') as f:
+        f.write('Text & Txt\nEnglisch & English\nredx & red\n')
+    repl = tex2txt.read_replacements(fn, encoding='utf-8')
+    texts = tex2txt.tex2txt_multi(latex, tex2txt.Options(lang='en',
+                                    repl=repl, char=True), extrs)
+    assert texts[0][0] == tex2txt.tex2txt(latex, tex2txt.Options(lang='en',
+                                    repl=repl))[0]
+    assert texts[0][0].startswith('Txt')
+    for (e, text) in zip(extrs, texts[1:]):
+        assert text[0] == tex2txt.tex2txt(latex, tex2txt.Options(lang='en',
+                                    extr=e))[0]
+    assert 'Englisch' in texts[1][0]
+    assert 'redx' in texts[2][0]
+
+def run(cwd, args):
+    out = subprocess.run([sys.executable, script] + args, cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+def read(fn):
+    with open(fn, encoding='utf-8') as f:
+        return f.read()
+
+def test_options(tmp_path):
+    cwd = str(tmp_path)
+    with open(os.path.join(cwd, 'a.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+
+    (ret, _) = run(cwd, ['--lang', 'en', '--outdir', 'out', '--nums', 'lin',
+                            '--char-nums', 'chr', '--extr-out', 'engl:en',
+                            '--extr-out', 'footnote:fn', 'a.tex'])
+    assert ret == 0
+    for (pre, extr) in (('', None), ('en.', 'engl'), ('fn.', 'footnote')):
+        args = ['--lang', 'en'] + (['--extr', extr] if extr else [])
+        (ret, out) = run(cwd, args + ['--nums', 'x.lin', 'a.tex'])
+        assert ret == 0
+        assert read(os.path.join(cwd, 'out', 'a.tex.' + pre + 'txt')) == out
+        assert (read(os.path.join(cwd, 'out', 'a.tex.' + pre + 'lin'))
+                    == read(os.path.join(cwd, 'x.lin')))
+        (ret, _) = run(cwd, args + ['--char', '--nums', 'x.chr', 'a.tex'])
+        assert ret == 0
+        assert (read(os.path.join(cwd, 'out', 'a.tex.' + pre + 'chr'))
+                    == read(os.path.join(cwd, 'x.chr')))
+
+    (ret, out) = run(cwd, ['--lang', 'en', '--nums', 'y.lin',
+                            '--char-nums', 'y.chr', 'a.tex'])
+    assert ret == 0
+    assert out == read(os.path.join(cwd, 'out', 'a.tex.txt'))
+    for ext in ('lin', 'chr'):
+        assert (read(os.path.join(cwd, 'y.' + ext))
+                    == read(os.path.join(cwd, 'out', 'a.tex.' + ext)))
+
+    for args in (['--extr-out', 'engl:en'], ['--char', '--char-nums', 'z'],
+                    ['--outdir', 'out', '--extr-out', 'engl']):
+        (ret, _) = run(cwd, args + ['a.tex'])
+        assert ret == 1
@@ -0,0 +1,89 @@
+#
+#   tex2txt.py:
+#   test of option --nums-format and read_numbers()
+#
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+latex = r"""Text with \textbf{bold} and $x$.
+\begin{itemize}
+\item First \emph{item} with äöü\footnote{Note.}
+
+\item Second
+\end{itemize}
+Last line% comment
+without line break
+"""
+
+def run(cwd, args):
+    out = subprocess.run([sys.executable, script] + args, cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+@pytest.mark.parametrize('char', [False, True], ids=['lin', 'char'])
+def test_nums_format(tmp_path, char):
+    cwd = str(tmp_path)
+    with open(os.path.join(cwd, 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+    flags = ['--lang', 'en'] + (['--char'] if char else [])
+    outs = []
+    for fmt in ('text', 'bin', 'rle'):
+        (ret, out) = run(cwd, flags + ['--nums', 'x.' + fmt,
+                                        '--nums-format', fmt, 'x.tex'])
+        assert ret == 0
+        outs.append(out)
+    assert outs[0] == outs[1] == outs[2]
+
+    options = tex2txt.Options(char=char, lang='en')
+    (plain, nums) = tex2txt.tex2txt(latex, options)
+    for fmt in ('text', 'bin', 'rle'):
+        r = tex2txt.read_numbers(os.path.join(cwd, 'x.' + fmt))
+        assert len(r) == len(nums)
+        assert [r[i] for i in range(len(r))] == nums
+        assert list(r) == nums
+        assert r[-1] == nums[-1]
+        with pytest.raises(IndexError):
+            r[len(nums)]
+        if fmt != 'text':
+            assert r.char == char
+        r.close()
+
+    if char:
+        size = lambda fmt: os.path.getsize(os.path.join(cwd, 'x.' + fmt))
+        assert size('rle') < size('bin')
+
+def test_translate_offsets(tmp_path):
+    fn = str(tmp_path / 'x.rle')
+    options = tex2txt.Options(char=True, lang='en')
+    (plain, charmap) = tex2txt.tex2txt(latex, options)
+    with open(fn, mode='wb') as f:
+        tex2txt.write_numbers(charmap, f, True, True)
+    r = tex2txt.read_numbers(fn)
+    offsets = list(range(-1, len(plain) + 2))
+    assert (tex2txt.translate_offsets(latex, plain, r, offsets)
+                == tex2txt.translate_offsets(latex, plain, charmap, offsets))
+    r.close()
+
+def test_empty(tmp_path):
+    fn = str(tmp_path / 'x.bin')
+    for rle in (False, True):
+        with open(fn, mode='wb') as f:
+            tex2txt.write_numbers([], f, False, rle)
+        r = tex2txt.read_numbers(fn)
+        assert len(r) == 0 and list(r) == []
+        r.close()
+
+def test_project(tmp_path):
+    with open(str(tmp_path / 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+    (ret, _) = run(str(tmp_path), ['--project', '--nums', 'x.bin',
+                                    '--nums-format', 'bin', 'x.tex'])
+    assert ret == 1
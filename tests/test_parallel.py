@@ -0,0 +1,128 @@
+#
+#   test of parallel conversion of a single document, see LAB:PARALLEL
+#
+
+import io
+import sys
+
+import pytest
+
+import tex2txt
+
+latex = r"""
+\section{Intro}
+Text $a$ and \(b\) with \textbf{bold}, and $c$.
+
+\begin{itemize}
+\item First $x$.
+
+\item Second.
+\end{itemize}
+
+\begin{equation}
+x = y, \quad z \text{ for } a.
+\end{equation}
+Next \[ a = b. \] and $d$, $e$.
+
+\begin{align*}
+    a &= b \\
+    &= c.
+\end{align*}
+
+Warning: $x \text{ for $x>0$}$.
+
+Last paragraph $f$ with \emph{emph}.
+"""
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(tex2txt, 'parallel_min_chunk', 1)
+
+@pytest.mark.parametrize('char', [False, True])
+@pytest.mark.parametrize('lang', ['de', 'en'])
+def test_parallel(small_chunks, monkeypatch, char, lang):
+    options = tex2txt.Options(char=char, lang=lang)
+    assert len(tex2txt.parallel_chunks(latex, options, 4)) > 4
+
+    err = io.StringIO()
+    monkeypatch.setattr(sys, 'stderr', err)
+    expect = tex2txt.tex2txt(latex, options)
+    expect_err = err.getvalue()
+    err.truncate(0)
+    err.seek(0)
+
+    options.jobs = 4
+    assert tex2txt.tex2txt(latex, options) == expect
+    assert err.getvalue() == expect_err
+
+document = r"""
+\documentclass{article}
+\begin{document}
+\section{Intro}
+Text $a$ with a footnote\footnote{Note $b$ and \textbf{c}.} here.
+\begin{figure}
+\caption{Figure $x$ with\footnote{Nested $y$.} note.}
+\end{figure}
+Second $d$.
+\subsection{Sub}
+More\footnote{Other $e$.} text $f$.
+\[ g = h. \]
+Then.
+\section{Next}
+Third\footnote{Last $z$.} and $i$.
+
+Paragraph $j$.
+\section{End}
+Final text.
+\end{document}
+"""
+
+def convert(txt, options, monkeypatch):
+    err = io.StringIO()
+    monkeypatch.setattr(sys, 'stderr', err)
+    return (tex2txt.tex2txt(txt, options), err.getvalue())
+
+@pytest.mark.parametrize('char,lowmem', [(False, False), (True, False),
+                                            (True, True)])
+@pytest.mark.parametrize('lang', ['de', 'en'])
+def test_document(small_chunks, monkeypatch, char, lowmem, lang):
+    # chunks inside of document environment, at headings, and with
+    # text extracted to the end
+    options = tex2txt.Options(char=char, lowmem=lowmem, lang=lang)
+    assert len(tex2txt.parallel_chunks(document, options, 4)) > 4
+    starts = tex2txt.region_starts(document, options, headings=True)
+    heads = [document[beg:].split('\n')[0] for beg in starts]
+    assert [h for h in heads if h] == ['\\section{Intro}', '\\subsection{Sub}',
+                                    '\\section{Next}', '\\section{End}']
+    expect = convert(document, options, monkeypatch)
+    options.jobs = 4
+    res = convert(document, options, monkeypatch)
+    assert res == expect
+    assert tex2txt.mark_tail not in res[0][0]
+
+def test_serial_fallback(small_chunks, monkeypatch):
+    options = tex2txt.Options()
+    assert tex2txt.parallel_chunks(latex, options, 4)
+    options = tex2txt.Options(unkn=True)
+    assert tex2txt.parallel_chunks(latex, options, 4) is None
+
+    # order of extracted texts in serial conversion:
+    # (segments, counts, used, warned, err, keys, origins) per chunk
+    res = [
+        (None, [], [], False, '', [(2, 0), (3, 0)], [[None], [(2, 0)]]),
+        (None, [], [], False, '', [(2, 0)], [[None, None]]),
+    ]
+    assert tex2txt.parallel_order(res) == [(0, 0), (1, 0), (0, 1), (1, 1),
+                                            (0, 2)]
+    # macro (3, 0) found in extracted text of chunk 0, but in main text
+    # of chunk 1: cannot be restored
+    res[1][5].append((3, 0))
+    res[1][6].append([None])
+    assert tex2txt.parallel_order(res) is None
+
+def test_headings(small_chunks):
+    options = tex2txt.Options()
+    txt = 'A.\n\\section{B}\nC \\\\\n\\section{D}\n\\foo\n\\section{E}\n'
+    assert tex2txt.parallel_chunks(txt, options, 4) == [0, 3]
+    options = tex2txt.Options(placeholders='local')
+    assert tex2txt.parallel_chunks(txt, options, 4) is None
@@ -0,0 +1,43 @@
+#
+#   test of option --placeholders, see LAB:PLACEHOLDERS
+#
+
+import tex2txt
+
+def conv(latex, mode):
+    options = tex2txt.Options(lang='en', placeholders=mode)
+    return tex2txt.tex2txt(latex, options)[0]
+
+para1 = 'A $a$ and \\(b\\) and $c$.\n'
+para1_changed = 'A $a$ and $q$, \\(b\\) and $c$.\n'
+para2 = r"""
+B $d$ here \(e\).
+\begin{equation}
+    x = y, \quad z.
+\end{equation}
+"""
+
+def test_rotate():
+    assert conv(para1 + para2, 'rotate') == (
+        'A C-C-C and F-F-F and D-D-D.\n\nB E-E-E here G-G-G.\n  U-U-U. \n')
+
+def test_local():
+    assert conv(para1 + para2, 'local') == (
+        'A C-C-C and D-D-D and E-E-E.\n\nB C-C-C here D-D-D.\n  U-U-U. \n')
+    assert conv(para1_changed + para2, 'local') == (
+        'A C-C-C and D-D-D, E-E-E and F-F-F.\n\nB C-C-C here D-D-D.\n'
+        + '  U-U-U. \n')
+
+def test_cache_key():
+    options = tex2txt.Options(placeholders='local')
+    key = tex2txt.cache_key(para1, options)
+    options.placeholders = 'rotate'
+    assert tex2txt.cache_key(para1, options) != key
+
+def test_parallel(monkeypatch):
+    monkeypatch.setattr(tex2txt, 'parallel_min_chunk', 1)
+    latex = (para1 + para2 + '\n') * 5
+    options = tex2txt.Options(placeholders='local')
+    expect = tex2txt.tex2txt(latex, options)
+    options.jobs = 3
+    assert tex2txt.tex2txt(latex, options) == expect
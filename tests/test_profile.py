@@ -0,0 +1,100 @@
+#
+#   tex2txt.py:
+#   test of Options.profile and option --profile
+#
+
+import json
+import os
+import subprocess
+import sys
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+latex = r"""Text with \textbf{bold \emph{x}} and $x$.
+\begin{itemize}
+\item First
+\end{itemize}
+\begin{equation}
+a = b.
+\end{equation}
+"""
+
+def test_profile():
+    reports = []
+    options = tex2txt.Options(lang='en', profile=reports.append)
+    text = tex2txt.tex2txt(latex, options)
+    assert text == tex2txt.tex2txt(latex, tex2txt.Options(lang='en'))
+    assert len(reports) == 1
+    r = reports[0]
+    assert r['complete'] and r['chars'] == len(latex)
+    names = [s['stage'] for s in r['stages']]
+    for name in ('verbatim', 'macros', 'equations', 'items', 'output'):
+        assert name in names
+    assert sum(s['mysub_calls'] for s in r['stages']) > 0
+    assert sum(s['loop_rounds'] for s in r['stages']) > 0
+    assert (sum(s['seconds'] for s in r['stages'])
+                <= r['seconds'] + 1e-3)
+
+    tex2txt.tex2txt_multi(latex, options, ['emph'])
+    assert len(reports) == 2
+
+def test_timeout():
+    reports = []
+    bad = r'x \textbf{' * 10000 + 'a\n'
+    try:
+        tex2txt.tex2txt(bad, tex2txt.Options(timeout=0.1,
+                                                profile=reports.append))
+    except tex2txt.ConversionTimeout as e:
+        assert not reports[0]['complete']
+        assert reports[0]['stages'][-1]['stage'] == e.stage
+
+def test_option(tmp_path):
+    for name in ('a.tex', 'b.tex'):
+        with open(str(tmp_path / name), mode='w', encoding='utf-8') as f:
+            f.write(latex)
+    for args in (['a.tex'], ['--outdir', 'out', 'a.tex', 'b.tex'],
+                    ['--outdir', 'out', '--jobs', '2', 'a.tex', 'b.tex']):
+        out = subprocess.run([sys.executable, script, '--profile', 'p.json']
+                                + args, cwd=str(tmp_path),
+                                stdout=subprocess.PIPE)
+        assert out.returncode == 0
+        with open(str(tmp_path / 'p.json'), encoding='utf-8') as f:
+            reports = json.load(f)
+        assert [r['file'] for r in reports] == [a for a in args
+                                                    if a.endswith('.tex')]
+
+def test_patterns():
+    defs = tex2txt.Definitions(
+            "defs.project_macros = (Macro(name='swap', args='AA',"
+            + " repl=r'\\2\\1'),)\n"
+            + "defs.misc_replace = ((r'\\bfoo\\b', 'bar'),)\n", 'defs.py')
+    reports = []
+    options = tex2txt.Options(lang='en', defs=defs, profile=reports.append)
+    plain = tex2txt.tex2txt(r'foo \swap{a}{b}' + '\n', options)[0]
+    assert plain == 'bar ba\n'
+    patterns = reports[0]['patterns']
+    seconds = [p['seconds'] for p in patterns]
+    assert seconds == sorted(seconds, reverse=True)
+    origins = dict((p['origin'], p) for p in patterns)
+    assert origins["Macro('swap') in defs.py"]['matches'] >= 1
+    assert origins['misc_replace in defs.py']['matches'] == 1
+    assert "Macro('footnote') in tex2txt.py" in origins
+    assert any(o.startswith('tex2txt.py:') for o in origins)
+    assert all(p['pattern_length'] >= len(p['pattern']) for p in patterns)
+    swap = origins["Macro('swap') in defs.py"]
+    assert (swap['pattern_length'] > len(swap['pattern'])
+                == tex2txt.profile_pattern_chars)
+
+def test_tag(monkeypatch):
+    # declaration from script equals one from option --defs
+    monkeypatch.setattr(tex2txt.profile_data, 'active', True)
+    monkeypatch.setattr(tex2txt.profile_data, 'tags', {})
+    monkeypatch.setattr(tex2txt, 'defs', tex2txt.Definitions(None, 'defs.py'))
+    entry = ('x', 'A')
+    defs_entries = (tuple(['x', 'A']),)
+    tex2txt.profile_tag('a', 'Macro(x)', entry, defs_entries)
+    tex2txt.profile_tag('b', 'Macro(x)', defs_entries[0], defs_entries)
+    assert tex2txt.profile_data.tags == {'a': 'Macro(x) in tex2txt.py',
+                                            'b': 'Macro(x) in defs.py'}
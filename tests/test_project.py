@@ -0,0 +1,126 @@
+#
+#   test of project mode: expansion of file inclusions, see LAB:PROJECT
+#
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import tex2txt
+
+tex2txt_py = os.path.abspath('tex2txt.py')
+shell_py = os.path.abspath('shell.py')
+
+files = {
+    'main.tex': 'Intro \\input{sub/a} end of\nsentence.\n'
+                    + '% \\input{none}\nLast \\include{b}\n',
+    'sub/a.tex': 'Text $a$\nof isx.\n',
+    'b.tex': '\\verb|\\input{none}|\nB isx text.\n',
+}
+
+@pytest.fixture
+def project(tmp_path):
+    for (name, txt) in files.items():
+        fn = tmp_path / name
+        fn.parent.mkdir(exist_ok=True)
+        fn.write_text(txt)
+    return tmp_path
+
+def test_read_project(project, monkeypatch):
+    monkeypatch.chdir(project)
+    p = tex2txt.read_project('main.tex', encoding='utf-8')
+    assert p.files == ['main.tex', os.path.join('sub', 'a.tex'), 'b.tex']
+    assert p.tex == ('Intro Text $a$\nof isx.\n end of\nsentence.\n'
+                        + '% \\input{none}\nLast '
+                        + '\\verb|\\input{none}|\nB isx text.\n\n')
+    i = -1
+    for fid in (1, 2):
+        i = p.tex.index('isx', i + 1)
+        (f, off) = tex2txt.project_origin(p, i)
+        assert f == fid
+        assert p.texts[f][off:off+3] == 'isx'
+
+    p = tex2txt.read_project('main.tex', encoding='utf-8',
+                                skip=lambda f: f == 'b.tex')
+    assert p.files == ['main.tex', os.path.join('sub', 'a.tex')]
+    assert p.tex.endswith('Last \\include{b}\n')
+
+def test_charmap(project, monkeypatch):
+    monkeypatch.chdir(project)
+    p = tex2txt.read_project('main.tex', encoding='utf-8')
+    (plain, charmap) = tex2txt.tex2txt(p.tex, tex2txt.Options(char=True))
+    origins = tex2txt.project_numbers(p, charmap, True)
+    for fid in range(len(p.files)):
+        cmap = tex2txt.ProjectCharmap(p, charmap, fid)
+        assert len(cmap) == len(charmap)
+        assert list(cmap) == [n if f == fid else 1 for (f, n) in origins]
+
+def test_cycle(project, monkeypatch):
+    monkeypatch.chdir(project)
+    # message from raise_error() would appear in next output
+    monkeypatch.setattr(tex2txt.warning_or_error, 'msg', '')
+    with open('b.tex', mode='a') as f:
+        f.write('\\input{main}\n')
+    with pytest.raises(SystemExit):
+        tex2txt.read_project('main.tex', encoding='utf-8')
+
+def test_cmdline(project):
+    out = subprocess.run([sys.executable, tex2txt_py, '--project',
+                            '--nums', 'nums', 'main.tex'], cwd=str(project),
+                            stdout=subprocess.PIPE)
+    assert out.stdout.decode('utf-8') == ('Intro Text C-C-C\nof isx.\n'
+                            + ' end of\nsentence.\nLast \\input{none}\nB isx text.\n\n')
+    nums = (project / 'nums').read_text().split()
+    assert nums[:7] == ['main.tex:1', 'sub/a.tex:2', 'main.tex:1',
+                            'main.tex:2', 'main.tex:4', 'b.tex:2', 'main.tex:4']
+
+#   fake LT server at address of option --server my: reports each "isx"
+#
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        import urllib.parse
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        text = urllib.parse.parse_qs(data.decode('ascii'),
+                                        keep_blank_values=True)['text'][0]
+        self.server.requests += 1
+        matches = []
+        i = text.find('isx')
+        while i >= 0:
+            matches.append({'offset': i, 'length': 3, 'message': 'Error',
+                            'rule': {'id': 'ISX'},
+                            'replacements': [{'value': 'is'}],
+                            'context': {'text': text[i:i+3], 'offset': 0,
+                                            'length': 3}})
+            i = text.find('isx', i + 1)
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'matches': matches}).encode('ascii'))
+    def log_message(self, *args):
+        pass
+
+def test_shell(project):
+    httpd = HTTPServer(('localhost', 8081), Handler)
+    httpd.requests = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        out = subprocess.run([sys.executable, shell_py, '--server', 'my',
+                                '--project', 'main.tex'], cwd=str(project),
+                                stdout=subprocess.PIPE)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    # one request for initial check of server, one for the project
+    assert httpd.requests == 2
+    heads = [lin for lin in out.stdout.decode('utf-8').splitlines()
+                if lin.startswith('===') or lin.startswith('1.)')]
+    assert heads == ['=== ' + os.path.join('sub', 'a.tex') + ' ===',
+                        '1.) Line 2, column 4, Rule ID: ISX',
+                        '=== b.tex ===',
+                        '1.) Line 2, column 3, Rule ID: ISX']
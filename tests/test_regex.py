@@ -0,0 +1,57 @@
+#
+#   tex2txt.py:
+#   test of regex backends (Options.regex, Options.atomic)
+#
+
+import sys
+
+import pytest
+
+import tex2txt
+
+latex = r"""Text with \textbf{bold \emph{and} {nested}} braces
+and \section[short [x]]{Long title} $x$, \unknown{a}{b}.
+\begin{itemize}
+\item First \begin{itemize} \item inner \end{itemize}
+\item[B.] Second
+\end{itemize}
+\begin{align}
+a &= b, \quad \text{for all} x \\
+c &= d.
+\end{align}
+Unclosed \textbf{brace and [bracket
+\begin{enumerate}
+\item Last
+"""
+
+backends = [('re', True), ('regex', False), ('regex', True)]
+
+@pytest.mark.parametrize('backend', backends, ids=lambda b: '-'.join(map(str,
+                                                                        b)))
+@pytest.mark.parametrize('char', [False, True], ids=['lin', 'char'])
+def test_backend(backend, char):
+    (engine, atomic) = backend
+    if engine == 'regex':
+        pytest.importorskip('regex')
+    elif atomic and sys.version_info < (3, 11):
+        pytest.skip('atomic groups need Python 3.11+')
+    for lang in ('en', 'de'):
+        ref = tex2txt.tex2txt(latex, tex2txt.Options(lang=lang, char=char))
+        options = tex2txt.Options(lang=lang, char=char, regex=engine,
+                                    atomic=atomic)
+        assert tex2txt.tex2txt(latex, options) == ref
+    # back to default
+    tex2txt.tex2txt(latex, tex2txt.Options())
+    assert tex2txt.rx.name == 're' and not tex2txt.rx.atomic
+
+def test_regex_timeout():
+    pytest.importorskip('regex')
+    bad = r'x \textbf{' * 10000 + 'a\n'
+    with pytest.raises(tex2txt.ConversionTimeout):
+        tex2txt.tex2txt(bad, tex2txt.Options(regex='regex', timeout=0.1))
+    tex2txt.tex2txt('x\n', tex2txt.Options())
+
+def test_unknown():
+    with pytest.raises(SystemExit):
+        tex2txt.tex2txt('x\n', tex2txt.Options(regex='pcre'))
+    tex2txt.warning_or_error.msg = ''
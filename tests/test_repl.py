@@ -0,0 +1,69 @@
+#
+#   tex2txt.py:
+#   test of option --repl: compiled phrase matcher versus
+#   line-by-line application of the replacements
+#
+
+import random
+
+import pytest
+
+import tex2txt
+
+def convert(txt, lines, monkeypatch=None):
+    repl = (lines, 'x')
+    if monkeypatch:
+        # reference: one scan per line, as in earlier versions
+        def matcher(repl):
+            parsed = (tex2txt.repl_parse(lin, 'x') for lin in lines)
+            return [(tex2txt.repl_regex(p), r.replace('\\', '\\\\'))
+                        for (p, r) in filter(None, parsed)]
+        monkeypatch.setattr(tex2txt, 'repl_matcher', matcher)
+    return tex2txt.tex2txt(txt, tex2txt.Options(repl=repl))[0]
+
+words = ['a', 'b', 'ab', 'ba', 'c', '.', '-', 'x.', 'ä', '1', 'a.b']
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random(seed, monkeypatch):
+    rnd = random.Random(seed)
+    def word():
+        return ''.join(rnd.choice(words) for _ in range(rnd.randint(1, 2)))
+    for _ in range(200):
+        lines = []
+        for _ in range(rnd.randint(1, 8)):
+            p = ' '.join(word() for _ in range(rnd.randint(1, 3)))
+            r = ' '.join(word() for _ in range(rnd.randint(0, 2)))
+            lines.append(p + ' & ' + r + '\n')
+        txt = ' '.join(word() if rnd.random() < 0.85
+                        else rnd.choice(['\n', '\n\n', '  '])
+                        for _ in range(40)) + '\n'
+        plain = convert(txt, lines)
+        with monkeypatch.context() as m:
+            assert plain == convert(txt, lines, m)
+
+def test_groups(tmp_path):
+    lines = [
+        '# comment\n',
+        'z. B. & z.B.\n',
+        'und so weiter & usw.\n',
+        'so & also\n',          # overlaps with 'und so weiter'
+        'Beispiel & Exempel\n',
+        'Bei & Mit\n',          # \b: cannot match in 'Beispiel'
+        'gelöscht &\n',         # deletion: ends group
+        'Text & Satz\n',
+    ]
+    groups = tex2txt.repl_compile(lines, 'x')
+    assert [type(t) for (_, t) in groups] == [dict, dict, str]
+
+    fn = tmp_path / 'repl.txt'
+    fn.write_text(''.join(lines), encoding='utf-8')
+    repl = tex2txt.read_replacements(str(fn), 'utf-8')
+    assert tex2txt.repl_matcher(repl) is tex2txt.repl_matcher(repl)
+    txt = 'Bei Text z.\nB. und so\nweiter gelöscht, so ein Beispiel.\n'
+    plain = tex2txt.tex2txt(txt, tex2txt.Options(repl=repl))[0]
+    assert plain == 'Mit Satz z.B. usw. , also ein Exempel.\n'
+
+def test_percent():
+    with pytest.raises(SystemExit):
+        tex2txt.tex2txt('x\n', tex2txt.Options(repl=(['x & 5%\n'], 'x')))
+    tex2txt.warning_or_error.msg = ''
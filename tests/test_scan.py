@@ -0,0 +1,59 @@
+#
+#   tex2txt.py:
+#   test of scan_unknowns(), scan_extractions() and option --scan
+#
+
+import os
+import subprocess
+import sys
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+latex = r"""Text \unknown{x} and \foo, \foo[a]{b} $\bar x$ \(\baz\)
+% \commented \input{no}
+\verb?\verbx? \input{chap1} \include
+    {ch2} 100\% \$\notmaths\$
+\begin{myenv}\textbf{y}\end{myenv}
+\begin{equation}\eqmac\end{equation}
+\begin{itemize}\item a\end{itemize}
+\begin{verbatim}
+\inverbatim
+\end{verbatim}
+\hspace*{3pt}\section*{A} \"a \v{c} \quad
+"""
+
+def test_unknowns():
+    ret = tex2txt.scan_unknowns(latex, tex2txt.Options(lang='en'))
+    assert ret == [
+        ('\\foo', 2, [1, 1]),
+        ('\\notmaths', 1, [4]),
+        ('\\textbf', 1, [5]),
+        ('\\unknown', 1, [1]),
+        ('\\begin{myenv}', 1, [5]),
+    ]
+    (plain, _) = tex2txt.tex2txt(latex, tex2txt.Options(lang='en', unkn=True))
+    assert plain.split() == [name for (name, _, _) in ret]
+
+def test_extractions():
+    options = tex2txt.Options(lang='en', extr='input,include,textbf')
+    ret = tex2txt.scan_extractions(latex, options)
+    assert ret == [('input', 'chap1', 3), ('include', 'ch2', 3),
+                    ('textbf', 'y', 5)]
+
+def test_option(tmp_path):
+    with open(str(tmp_path / 'x.tex'), mode='w', encoding='utf-8') as f:
+        f.write(latex)
+    def run(args):
+        out = subprocess.run([sys.executable, script] + args,
+                        cwd=str(tmp_path), stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE)
+        return (out.returncode, out.stdout.decode('utf-8'))
+    assert run(['--scan', '--unkn', 'x.tex']) == (0,
+            '\\foo\t2\t1,1\n\\notmaths\t1\t4\n\\textbf\t1\t5\n'
+            + '\\unknown\t1\t1\n\\begin{myenv}\t1\t5\n')
+    assert run(['--scan', '--extr', 'include', 'x.tex']) == (0,
+            '3\t\\include\tch2\n')
+    for args in (['--scan'], ['--scan', '--unkn', '--nums', 'n']):
+        assert run(args + ['x.tex'])[0] == 1
@@ -0,0 +1,84 @@
+#
+#   test of shell.py --jobs with own multi-threaded "LT server"
+#
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+shell = os.path.abspath('shell.py')
+
+match = {
+    'offset': 5,
+    'length': 3,
+    'message': 'Error',
+    'rule': {'id': 'None'},
+    'replacements': [{'value': 'is'}],
+    'context': {
+        'text': 'This isx a test. ',
+        'offset': 5,
+        'length': 3,
+    },
+}
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        data = urllib.parse.parse_qs(data.decode('ascii'))
+        text = data.get('text', [''])[0]
+        stats = self.server.stats
+        with stats['lock']:
+            stats['active'] += 1
+            stats['max'] = max(stats['max'], stats['active'])
+        if text:
+            time.sleep(1 if 'slow' in text else 0.5)
+        with stats['lock']:
+            stats['active'] -= 1
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.end_headers()
+        msg = {'matches': [match] if text else []}
+        self.wfile.write(json.dumps(msg).encode('ascii'))
+
+    def log_message(self, *args):
+        pass
+
+def test_jobs(tmp_path):
+    files = ['a.tex', 'b.tex', 'c.tex', 'd.tex']
+    for fn in files:
+        with open(str(tmp_path / fn), mode='w', encoding='utf-8') as f:
+            f.write('This isx ' + ('slow' if fn == 'a.tex' else 'a test')
+                        + '. \\textbf{' + fn + '}\n')
+    server = Server(('localhost', 8081), Handler)
+    server.stats = {'lock': threading.Lock(), 'active': 0, 'max': 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def run(args):
+        out = subprocess.run([sys.executable, shell, '--server', 'my']
+                                + args + files, cwd=str(tmp_path),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+        assert out.returncode == 0
+        return out.stdout.decode('utf-8')
+    try:
+        out = run([])
+        assert server.stats['max'] == 1
+        assert [lin for lin in out.splitlines() if lin.startswith('===')] == [
+                '=== ' + fn + ' ===' for fn in files]
+
+        assert run(['--jobs', '4']) == out
+        assert server.stats['max'] > 1
+        assert run(['--jobs', '3', '--html']) == run(['--html'])
+    finally:
+        server.shutdown()
+        server.server_close()
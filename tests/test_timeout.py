@@ -0,0 +1,104 @@
+#
+#   tex2txt.py:
+#   test of time budget (Options.timeout, option --timeout)
+#
+
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import tex2txt
+
+script = os.path.abspath('tex2txt.py')
+
+good = r"""Text with \textbf{bold} and $x$.
+\begin{itemize}
+\item First
+\end{itemize}
+"""
+
+# unclosed braces lead to long searches for the nested expressions
+bad = 'Start.\n\n' + r'x \textbf{' * 10000 + 'a\n'
+
+@pytest.mark.parametrize('char', [False, True], ids=['lin', 'char'])
+def test_timeout(char):
+    handler = signal.getsignal(signal.SIGALRM)
+    with pytest.raises(tex2txt.ConversionTimeout) as e:
+        tex2txt.tex2txt(bad, tex2txt.Options(timeout=0.1, char=char))
+    assert type(e.value.stage) is str
+    assert e.value.line in (None, 1, 2, 3)
+    assert signal.getsignal(signal.SIGALRM) is handler
+
+    options = tex2txt.Options(char=char)
+    assert (tex2txt.tex2txt(good, tex2txt.Options(timeout=10, char=char))
+                == tex2txt.tex2txt(good, options))
+
+def test_multi():
+    with pytest.raises(tex2txt.ConversionTimeout):
+        tex2txt.tex2txt_multi(bad, tex2txt.Options(timeout=0.1), ['emph'])
+
+def run_thread(options):
+    # conversion in another thread: return exception
+    res = []
+    def run():
+        try:
+            tex2txt.tex2txt(bad, options)
+        except BaseException as e:
+            res.append(e)
+    th = threading.Thread(target=run)
+    th.start()
+    th.join()
+    return res[0] if res else None
+
+def test_thread(monkeypatch, capsys):
+    # no timer signal: engine 're' cannot interrupt a single search
+    monkeypatch.setattr(tex2txt.warning_or_error, 'msg', '')
+    e = run_thread(tex2txt.Options(timeout=0.1))
+    assert type(e) is SystemExit
+    assert ('outside of the main thread needs option --regex regex'
+                in capsys.readouterr().err)
+
+def test_thread_regex():
+    pytest.importorskip('regex')
+    e = run_thread(tex2txt.Options(timeout=0.1, regex='regex'))
+    assert type(e) is tex2txt.ConversionTimeout
+
+def test_handler(monkeypatch):
+    # handler of application for SIGALRM is not replaced
+    monkeypatch.setattr(tex2txt.warning_or_error, 'msg', '')
+    def handler(signum, frame):
+        pass
+    save = signal.signal(signal.SIGALRM, handler)
+    try:
+        with pytest.raises(SystemExit):
+            tex2txt.tex2txt(bad, tex2txt.Options(timeout=0.1))
+        if importlib.util.find_spec('regex'):
+            with pytest.raises(tex2txt.ConversionTimeout):
+                tex2txt.tex2txt(bad, tex2txt.Options(timeout=0.1,
+                                                        regex='regex'))
+        assert signal.getsignal(signal.SIGALRM) is handler
+    finally:
+        signal.signal(signal.SIGALRM, save)
+
+def test_option(tmp_path):
+    for (name, s) in (('bad.tex', bad), ('good.tex', good)):
+        with open(str(tmp_path / name), mode='w', encoding='utf-8') as f:
+            f.write(s)
+    def run(timeout, files):
+        return subprocess.run([sys.executable, script, '--timeout', timeout,
+                                '--outdir', 'out'] + files,
+                                cwd=str(tmp_path), stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE)
+    # limits far below and far above the conversion time on any machine
+    out = run('0.001', ['bad.tex'])
+    assert out.returncode == 1
+    assert b'time limit of 0.001 s exceeded' in out.stderr
+    assert not os.path.exists(str(tmp_path / 'out' / 'bad.tex.txt'))
+    out = run('100', ['good.tex'])
+    assert out.returncode == 0
+    assert os.path.exists(str(tmp_path / 'out' / 'good.tex.txt'))
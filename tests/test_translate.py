@@ -0,0 +1,119 @@
+#
+#   test of translate_numbers(), translate_offsets(), translate_positions(),
+#   and of option --translate
+#
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import tex2txt
+
+latex = r"""Text with \textbf{bold} and $x$.
+\begin{itemize}
+\item First \emph{item} with äöü\footnote{Note.}
+
+\item Second
+\end{itemize}
+Last line% comment
+without line break"""
+
+def expected(tex, plain, charmap, starts, positions):
+    ret = []
+    for (lin, col) in positions:
+        r = tex2txt.translate_numbers(tex, plain, charmap, starts, lin, col)
+        ret.append((r.lin, r.col, r.flag) if r else None)
+    return ret
+
+@pytest.fixture(params=[False, True], ids=['bisect', 'numpy'])
+def numpy_mode(request, monkeypatch):
+    if request.param:
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(tex2txt, 'translate_numpy_min', 1)
+    return request.param
+
+def test_translate(numpy_mode):
+    options = tex2txt.Options(char=True, lang='en')
+    (plain, charmap) = tex2txt.tex2txt(latex, options)
+    starts = tex2txt.get_line_starts(plain)
+    positions = [(lin, col) for lin in range(-1, len(starts) + 2)
+                    for col in range(-1, 40)]
+    expect = expected(latex, plain, charmap, starts, positions)
+    assert any(expect) and not all(expect)
+    assert tex2txt.translate_positions(latex, plain, charmap, starts,
+                                            positions) == expect
+
+    offsets = list(range(len(plain)))
+    positions = [(plain.count('\n', 0, o) + 1,
+                    o - plain.rfind('\n', 0, o)) for o in offsets]
+    expect = expected(latex, plain, charmap, starts, positions)
+    got = tex2txt.translate_offsets(latex, plain, charmap, offsets)
+    # translate_numbers() does not accept line breaks as position
+    assert [g for (g, e) in zip(got, expect) if e] == [e for e in expect if e]
+    assert all(got[:-1])
+    assert tex2txt.translate_offsets(latex, plain, charmap,
+                                        [-1, len(charmap)]) == [None, None]
+
+def test_translate_numbers():
+    tex = 'ab\ncd\n'
+    (plain, charmap) = ('ab\ncd\n', list(range(1, 8)))
+    starts = tex2txt.get_line_starts(plain)
+    r = tex2txt.translate_numbers(tex, plain, charmap, starts, 2, 2)
+    assert (r.lin, r.col, r.flag) == (2, 2, False)
+    assert tex2txt.translate_numbers(tex, plain, charmap, starts, 2, 4) is None
+
+script = os.path.abspath('tex2txt.py')
+
+def run(cwd, args, inp=''):
+    out = subprocess.run([sys.executable, script] + args, cwd=cwd,
+                            input=inp.encode('utf-8'),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return (out.returncode, out.stdout.decode('utf-8'))
+
+def test_translate_option(tmp_path):
+    cwd = str(tmp_path)
+    files = {'a.tex': latex, 'sub/b.tex': 'B\\textbf{x}\n\nYy zz\n'}
+    for f in files:
+        fn = os.path.join(cwd, f)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        with open(fn, mode='w', encoding='utf-8') as fp:
+            fp.write(files[f])
+    for (char, ext) in ((False, 'lin'), (True, 'chr')):
+        (ret, _) = run(cwd, ['--lang', 'en', '--outdir', 'out', '--nums', ext]
+                        + (['--char'] if char else []) + list(files))
+        assert ret == 0
+
+    options = tex2txt.Options(char=True, lang='en')
+    (plain, charmap) = tex2txt.tex2txt(latex, options)
+    starts = tex2txt.get_line_starts(plain)
+    positions = [(lin, col) for lin in range(0, 8) for col in range(0, 12)]
+    expect = expected(latex, plain, charmap, starts, positions)
+    inp = ''.join('x Line {}, column {}: y\n'.format(lin, col)
+                    for (lin, col) in positions)
+    (ret, out) = run(cwd, ['--translate', r'Line (\d+), column (\d+)',
+                            '--char', '--outdir', 'out', '--nums', 'chr',
+                            'a.tex'], inp)
+    assert ret == 0
+    for (lin, e) in zip(out.splitlines(), expect):
+        if e:
+            mark = '+' if e[2] else ''
+            assert lin == 'x Line [{}{}], column [{}{}]: y'.format(e[0],
+                                                    mark, e[1], mark)
+        else:
+            assert lin == 'x Line [?], column [?]: y'
+
+    (_, nums) = tex2txt.tex2txt(files['sub/b.tex'],
+                                    tex2txt.Options(lang='en'))
+    inp = 'out/sub/b.tex.txt:2:1: bad\nsub/b.tex:9:1: bad\nc.tex:1:1: x\n'
+    (ret, out) = run(cwd, ['--translate', r'^(?P<file>[^:]*):(\d+)():',
+                            '--outdir', 'out', '--nums', 'lin']
+                            + list(files), inp)
+    assert ret == 0
+    assert out == ('out/sub/b.tex.txt:2 [' + str(nums[1]) + ']:1: bad\n'
+                    + 'sub/b.tex:9:1: bad\nc.tex:1:1: x\n')
+
+    (ret, _) = run(cwd, ['--translate', r'^(\d+)', '--outdir', 'out',
+                            '--nums', 'lin'] + list(files))
+    assert ret == 1
@@ -0,0 +1,53 @@
+#
+#   t2t_bench.py:
+#   test of worst cases (option --worst)
+#
+
+import json
+import os
+import subprocess
+import sys
+
+import t2t_bench
+import tex2txt
+
+bench_py = os.path.abspath('t2t_bench.py')
+
+def test_worst():
+    names = [c.name for c in t2t_bench.worst_cases]
+    assert len(set(names)) == len(names)
+    # small documents, and generous limits for slow machines
+    results = t2t_bench.run_worst(t2t_bench.worst_cases, factor=20,
+                                    scale=0.02)
+    assert [r['case'] for r in results] == names
+    assert all(r['status'] == 'ok' for r in results)
+    warned = [r['case'] for r in results if r['warnings']]
+    assert warned == ['equation_braces', 'dollar_braces']
+
+def test_timeout():
+    cases = [c for c in t2t_bench.worst_cases if c.name == 'verbs_line']
+    (r,) = t2t_bench.run_worst(cases, char=True, factor=0.001)
+    assert r['status'] == 'timeout' and r['mode'] == 'char'
+    assert r['stage'] == 'verbatim' and r['line'] == 1
+    assert r['origin'].startswith('tex2txt.py:')
+    assert tex2txt.warning_or_error.msg == ''
+
+def test_script(tmp_path):
+    def run(args):
+        return subprocess.run([sys.executable, bench_py, '--worst'] + args,
+                    cwd=str(tmp_path), stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE)
+    out = run(['--cases', 'dollars_odd,linebreaks', '--scale', '0.1',
+                    '--save-docs', 'docs', 'w.json'])
+    assert out.returncode == 0
+    with open(str(tmp_path / 'w.json'), encoding='utf-8') as f:
+        res = json.load(f)
+    assert [(r['case'], r['mode']) for r in res['worst']] == [
+                ('dollars_odd', 'lin'), ('linebreaks', 'lin'),
+                ('dollars_odd', 'char'), ('linebreaks', 'char')]
+    assert sorted(os.listdir(str(tmp_path / 'docs'))) == [
+                'worst-dollars_odd.tex', 'worst-linebreaks.tex']
+    out = run(['--cases', 'verbs_line', '--limit-factor', '0.001', 'w.json'])
+    assert out.returncode == 1
+    assert b'=== failed worst cases: 2' in out.stdout
+    assert run(['--cases', 'nothing', 'w.json']).returncode == 1
@@ -500,8 +500,21 @@ def set_math_parms():
 #######################################################################
 
 import argparse
+import array
+import bisect
+import copy
+import hashlib
+import html
+import io
+import json
+import mmap
+import os
 import re
+import signal
+import struct
 import sys
+import threading
+import time
 import unicodedata
 
 #   first of all ...
@@ -517,8 +530,10 @@ def myopen(f, encoding, mode='r'):
         raise_error('problem', 'could not open file "' + f + '"', xit=1)
 warning_or_error = Aux()
 warning_or_error.msg = ''
+warning_or_error.count = 0
 def raise_error(kind, msg, detail=None, xit=None):
     warning_or_error.msg = parms.warning_error_msg
+    warning_or_error.count += 1
     err = '\n*** ' + sys.argv[0] + ': ' + kind + ':\n' + msg + '\n'
     if detail:
         err += strip_internal_marks(detail) + '\n'
@@ -569,6 +584,11 @@ mark_linebreak = mark_internal_pre + 'L' + mark_internal_post
 mark_verbatim = (mark_internal_pre + 'V', 'V' + mark_internal_post)
 mark_verbatim_tmp = ('____V', 'V__')    # before removal of % comments
 
+#   in a worker of parallel conversion: line in front of text extracted
+#   to the end of text, see LAB:PARALLEL
+#
+mark_tail = mark_internal_pre + 'T' + mark_internal_post
+
 #   only for error messages: remove internal marks
 #
 def strip_internal_marks(s):
@@ -584,17 +604,113 @@ def strip_internal_marks(s):
 #
 skip_space = r'(?:[ \t]*\n?[ \t]*)'
 
+#   LAB:REGEX
+#   backend for regular expressions (Options.regex, Options.atomic)
+#   - all matching in mysub(), mysearch() and tex2txt_core() goes through
+#     object rx
+#   - engine 're' (default) or 'regex' (module regex, if installed)
+#   - on Options.atomic: the repetitions in the expressions for nested
+#     braces and brackets are possessive, and nested environments are
+#     atomic groups, see re_braced(), re_bracketed() and re_nested_env();
+#     this avoids backtracking into a matched group, but it needs
+#     module regex or Python 3.11+
+#   - the non-greedy expressions in parse_equ() are not changed:
+#     here, an atomic group would change the result
+#   - with engine 'regex' and a time budget (LAB:TIMEOUT), the remaining
+#     time is passed as timeout to each search, which interrupts a long
+#     search also outside of the main thread
+#   - patterns: None, or dictionary of compiled expressions that is kept
+#     instead of the limited cache of the module (e.g., by t2t_daemon.py
+#     for each set of options); it is cleared after patterns_max entries
+#
+class RegexBackend:
+    patterns_max = 5000
+
+    def __init__(self):
+        self.name = 're'
+        self.module = re
+        self.atomic = False
+        self.patterns = None
+
+    def kwargs(self):
+        if self.name == 'regex' and time_budget.deadline is not None:
+            return {'timeout': max(time_budget.deadline - time.monotonic(),
+                                        0)}
+        return {}
+
+    def pattern(self, expr, flags):
+        if not isinstance(expr, str):
+            return expr
+        key = (self.name, expr, flags)
+        p = self.patterns.get(key)
+        if p is None:
+            if len(self.patterns) >= self.patterns_max:
+                self.patterns.clear()
+            p = self.patterns[key] = self.module.compile(expr, flags)
+        return p
+
+    def finditer(self, expr, s, flags=0):
+        if self.patterns is not None:
+            return self.pattern(expr, flags).finditer(s, **self.kwargs())
+        return self.module.finditer(expr, s, flags=flags, **self.kwargs())
+    def search(self, expr, s, flags=0):
+        if self.patterns is not None:
+            return self.pattern(expr, flags).search(s, **self.kwargs())
+        return self.module.search(expr, s, flags=flags, **self.kwargs())
+    def sub(self, expr, repl, s, flags=0):
+        if self.patterns is not None:
+            return self.pattern(expr, flags).sub(repl, s, **self.kwargs())
+        return self.module.sub(expr, repl, s, flags=flags, **self.kwargs())
+    def findall(self, expr, s, flags=0):
+        if self.patterns is not None:
+            return self.pattern(expr, flags).findall(s, **self.kwargs())
+        return self.module.findall(expr, s, flags=flags, **self.kwargs())
+    def compile(self, expr, flags=0):
+        if self.patterns is not None:
+            return self.pattern(expr, flags)
+        return self.module.compile(expr, flags=flags)
+
+rx = RegexBackend()
+
+def set_regex_backend(name, atomic):
+    global braced, sp_braced, bracketed, sp_bracketed
+    if (name, bool(atomic)) == (rx.name, rx.atomic):
+        return
+    if name == 're':
+        module = re
+    elif name == 'regex':
+        try:
+            import regex as module
+        except ImportError:
+            raise_error('problem', 'regex backend "regex" needs Python'
+                            + ' module regex', xit=1)
+    else:
+        raise_error('problem', 'unrecognized regex backend "' + name
+                        + '" given in option --regex', xit=1)
+    if atomic and module is re and sys.version_info < (3, 11):
+        raise_error('problem', 'option --atomic needs Python 3.11+'
+                        + ' or option --regex regex', xit=1)
+    rx.name = name
+    rx.module = module
+    rx.atomic = bool(atomic)
+    braced = re_braced(parms.max_depth_br, '', '')
+    sp_braced = skip_space + braced
+    bracketed = re_bracketed(parms.max_depth_br, '', '')
+    sp_bracketed = skip_space + bracketed
+
 #   regular expression for nested {} braces
 #   BUG (but error message on overrun): the nesting limit is unjustified
+#   - on rx.atomic: possessive repetitions, the match is unique anyway
 #
 def re_braced(max_depth, inner_beg, inner_end, outer_beg='(', outer_end=')'):
     atom = r'[^\\{}]|\\.|\\\n'
-    braced = inner_beg + r'\{(?:' + atom + r')*\}' + inner_end
+    rep = r'*+' if rx.atomic else r'*'
+    braced = inner_beg + r'\{(?:' + atom + r')' + rep + r'\}' + inner_end
         # (?:...) is (...) without creation of a reference
     for i in range(max_depth - 2):
-        braced = r'\{(?:' + atom + r'|' + braced + r')*\}'
-    braced = (r'(?<!\\)\{' + outer_beg + r'(?:' + atom + r'|' + braced + r')*'
-                    + outer_end + r'\}')
+        braced = r'\{(?:' + atom + r'|' + braced + r')' + rep + r'\}'
+    braced = (r'(?<!\\)\{' + outer_beg + r'(?:' + atom + r'|' + braced + r')'
+                    + rep + outer_end + r'\}')
         # outer-most (...) for reference at substitutions below
         # '(?<!x)y' matches 'y' not preceded by 'x'
     return braced
@@ -609,10 +725,12 @@ def re_bracketed(max_depth, inner_beg, inner_end):
                     + re_braced(parms.max_depth_br, '', '', '(?:', ')'))
     else:
         atom = r'[^][\\]|\\.|\\\n'
-    bracketed = inner_beg + r'\[(?:' + atom + r')*\]' + inner_end
+    rep = r'*+' if rx.atomic else r'*'
+    bracketed = inner_beg + r'\[(?:' + atom + r')' + rep + r'\]' + inner_end
     for i in range(max_depth - 2):
-        bracketed = r'\[(?:' + atom + r'|' + bracketed + r')*\]'
-    bracketed = r'(?<!\\)\[((?:' + atom + r'|' + bracketed + r')*)\]'
+        bracketed = r'\[(?:' + atom + r'|' + bracketed + r')' + rep + r'\]'
+    bracketed = (r'(?<!\\)\[((?:' + atom + r'|' + bracketed + r')' + rep
+                    + r')\]')
     return bracketed
 bracketed = re_bracketed(parms.max_depth_br, '', '')
 sp_bracketed = skip_space + bracketed
@@ -627,10 +745,11 @@ def re_nested_env(s, max_depth, arg):
     env_end = end_lbr + s + r'\}'
     # important here: non-greedy *? repetition
     env = r'(?P<inner>' + env_begin + r'(?:.|\n)*?' + env_end + r')'
+    grp = r'(?>' if rx.atomic else r'(?:'
     for i in range(max_depth - 2):
         # important here: non-greedy *? repetition
-        env = env_begin + r'(?:(?:' + env + r')|.|\n)*?' + env_end
-    env = (env_begin + arg + r'(?P<body>(?:(?:' + env + r')|.|\n)*?)'
+        env = env_begin + r'(?:' + grp + env + r')|.|\n)*?' + env_end
+    env = (env_begin + arg + r'(?P<body>(?:' + grp + env + r')|.|\n)*?)'
                     + env_end)
     return env
 
@@ -737,6 +856,499 @@ def verbatim(s, mark, ast):
     return ret
 
 
+#   LAB:TIMEOUT
+#   time budget for conversion of a document (Options.timeout)
+#   - the deadline is checked at the start of each stage (see calls of
+#     begin_stage()) and for each match in mysub()
+#   - in the main thread, a timer signal additionally interrupts a single
+#     long regular expression search; the signal is not used, if another
+#     handler for SIGALRM or a timer is active
+#   - without the timer signal, a single search cannot be interrupted
+#     by the checks above: then engine 're' is refused with an error, and
+#     engine 'regex' is given the remaining time, see LAB:REGEX; an
+#     exception is a system without timer signals (only the checks)
+#   - on exceeding, exception ConversionTimeout is raised; it gives the
+#     stage and, if known, the original line number near the position
+#     where conversion has stopped
+#   - with option --jobs, the workers are terminated, see LAB:PARALLEL
+#
+class ConversionTimeout(Exception):
+    def __init__(self, seconds, stage, line):
+        self.seconds = seconds
+        self.stage = stage
+        self.line = line
+        msg = ('time limit of ' + str(seconds) + ' s exceeded in stage "'
+                    + stage + '"')
+        if line is not None:
+            msg += ' near line ' + str(line)
+        super().__init__(msg)
+
+time_budget = Aux()
+time_budget.deadline = None
+time_budget.seconds = None
+time_budget.stage = None
+time_budget.txt = None          # input text
+time_budget.char = False        # character offsets in number array?
+time_budget.text = None         # current text tuple in mysub()
+time_budget.offset = 0          # position in time_budget.text
+
+def budget_run(txt, options, func, *args):
+    # run func(*args) for input text txt with time budget from
+    # options.timeout; nested calls share the outer budget
+    if not options.timeout or time_budget.deadline is not None:
+        return func(*args)
+    alarm = hasattr(signal, 'setitimer')
+    if alarm:
+        reason = budget_alarm_problem()
+        if reason and options.regex == 're':
+            raise_error('problem', 'option --timeout ' + reason
+                            + ' needs option --regex regex', xit=1)
+        alarm = not reason
+    time_budget.seconds = options.timeout
+    time_budget.stage = 'start'
+    time_budget.txt = txt
+    time_budget.char = bool(options.char)
+    time_budget.text = None
+    time_budget.deadline = time.monotonic() + options.timeout
+    if alarm:
+        handler = signal.signal(signal.SIGALRM, budget_alarm)
+        signal.setitimer(signal.ITIMER_REAL, options.timeout)
+    try:
+        return func(*args)
+    except TimeoutError:
+        if rx.name != 'regex':
+            raise
+        # from module regex, see LAB:REGEX
+        time_budget.deadline = None
+        raise budget_error() from None
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, handler)
+        time_budget.deadline = None
+        time_budget.txt = time_budget.text = None
+
+def budget_alarm_problem():
+    # reason, why timer signal cannot be used, or None
+    if threading.current_thread() is not threading.main_thread():
+        return 'outside of the main thread'
+    if (signal.getsignal(signal.SIGALRM) not in (signal.SIG_DFL,
+                                                    signal.SIG_IGN)
+            or signal.getitimer(signal.ITIMER_REAL)[0]):
+        return 'with another handler or timer for SIGALRM'
+    return None
+
+def budget_alarm(signum, frame):
+    if time_budget.deadline is not None:
+        budget_exceeded()
+
+def budget_exceeded():
+    time_budget.deadline = None
+    raise budget_error()
+
+def budget_error():
+    return ConversionTimeout(time_budget.seconds, time_budget.stage,
+                                budget_line())
+
+def budget_line():
+    # original line number for time_budget.offset in time_budget.text
+    if time_budget.text is None:
+        return None
+    (txt, nums) = time_budget.text
+    off = min(time_budget.offset, len(txt))
+    char = time_budget.char
+    if type(nums) is tuple:
+        # see LAB:BOTH
+        (nums, char) = (nums[0], False)
+    if char:
+        if not nums:
+            return None
+        n = abs(nums[min(off, len(nums) - 1)])
+        return time_budget.txt.count('\n', 0, max(n - 1, 0)) + 1
+    lin = txt.count('\n', 0, off)
+    return abs(nums[lin]) if lin < len(nums) else None
+
+def budget_check():
+    if (time_budget.deadline is not None
+            and time.monotonic() > time_budget.deadline):
+        budget_exceeded()
+
+#   start of a stage in tex2txt_core(), also see LAB:PROFILE
+#
+def begin_stage(name):
+    time_budget.stage = name
+    if profile_data.active:
+        profile_switch(name)
+    budget_check()
+
+#   LAB:PROFILE
+#   profile of a conversion per stage (Options.profile, option --profile)
+#   - Options.profile: function that is called with a report dictionary
+#     at the end of each conversion by tex2txt() or tex2txt_multi(),
+#     also after an exception (then with report['complete'] == False);
+#     no report for a result from the cache, see LAB:CACHE
+#   - stages are started by begin_stage(); for each stage, the report
+#     lists wall time, calls of mysub() and mysearch(), matches,
+#     characters scanned by these calls, and rounds of the replacement
+#     loops; a stage may be entered several times
+#   - for each regular expression used in mysub() and mysearch(), the
+#     report lists origin, start of the expression, its length in
+#     characters ('pattern_length'), calls, matches and own time (without
+#     nested calls from replacement functions), sorted by time;
+#     the origin of a declaration like Macro() or a misc_replace entry
+#     is registered by profile_tag(), otherwise it is the calling line
+#   - with option --jobs, the work of the worker processes is only seen
+#     as time of stage 'parallel', see LAB:PARALLEL
+#   - without profile, the cost is a test per call of mysub() and
+#     mysearch()
+#
+profile_data = Aux()
+profile_data.active = False
+profile_data.stages = None      # dictionary: stage name -> counters
+profile_data.current = None     # counters of current stage
+profile_data.start = 0
+profile_data.tags = None        # dictionary: expression -> origin
+profile_data.patterns = None    # dictionary: (origin, expr) -> counters
+profile_data.nested = 0         # time of nested calls, see profile_leave()
+profile_data.heat = None        # see LAB:HEATMAP
+profile_data.memory = None      # see LAB:MEMORY
+
+profile_counters = ('entries', 'seconds', 'mysub_calls', 'searches',
+                        'matches', 'chars_scanned', 'loop_rounds')
+
+def profile_run(txt, options, func, *args):
+    # run func(*args) for input text txt, compare budget_run()
+    if not options.profile or profile_data.active:
+        return budget_run(txt, options, func, *args)
+    profile_data.active = True
+    profile_data.stages = {}
+    profile_data.tags = {}
+    profile_data.patterns = {}
+    profile_data.nested = 0
+    profile_data.heat = None
+    start = time.perf_counter()
+    complete = False
+    try:
+        if options.heatmap:
+            heat_start(txt, options)
+        memory_start(options)
+        profile_switch('start')
+        ret = budget_run(txt, options, func, *args)
+        complete = True
+        return ret
+    finally:
+        profile_switch(None)
+        peak = memory_stop()
+        profile_data.active = False
+        stages = []
+        for (name, c) in profile_data.stages.items():
+            c['seconds'] = round(c['seconds'], 6)
+            stages.append(dict(stage=name, **c))
+        patterns = sorted(profile_data.patterns.values(),
+                            key=lambda p: p['seconds'], reverse=True)
+        for p in patterns:
+            p['seconds'] = round(p['seconds'], 6)
+        report = {'chars': len(txt), 'complete': complete,
+                        'seconds': round(time.perf_counter() - start, 6),
+                        'stages': stages, 'patterns': patterns}
+        if peak is not None:
+            report['peak_bytes'] = peak
+        if profile_data.heat:
+            report['lines'] = heat_lines()
+            profile_data.heat = None
+        options.profile(report)
+
+def profile_switch(name):
+    now = time.perf_counter()
+    if profile_data.current is not None:
+        profile_data.current['seconds'] += now - profile_data.start
+        if profile_data.memory:
+            memory_switch(profile_data.current)
+    if name is None:
+        profile_data.current = None
+        return
+    c = profile_data.stages.get(name)
+    if c is None:
+        c = profile_data.stages[name] = dict.fromkeys(profile_counters, 0)
+        if profile_data.memory:
+            c.update(dict.fromkeys(memory_counters, 0))
+    c['entries'] += 1
+    profile_data.current = c
+    profile_data.start = now
+
+#   mysub() and mysearch(): profile_enter() at start, profile_leave()
+#   at end; argument depth: number of frames up to the calling line
+#
+def profile_enter():
+    prof = Aux()
+    prof.saved = profile_data.nested
+    profile_data.nested = 0
+    prof.start = time.perf_counter()
+    if profile_data.heat:
+        heat_enter(prof)
+    return prof
+
+def profile_leave(prof, kind, expr, size, matches, depth, text=None):
+    if text is not None and profile_data.heat:
+        # rest of the scan after last match, see LAB:HEATMAP
+        heat_add(prof, text, size)
+    total = time.perf_counter() - prof.start
+    own = total - profile_data.nested
+    profile_data.nested = prof.saved + total
+    c = profile_data.current
+    c[kind] += 1
+    c['chars_scanned'] += size
+    c['matches'] += matches
+
+    if type(expr) is not str:
+        # compiled expression
+        expr = expr.pattern
+    origin = profile_data.tags.get(expr)
+    if origin is None:
+        f = sys._getframe(depth)
+        origin = (os.path.basename(f.f_code.co_filename) + ':'
+                    + str(f.f_lineno) + ' in ' + f.f_code.co_name)
+    p = profile_data.patterns.get((origin, expr))
+    if p is None:
+        p = profile_data.patterns[(origin, expr)] = {'origin': origin,
+                'pattern': expr[:profile_pattern_chars],
+                'pattern_length': len(expr),
+                'calls': 0, 'matches': 0, 'seconds': 0}
+    p['calls'] += 1
+    p['matches'] += matches
+    p['seconds'] += own
+
+#   report only the start of long expressions
+#
+profile_pattern_chars = 100
+
+#   register origin of expression expr from a declaration;
+#   argument what: e.g. "Macro('textbf')"; entry and defs_entries:
+#   declaration tuple, and the corresponding member of defs
+#   - identity, not equality: a declaration in the script may equal
+#     one from option --defs
+#
+def profile_tag(expr, what, entry, defs_entries):
+    if not profile_data.active:
+        return
+    src = 'tex2txt.py'
+    if any(entry is d for d in defs_entries):
+        src = defs.name
+    profile_data.tags[expr] = what + ' in ' + src
+
+def profile_round():
+    if profile_data.active:
+        profile_data.current['loop_rounds'] += 1
+
+#   LAB:MEMORY
+#   memory of a conversion (Options.memory, option --memory)
+#   - with Options.memory and Options.profile, memory allocations are
+#     traced by module tracemalloc during the conversion
+#   - for each stage, the report adds 'peak_bytes': maximum of memory
+#     allocated since start of conversion, and 'alloc_bytes': net change
+#     of allocated memory by the stage (negative if memory was freed);
+#     the report adds the overall 'peak_bytes'
+#   - memory allocated before the conversion, e.g. for the input text,
+#     is not counted
+#   - tracing slows down conversion considerably; an already running
+#     trace (e.g. by python3 -X tracemalloc) is used, but its peak
+#     is reset at each change of stage
+#   - needs tracemalloc.reset_peak() of Python 3.9+
+#
+memory_counters = ('peak_bytes', 'alloc_bytes')
+
+def memory_start(options):
+    profile_data.memory = None
+    if not options.memory:
+        return
+    import tracemalloc
+    if not hasattr(tracemalloc, 'reset_peak'):
+        raise_error('problem', 'option --memory needs Python 3.9+', xit=1)
+    profile_data.memory = Aux()
+    profile_data.memory.started = not tracemalloc.is_tracing()
+    if profile_data.memory.started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profile_data.memory.base = profile_data.memory.last = (
+                                    tracemalloc.get_traced_memory()[0])
+    profile_data.memory.peak = 0
+
+def memory_switch(c):
+    import tracemalloc
+    mem = profile_data.memory
+    (cur, peak) = tracemalloc.get_traced_memory()
+    c['peak_bytes'] = max(c['peak_bytes'], peak - mem.base)
+    c['alloc_bytes'] += cur - mem.last
+    mem.peak = max(mem.peak, peak - mem.base)
+    mem.last = cur
+    tracemalloc.reset_peak()
+
+def memory_stop():
+    mem = profile_data.memory
+    if mem is None:
+        return None
+    if mem.started:
+        import tracemalloc
+        tracemalloc.stop()
+    profile_data.memory = None
+    return mem.peak
+
+#   LAB:HEATMAP
+#   cost of the input regions (Options.heatmap, option --heatmap)
+#   - with Options.heatmap and Options.profile, the report gets the
+#     list 'lines': seconds spent in mysub() and mysearch() per line
+#     of the input text
+#   - in mysub(), heat_add() is called after each match: the own time
+#     since the last call (search for the match and its replacement,
+#     without nested calls) is spread over the original lines from end
+#     of the previous match to end of the current match, in proportion
+#     to their lengths; mysearch() spreads its time over the lines up
+#     to the match end
+#   - positions in the current text are mapped back with the number
+#     array as in LAB:TIMEOUT; the lines are summed up via a difference
+#     array, such that the cost per call of heat_add() is small
+#   - the result is an approximation: the time of a failed search is
+#     attributed to the whole region scanned, not to the starting
+#     positions that caused it
+#
+def heat_start(txt, options):
+    profile_data.heat = Aux()
+    profile_data.heat.char = options.char
+    # with final entry: end of text plus line break
+    profile_data.heat.starts = get_line_starts(txt) + [len(txt) + 1]
+    profile_data.heat.diff = [0] * len(profile_data.heat.starts)
+
+def heat_enter(prof):
+    prof.heat_time = prof.start
+    prof.heat_nested = 0
+    prof.heat_pos = 0
+    prof.heat_cursor = (0, 0)   # position in text and its line index
+
+def heat_add(prof, text, pos):
+    now = time.perf_counter()
+    dt = (now - prof.heat_time) - (profile_data.nested - prof.heat_nested)
+    a = heat_line(prof, text, prof.heat_pos)
+    b = heat_line(prof, text, pos)
+    if a > b:
+        (a, b) = (b, a)
+    # time per character of the lines a to b
+    starts = profile_data.heat.starts
+    share = dt / (starts[b + 1] - starts[a])
+    diff = profile_data.heat.diff
+    diff[a] += share
+    diff[b + 1] -= share
+    prof.heat_time = now
+    prof.heat_nested = profile_data.nested
+    prof.heat_pos = pos
+
+#   map position in current text to index of original input line
+#
+def heat_line(prof, text, pos):
+    (txt, nums) = text
+    char = profile_data.heat.char
+    if type(nums) is tuple:
+        # see LAB:BOTH
+        (nums, char) = (nums[0], False)
+    if not nums:
+        return 0
+    if char:
+        n = abs(nums[min(pos, len(nums) - 1)])
+        lin = bisect.bisect_right(profile_data.heat.starts, n - 1)
+    else:
+        # positions mostly increase: count line breaks incrementally
+        (p, i) = prof.heat_cursor
+        if pos >= p:
+            i += txt.count('\n', p, pos)
+        else:
+            i = txt.count('\n', 0, pos)
+        prof.heat_cursor = (pos, i)
+        lin = abs(nums[min(i, len(nums) - 1)])
+    return min(max(lin, 1), len(profile_data.heat.starts) - 1) - 1
+
+def heat_lines():
+    starts = profile_data.heat.starts
+    lines = []
+    t = 0
+    for (i, d) in enumerate(profile_data.heat.diff[:-1]):
+        t += d
+        lines.append(round(max(t * (starts[i + 1] - starts[i]), 0), 6))
+    return lines
+
+#   option --heatmap file: cost table of the input regions,
+#   or an HTML page with the input lines coloured by cost,
+#   if the file name ends with '.html'
+#
+heatmap_entries = 20        # rows of paragraph and line tables
+heatmap_excerpt = 50        # characters of excerpt per row
+
+def write_heatmap(fn, name, txt, report):
+    lines = txt.split('\n')
+    costs = report['lines']
+    f = myopen(fn, encoding='utf-8', mode='w')
+    if fn.endswith('.html'):
+        write_heatmap_html(f, name, lines, costs, report['seconds'])
+    else:
+        write_heatmap_text(f, name, lines, costs, report['seconds'])
+    f.close()
+
+def write_heatmap_text(f, name, lines, costs, seconds):
+    def row(t, first, last):
+        excerpt = lines[first].strip()[:heatmap_excerpt]
+        where = ('line ' + str(first + 1) if first == last
+                    else 'lines ' + str(first + 1) + '-' + str(last + 1))
+        f.write('{:10.6f} s {:5.1f} %  {:14} | {}\n'.format(t,
+                    100 * t / seconds if seconds else 0, where, excerpt))
+
+    f.write('=== ' + name + ': ' + str(seconds) + ' s, '
+                + str(round(sum(costs), 6)) + ' s in input lines\n')
+    paras = []
+    first = None
+    for (i, lin) in enumerate(lines[:len(costs)] + ['']):
+        if lin.strip() and first is None:
+            first = i
+        elif not lin.strip() and first is not None:
+            paras.append((sum(costs[first:i]), first, i - 1))
+            first = None
+    f.write('\n=== paragraphs by cost\n')
+    for (t, first, last) in sorted(paras, key=lambda p: (-p[0], p[1]))[
+                                                        :heatmap_entries]:
+        row(t, first, last)
+    f.write('\n=== lines by cost\n')
+    for (t, i) in sorted(((t, i) for (i, t) in enumerate(costs)),
+                        key=lambda c: (-c[0], c[1]))[:heatmap_entries]:
+        row(t, i, i)
+
+def write_heatmap_html(f, name, lines, costs, seconds):
+    top = max(costs, default=0) or 1
+    f.write('<html>\n<head>\n<meta charset="UTF-8">\n<title>'
+                + html.escape(name) + '</title>\n</head>\n<body>\n'
+                + '<H3>' + html.escape(name) + ': ' + str(seconds)
+                + ' s</H3>\n<pre>\n')
+    for (i, lin) in enumerate(lines[:len(costs)]):
+        t = costs[i]
+        f.write('<span title="{:.6f} s" style="background: '
+                    'rgba(255,0,0,{:.2f})">{:5}  {}</span>\n'.format(t,
+                    t / top, i + 1, html.escape(lin)))
+    f.write('</pre>\n</body>\n</html>\n')
+
+#   option --profile file: the reports are collected in profile_reports,
+#   and written to the file as JSON list; each report gets the name
+#   of the input file
+#
+profile_reports = []
+
+def profile_take(file):
+    reports = [dict(file=file, **r) for r in profile_reports]
+    del profile_reports[:]
+    return reports
+
+def write_profile(fn, reports):
+    f = myopen(fn, encoding='utf-8', mode='w')
+    json.dump(reports, f, indent=1)
+    f.write('\n')
+    f.close()
+
+
 #######################################################################
 #
 #   This "reimplementation" of re.sub() operates a small machinery for
@@ -757,10 +1369,22 @@ def verbatim(s, mark, ast):
 #   placeholder is inserted in the number array.
 #
 def mysub(expr, repl, text, flags=0, track_repl=None, only_one=False):
+    if type(text[1]) is tuple:
+        return mysub_both(expr, repl, text, flags, track_repl, only_one)
     (txt, numbers) = text
+    if profile_data.active:
+        prof = profile_enter()
     res = ''
     last = 0
-    for m in re.finditer(expr, txt, flags=flags):
+    time_budget.text = text
+    time_budget.offset = 0
+    nm = 0
+    for m in rx.finditer(expr, txt, flags=flags):
+        nm += 1
+        if time_budget.deadline is not None:
+            time_budget.text = text
+            time_budget.offset = m.end(0)
+            budget_check()
         t = m.group(0)
         if type(repl) is str:
             ex = myexpand(m, repl, text)
@@ -784,9 +1408,13 @@ def mysub(expr, repl, text, flags=0, track_repl=None, only_one=False):
 
         (res, numbers) = mysub_combine(lin, res, r, nt, nr,
                                             numbers, nums2, text)
+        if profile_data.heat:
+            heat_add(prof, text, last)
         if only_one:
             break
 
+    if profile_data.active:
+        profile_leave(prof, 'mysub_calls', expr, len(txt), nm, 2, text)
     return (res + txt[last:], numbers)
 
 #   will be changed for tracking of character positions
@@ -904,7 +1532,15 @@ def myexpand(m, repl, text):
 
 def mysearch(expr, text, flags=0):
     (txt, n) = text
-    return re.search(expr, txt, flags=flags)
+    time_budget.text = text
+    time_budget.offset = 0
+    if not profile_data.active:
+        return rx.search(expr, txt, flags=flags)
+    prof = profile_enter()
+    m = rx.search(expr, txt, flags=flags)
+    profile_leave(prof, 'searches', expr, m.end(0) if m else len(txt),
+                    int(bool(m)), 2, text)
+    return m
 def text_get_txt(text):
     return text[0]
 def text_get_num(text):
@@ -951,18 +1587,239 @@ def text_new_char(s=None):
 
 #######################################################################
 #
-#   text2txt(): collects all actual work on text input
+#   LAB:LOWMEM
+#   compact number arrays for tracking of character offsets
+#   (Options.lowmem, option --low-memory)
+#   - a list of character offsets takes about 36 bytes per character
+#     of the text (pointer and int object), and mysub() holds two
+#     such lists; an array.array of int32 values needs 4 bytes
+#   - the functions replace their counterparts from above; number
+#     lists from replacement functions are converted on the fly
+#   - the number array returned by tex2txt() is an array.array;
+#     line numbers need little memory and are not affected
+#
+nums_typecode = 'i'     # int32, compare LAB:NUMS_FORMAT
+
+def nums_compact(nums):
+    if type(nums) is array.array:
+        return nums
+    return array.array(nums_typecode, nums)
+
+def mysub_combine_compact(pos, res, r, nt, nr, numbers, nums2, text):
+    if numbers is text[1]:
+        # myexpand() in mysub() still needs the original array
+        numbers = array.array(nums_typecode, numbers)
+    numbers[pos:pos+nt] = nums_compact(nums2[:nr])
+    return (res + r, numbers)
+
+def text_combine_compact(t1, t2):
+    nums = nums_compact(t1[1][:-1])
+    nums.extend(t2[1])
+    return (t1[0] + t2[0], nums)
+
+def text_add_frame_compact(pre, post, text):
+    nums = array.array(nums_typecode, [text[1][0]]) * len(pre)
+    nums.extend(text[1])
+    nums.extend([text[1][-1]] * len(post))
+    return (pre + text[0] + post, nums)
+
+def text_new_compact(s=None):
+    if s is None:
+        return ('', array.array(nums_typecode, [-1]))
+    return (s, array.array(nums_typecode, range(1, len(s) + 2)))
+
+
+#######################################################################
+#
+#   LAB:BOTH
+#   tracking of line numbers and character offsets at the same time,
+#   see tex2txt_multi()
+#   - the number array is a tuple (line numbers, character offsets),
+#     each updated by the functions from above
+#
+def mysub_both(expr, repl, text, flags, track_repl, only_one):
+    (txt, (nums_l, nums_c)) = text
+    orig_c = nums_c
+    if profile_data.active:
+        prof = profile_enter()
+    res = ''
+    last = 0
+    time_budget.text = text
+    time_budget.offset = 0
+    nm = 0
+    for m in rx.finditer(expr, txt, flags=flags):
+        nm += 1
+        if time_budget.deadline is not None:
+            time_budget.text = text
+            time_budget.offset = m.end(0)
+            budget_check()
+        t = m.group(0)
+        if type(repl) is str:
+            ex = myexpand(m, repl, text)
+        else:
+            ex = repl(m)
+        if type(ex) is tuple:
+            (r, (nums2_l, nums2_c)) = ex
+        else:
+            (r, nums2_l, nums2_c) = (ex, None, None)
+
+        res += txt[last:m.start(0)]
+        last = m.end(0)
+        (lin, nt_l, nr_l) = mysub_offsets_lins(res, t, r)
+        (pos, nt_c, nr_c) = mysub_offsets_char(res, t, r)
+        if nums2_l is None:
+            ll = nums_l[lin]
+            nums2_l = [ll,] + [-abs(ll),] * nr_l
+            cc = nums_c[pos]
+            nums2_c = [cc,] + [-abs(cc),] * nr_c
+
+        if track_repl:
+            track_repl((t, (nums_l[lin:lin+nt_l+1], nums_c[pos:pos+nt_c+1])),
+                            (r, (nums2_l, nums2_c)))
+
+        tmp = text_combine_lins((res, nums_l[:lin+1]), (r, nums2_l))
+        nums_l = text_combine_lins(tmp, ('', nums_l[lin+nt_l:]))[1]
+        (res, nums_c) = mysub_combine_char(pos, res, r, nt_c, nr_c,
+                                            nums_c, nums2_c, (txt, orig_c))
+        if profile_data.heat:
+            heat_add(prof, text, last)
+        if only_one:
+            break
+
+    if profile_data.active:
+        # called by mysub()
+        profile_leave(prof, 'mysub_calls', expr, len(txt), nm, 3, text)
+    return (res + txt[last:], (nums_l, nums_c))
+
+def text_combine_both(text1, text2):
+    (t1, (l1, c1)) = text1
+    (t2, (l2, c2)) = text2
+    l = text_combine_lins((t1, l1), (t2, l2))[1]
+    return (t1 + t2, (l, c1[:-1] + c2))
+
+def text_add_frame_both(pre, post, text):
+    (t, (l, c)) = text
+    return (
+        pre + t + post,
+        (text_add_frame_lins(pre, post, (t, l))[1],
+            text_add_frame_char(pre, post, (t, c))[1])
+    )
+
+def text_from_match_both(m, grp, text):
+    (t, (l, c)) = text
+    if m.string is not t:
+        fatal('text_from_match_both(): bad match object')
+    return (m.group(grp), (text_from_match_lins(m, grp, (t, l))[1],
+                            text_from_match_char(m, grp, (t, c))[1]))
+
+def text_new_both(s=None):
+    (t, l) = text_new_lins(s)
+    return (t, (l, text_new_char(s)[1]))
+
+
+#######################################################################
+#
+#   set language, option --extr, and definitions from option --defs
+#
+def set_declarations(options):
+    if not options.lang or options.lang == 'de':
+        set_language_de()
+    elif options.lang == 'en':
+        set_language_en()
+    else:
+        raise_error('problem', 'unrecognized language "' + options.lang
+                        + '" given in option --lang', xit=1)
+
+    if options.placeholders not in ('rotate', 'local'):
+        raise_error('problem', 'unrecognized mode "' + options.placeholders
+                        + '" given in option --placeholders', xit=1)
+
+    if options.extr:
+        options.extr_list = [m for m in options.extr.split(',') if m]
+        options.extr_re = '|'.join(options.extr_list)
+    else:
+        options.extr_list = []
+
+    global defs
+    defs = options.defs
+
+    set_regex_backend(options.regex, options.atomic)
+
+
+#   rotation of placeholders for maths parts, compare LAB:PARALLEL
+#   - placeholders are inserted in several passes over the whole text
+#     (stages), each starting with rotation state of preceding stage
+#   - in a parallel worker, the text consists of segments: the main text,
+#     followed by the texts extracted to the end of text, each starting
+#     with mark_tail; math_rotation_enter(m) switches to the segment of
+#     match m
+#   - starts: None, or list per stage of lists of (inline, display)
+#     rotations at start of each segment, relative to state after
+#     set_declarations()
+#   - counts: list per stage of lists of [inline, display] numbers of
+#     rotations per segment
+#   - used: list per stage of lists of flags per segment: placeholder has
+#     been inserted
+#
+math_rotation = Aux()
+math_rotation.starts = None
+def math_rotation_start():
+    math_rotation.base = (parms.inline_math, parms.display_math)
+    math_rotation.counts = []
+    math_rotation.used = []
+def math_rotation_stage():
+    math_rotation.counts.append([[0, 0]])
+    math_rotation.used.append([False])
+    math_rotation.string = None
+    math_rotation_set()
+def math_rotation_set():
+    if math_rotation.starts:
+        k = len(math_rotation.counts) - 1
+        seg = len(math_rotation.used[-1]) - 1
+        ((i, d), (inl, dis)) = (math_rotation.starts[k][seg],
+                                    math_rotation.base)
+        parms.inline_math = inl[i:] + inl[:i]
+        parms.display_math = dis[d:] + dis[:d]
+def math_rotation_enter(m):
+    if not parallel_tails.active:
+        return
+    if m.string is not math_rotation.string:
+        math_rotation.string = m.string
+        math_rotation.marks = [t.start(0) for t in
+                                re.finditer(re.escape(mark_tail), m.string)]
+    seg = bisect.bisect_right(math_rotation.marks, m.start(0))
+    while len(math_rotation.used[-1]) <= seg:
+        math_rotation.counts[-1].append([0, 0])
+        math_rotation.used[-1].append(False)
+        math_rotation_set()
+def math_rotation_count(kind):
+    math_rotation.counts[-1][-1][kind] += 1
+def math_rotation_use():
+    math_rotation.used[-1][-1] = True
+
+
+#######################################################################
+#
+#   tex2txt_core(): collects all actual work on text input
 #   - argument txt: input text string
 #   - argument options: options
+#   - argument extrs: None, or list of macro lists for tex2txt_multi()
 #   - return: tuple (text string, number array)
+#   - called by tex2txt() below
 #
 #######################################################################
 
-def tex2txt(txt, options):
+def tex2txt_core(txt, options, extrs=None):
 
     global mysub_offsets, mysub_combine, text_combine
     global text_add_frame, text_from_match, text_new
-    if options.char:
+    if extrs is not None:
+        # line numbers and character offsets, see LAB:BOTH
+        text_combine = text_combine_both
+        text_add_frame = text_add_frame_both
+        text_from_match = text_from_match_both
+        text_new = text_new_both
+    elif options.char:
         # track character offsets instead of line numbers
         mysub_offsets = mysub_offsets_char
         mysub_combine = mysub_combine_char
@@ -970,6 +1827,12 @@ def tex2txt(txt, options):
         text_add_frame = text_add_frame_char
         text_from_match = text_from_match_char
         text_new = text_new_char
+        if options.lowmem:
+            # see LAB:LOWMEM
+            mysub_combine = mysub_combine_compact
+            text_combine = text_combine_compact
+            text_add_frame = text_add_frame_compact
+            text_new = text_new_compact
     else:
         mysub_offsets = mysub_offsets_lins
         mysub_combine = mysub_combine_lins
@@ -978,27 +1841,14 @@ def tex2txt(txt, options):
         text_from_match = text_from_match_lins
         text_new = text_new_lins
 
-    if not options.lang or options.lang == 'de':
-        set_language_de()
-    elif options.lang == 'en':
-        set_language_en()
-    else:
-        raise_error('problem', 'unrecognized language "' + options.lang
-                        + '" given in option --lang', xit=1)
-
-    if options.extr:
-        options.extr_list = [m for m in options.extr.split(',') if m]
-        options.extr_re = '|'.join(options.extr_list)
-    else:
-        options.extr_list = []
-
-    global defs
-    defs = options.defs
+    set_declarations(options)
+    math_rotation_start()
 
     #   for mysub():
     #   text becomes a 2-tuple of text string and number array
     #
     text = text_new(txt)
+    begin_stage('verbatim')
 
 
     #######################################################################
@@ -1066,6 +1916,7 @@ def tex2txt(txt, options):
     #   \verb?x?
     #   \end{verbatim}
     while mysearch(expr, text, flags=re.M):
+        profile_round()
         text = mysub(expr, f, text, flags=re.M, only_one=True)
 
     text = mysub(verb_macro_tmp, r'\\verb', text)
@@ -1079,6 +1930,7 @@ def tex2txt(txt, options):
     #   remove % comments
     #   - line beginning with % is completely removed
     #
+    begin_stage('comments')
     text = mysub(r'^[ \t]*%.*\n', '', text, flags=re.M)
 
     #   - join current and next lines, if no space before first unescaped %;
@@ -1087,7 +1939,7 @@ def tex2txt(txt, options):
     #       + not, if \macro call directly before %
     #
     def f(m):
-        if re.search(r'(?<!\\)(\\\\)*\\' + macro_name + r'\Z', m.group(1)):
+        if rx.search(r'(?<!\\)(\\\\)*\\' + macro_name + r'\Z', m.group(1)):
             # \macro call before %: do no remove line break
             return text_from_match(m, 0, text)
         return text_from_match(m, 1, text)
@@ -1123,14 +1975,14 @@ def tex2txt(txt, options):
     #   test, whether the innermost group matches
     #
     def check_nesting_limits(text):
-        for m in re.finditer(re_braced(parms.max_depth_br + 1,
+        for m in rx.finditer(re_braced(parms.max_depth_br + 1,
                                 '(?P<inner>', ')'), text_get_txt(text)):
             if m.group('inner'):
                 # innermost {} braces did match
                 fatal('maximum nesting depth for {} braces exceeded,'
                         + ' parms.max_depth_br=' + str(parms.max_depth_br),
                             m.group(0))
-        for m in re.finditer(re_bracketed(parms.max_depth_br + 1,
+        for m in rx.finditer(re_bracketed(parms.max_depth_br + 1,
                                     '(?P<inner>', ')'), text_get_txt(text)):
             if m.group('inner'):
                 fatal('maximum nesting depth for [] brackets exceeded,'
@@ -1141,12 +1993,13 @@ def tex2txt(txt, options):
             + parms.environments()
         ):
             expr = re_nested_env(env[0], parms.max_depth_env + 1, '')
-            for m in re.finditer(expr, text_get_txt(text)):
+            for m in rx.finditer(expr, text_get_txt(text)):
                 if m.group('inner'):
                     fatal('maximum nesting depth for environments exceeded,'
                         + ' parms.max_depth_env=' + str(parms.max_depth_env),
                                 m.group(0))
 
+    begin_stage('nesting')
     check_nesting_limits(text)
 
     # check will be repeated during macro expansion and environment handling:
@@ -1156,7 +2009,7 @@ def tex2txt(txt, options):
     def mysub_check_nested(expr, repl, text):
         flag = Aux()
         def f(t, r):
-            if re.search(r'(?<!\\)[][{}]|\\(begin|end)' + end_mac,
+            if rx.search(r'(?<!\\)[][{}]|\\(begin|end)' + end_mac,
                                     text_get_txt(r)):
                 flag.flag = True
         flag.flag = False
@@ -1169,7 +2022,7 @@ def tex2txt(txt, options):
     #
     if parms.check_equation_replacements:
         for repl in parms.inline_math + parms.display_math:
-            m = re.search(r'^.*' + re.escape(repl) + r'.*$',
+            m = rx.search(r'^.*' + re.escape(repl) + r'.*$',
                             text_get_txt(text), flags=re.M)
             if m:
                 warning('equation replacement "' + repl
@@ -1188,11 +2041,13 @@ def tex2txt(txt, options):
     #     resolution order e.g. for \begin{proof}[...] and \begin{proof}?
     #   )
     #
+    begin_stage('macros')
     list_macs_envs = []
-    for (name, args, repl, extr) in (
+    for entry in (
         parms.system_macros()
         + parms.project_macros()
     ):
+        (name, args, repl, extr) = entry
         if name in options.extr_list:
             continue
         expr = r'\\' + name + end_mac
@@ -1209,10 +2064,15 @@ def tex2txt(txt, options):
         else:
             # at least one mandatory argument expected
             expr += re_args
+        profile_tag(expr, 'Macro(' + repr(name) + ')', entry,
+                        defs.system_macros + defs.project_macros)
         list_macs_envs.append((expr, mark_deleted + repl, extr))
-    for (name, args, repl) in parms.environment_begins():
+    for entry in parms.environment_begins():
+        (name, args, repl) = entry
         (re_args, repl) = re_code_args(args, repl, 'EnvBegin', name)
         expr = begin_lbr + name + r'\}' + re_args
+        profile_tag(expr, 'EnvBegin(' + repr(name) + ')', entry,
+                        defs.environment_begins)
         list_macs_envs.append((expr, mark_begin_env_sub + repl, ''))
 
     #   return a text element that only contains the replacements,
@@ -1237,7 +2097,8 @@ def tex2txt(txt, options):
                             match.group(0) if match else '')
         cnt += 1
         flag = False
-        for (expr, repl, extr) in list_macs_envs:
+        profile_round()
+        for (idx, (expr, repl, extr)) in enumerate(list_macs_envs):
             m = mysearch(expr, text)
             if m:
                 match = m
@@ -1245,6 +2106,8 @@ def tex2txt(txt, options):
                 if extr:
                     # append extracted text to the end of main text
                     e = extract_repls(expr, mark_deleted + extr, text)
+                    if parallel_tails.active:
+                        e = parallel_tail_add(e, (cnt, idx), expr, text)
                     text = mysub_check_nested(expr, repl, text)
                     text = mysub_check_nested(r'\Z', lambda m: e, text)
                 else:
@@ -1258,7 +2121,10 @@ def tex2txt(txt, options):
     #       [0]: search pattern as regular expression
     #       [1]: replacement text
     #
+    begin_stage('replacements')
     actions = list(parms.misc_replace())
+    for entry in actions:
+        profile_tag(entry[0], 'misc_replace', entry, defs.misc_replace)
 
     def f(m):
         ret = text_from_match(m, 2, text)
@@ -1273,6 +2139,8 @@ def tex2txt(txt, options):
             r'\\' + s + r'(?:' + sp_bracketed + r')?' + sp_braced,
             f
         )]
+        profile_tag(actions[-1][0], 'heading_macros ' + repr(s), s,
+                        defs.heading_macros)
 
     #   replace $$...$$ by equation* environment
     #
@@ -1288,20 +2156,57 @@ def tex2txt(txt, options):
     # replace $...$ and \(...\) by text from variable parms.inline_math
     # BUG: raises unnecessary warning e.g. on $x \text{ for $x>0$}$
     #
+    inline_dollar = r'(?<!\\)\$((?:' + braced + r'|[^\\$]|\\[^()])+)\$'
+    inline_paren = r'\\\(((?:' + braced + r'|[^\\$]|\\[^()])*)\\\)'
+
+    # LAB:PLACEHOLDERS
+    # option --placeholders local: choose placeholder by index of formula
+    # in current paragraph, counting inline formulas and placeholders
+    # already inserted
+    #
+    inline_local = Aux()
+    inline_local.string = None
+    def inline_math_local(m):
+        if m.string is not inline_local.string:
+            # new pass over text
+            inline_local.string = m.string
+            inline_local.paras = [0] + [p.end(0) for p in
+                                rx.finditer(r'\n[ \t]*\n', m.string)]
+            inline_local.expr = rx.compile(r'|'.join([inline_dollar,
+                                inline_paren] + [re.escape(s)
+                                for s in math_rotation.base[0]]))
+            inline_local.ends = {}
+        k = bisect.bisect_right(inline_local.paras, m.start(0)) - 1
+        if k not in inline_local.ends:
+            # end positions of formulas and placeholders in paragraph,
+            # scanned once per pass
+            beg = inline_local.paras[k]
+            end = (inline_local.paras[k+1] if k + 1 < len(inline_local.paras)
+                        else len(m.string))
+            inline_local.ends[k] = [p.end(0) for p in
+                                inline_local.expr.finditer(m.string, beg, end)]
+        n = bisect.bisect_right(inline_local.ends[k], m.start(0))
+        return math_rotation.base[0][(n + 1) % len(math_rotation.base[0])]
+
     def f(m):
-        m2 = re.search(r'(?<!\\)\$|\\\(|\\\)', m.group(1))
+        m2 = rx.search(r'(?<!\\)\$|\\\(|\\\)', m.group(1))
         if m2:
             warning('"' + m2.group(0)
                 + '" in {} braces (macro argument?): not properly handled',
                 m.group(0))
         # check for trailing interpunction
-        m2 = re.search(parms.mathpunct + r'\Z', m.group(1))
+        m2 = rx.search(parms.mathpunct + r'\Z', m.group(1))
         punct = m2.group(0) if m2 else ''
+        if options.placeholders == 'local':
+            return inline_math_local(m) + punct
         # rotate placeholder
+        math_rotation_enter(m)
         parms.inline_math = parms.inline_math[1:] + parms.inline_math[:1]
+        math_rotation_count(0)
+        math_rotation_use()
         return parms.inline_math[0] + punct
-    actions += [(r'(?<!\\)\$((?:' + braced + r'|[^\\$]|\\[^()])+)\$', f)]
-    actions += [(r'\\\(((?:' + braced + r'|[^\\$]|\\[^()])*)\\\)', f)]
+    actions += [(inline_dollar, f)]
+    actions += [(inline_paren, f)]
 
     #   macros \textxxx
     #
@@ -1316,13 +2221,17 @@ def tex2txt(txt, options):
     #   now perform the collected replacement actions
     #
     for (expr, repl) in actions:
+        math_rotation_stage()
         text = mysub(expr, repl, text, flags=re.M)
 
     #   fix-text replacements for environments:
     #   check for inclusion of {} etc.
     #
-    for (name, repl) in parms.environments():
+    for entry in parms.environments():
+        (name, repl) = entry
         env = re_nested_env(name, parms.max_depth_env, '')
+        profile_tag(env, 'EnvRepl(' + repr(name) + ')', entry,
+                        defs.environments)
         re_code_args('', repl, 'EnvRepl', name, no_backslash=True)
         text = mysub_check_nested(env,
                         mark_begin_env_sub + repl + mark_end_env_sub, text)
@@ -1359,6 +2268,7 @@ def tex2txt(txt, options):
         return mysub(r'\\' + mac + skip_space + r'(\{)?([a-zA-Z])(?(1)\})',
                                     f, text)
 
+    begin_stage('accents')
     for (mac, acc) in (
         ("'", 'ACUTE'),
         ('`', 'GRAVE'),
@@ -1419,9 +2329,12 @@ def tex2txt(txt, options):
 
     def display_math_update():
         parms.display_math = parms.display_math[1:] + parms.display_math[:1]
+        math_rotation_count(1)
     def display_math_get(update):
         if update:
             display_math_update()
+        if options.placeholders != 'local':
+            math_rotation_use()
         return parms.display_math[0]
 
     #   replace a maths part by suitable raw text
@@ -1429,7 +2342,7 @@ def tex2txt(txt, options):
     def math2txt(txt, first_on_line):
         # check for leading operator, possibly after maths space;
         # there also might be a '{}' or r'\mbox{}' for making e.g. '-' binary
-        m = re.search(r'\A(' + parms.mathspace
+        m = rx.search(r'\A(' + parms.mathspace
                         + r'|(?:\\mbox' + skip_space + r')?\{\}|\s)*'
                         + r'(' + parms.mathop + r')', txt)
         if m and not first_on_line:
@@ -1439,7 +2352,7 @@ def tex2txt(txt, options):
             update = True
         else:
             # check for leading maths space
-            m = re.search(r'\A(' + skip_space + parms.mathspace + r')+', txt)
+            m = rx.search(r'\A(' + skip_space + parms.mathspace + r')+', txt)
             if m:
                 pre = ' '
                 txt = txt[m.end(0):]
@@ -1448,7 +2361,7 @@ def tex2txt(txt, options):
             update = False
 
         # check for trailing maths space
-        m = re.search(r'(' + parms.mathspace + skip_space + r')+\Z', txt)
+        m = rx.search(r'(' + parms.mathspace + skip_space + r')+\Z', txt)
         if m:
             post = ' '
             txt = txt[:m.start(0)]
@@ -1459,7 +2372,7 @@ def tex2txt(txt, options):
             return pre + post
 
         # check for trailing interpunction
-        m = re.search(r'(' + parms.mathpunct + r')\Z', txt)
+        m = rx.search(r'(' + parms.mathpunct + r')\Z', txt)
         if not m:
             return pre + display_math_get(update) + post
         if txt == m.group(1):
@@ -1477,7 +2390,7 @@ def tex2txt(txt, options):
         last = 0
         res = ''
         # iterate over \text parts
-        for m in re.finditer(r'\\' + parms.text_macro + sp_braced, txt):
+        for m in rx.finditer(r'\\' + parms.text_macro + sp_braced, txt):
             # maths part between last and current \text
             res += math2txt(txt[last:m.start(0)], first_on_line)
             # content of \text{...}
@@ -1493,6 +2406,10 @@ def tex2txt(txt, options):
     #   parse the text of an equation environment
     #
     def parse_equ(equ):
+        if options.placeholders == 'local':
+            # compare LAB:PLACEHOLDERS: rotation only inside equation
+            parms.display_math = math_rotation.base[1]
+
         # first resolve sub-environments (e.g. cases) and mark_deleted
         # in order to see interpunction
         d = (r'((' + re_begin_env + r')|(' + re_end_env
@@ -1504,11 +2421,11 @@ def tex2txt(txt, options):
         # repl_line() and later repl_sec() may fail if \\ alias mark_linebreak
         # or later & are argument of a macro
         #
-        for f in re.finditer(braced, text_get_txt(equ)):
-            if re.search(mark_linebreak + r'|(?<!\\)&', f.group(1)):
+        for f in rx.finditer(braced, text_get_txt(equ)):
+            if rx.search(mark_linebreak + r'|(?<!\\)&', f.group(1)):
                 warning('"\\\\" or "&" in {} braces (macro argument?):'
                         + ' not properly handled',
-                        re.sub(mark_linebreak, r'\\\\', text_get_txt(equ)))
+                        rx.sub(mark_linebreak, r'\\\\', text_get_txt(equ)))
                 break
 
         # important: non-greedy *? repetition, and avoid zero-width matches
@@ -1541,11 +2458,17 @@ def tex2txt(txt, options):
 
     #   replace equation environments listed above
     #
-    for (name, args, replacement) in parms.equation_environments():
+    begin_stage('equations')
+    for entry in parms.equation_environments():
+        (name, args, replacement) = entry
+        math_rotation_stage()
+        what = 'EquEnv(' + repr(name) + ')'
         if not replacement:
             (re_args, _) = re_code_args(args, replacement, 'EquEnv', name)
             expr = re_nested_env(name, parms.max_depth_env, re_args)
+            profile_tag(expr, what, entry, defs.equation_environments)
             def f(m):
+                math_rotation_enter(m)
                 t = text_from_match(m, 'body', text)
                 t = parse_equ(t)
                 return text_add_frame(mark_begin_env, mark_end_env, t)
@@ -1553,12 +2476,14 @@ def tex2txt(txt, options):
             continue
         # environment with fixed replacement and added interpunction
         env = re_nested_env(name, parms.max_depth_env, '')
+        profile_tag(env, what, entry, defs.equation_environments)
         re_code_args('', replacement, 'EquEnv', name, no_backslash=True)
         def f(m):
+            math_rotation_enter(m)
             txt = parse_equ(text_from_match(m, 'body', text))
             txt = text_get_txt(txt).strip()
             s = replacement
-            m = re.search(r'(' + parms.mathpunct + r')\Z', txt)
+            m = rx.search(r'(' + parms.mathpunct + r')\Z', txt)
             if m:
                 s += m.group(1)
             return mark_begin_env + s + mark_end_env
@@ -1569,6 +2494,7 @@ def tex2txt(txt, options):
     #   replace \\ placeholder
     #   - only after treatment of equation environments
     #
+    begin_stage('space')
     text = mysub(r'\\,', mark_deleted + utf8_nnbsp, text)
     text = mysub(r'(?<!\\)~', mark_deleted + utf8_nbsp, text)
     text = mysub(r'(?<!\\)&', mark_deleted + ' ', text)
@@ -1585,6 +2511,7 @@ def tex2txt(txt, options):
     #   only print unknown macros and environments?
     #
     if options.unkn:
+        begin_stage('clean-up')
         unknowns = ''
         macsknown = (
             'begin', 
@@ -1596,116 +2523,119 @@ def tex2txt(txt, options):
             'itemize',
             'enumerate',
         )
-        macs = []
-        for m in re.finditer(r'\\(' + macro_name + r')', text_get_txt(text)):
-            if m.group(1) not in macs:
-                macs += [m.group(1)]
-        macs.sort()
-        for m in macs:
-            if m not in macsknown:
-                unknowns += '\\' + m + '\n'
-        envs = []
-        for m in re.finditer(begin_lbr + r'(' + environ_name + r')\}',
-                                text_get_txt(text)):
-            if m.group(1) not in envs:
-                envs += [m.group(1)]
-        envs.sort()
-        for e in envs:
-            if e not in envsknown:
-                unknowns += r'\begin{' + e + '}' + '\n'
+        macs = set(rx.findall(r'\\(' + macro_name + r')',
+                                text_get_txt(text)))
+        for m in sorted(macs.difference(macsknown)):
+            unknowns += '\\' + m + '\n'
+        envs = set(rx.findall(begin_lbr + r'(' + environ_name + r')\}',
+                                text_get_txt(text)))
+        for e in sorted(envs.difference(envsknown)):
+            unknowns += r'\begin{' + e + '}' + '\n'
         return (unknowns, [])
 
-    #   delete remaining \xxx macros unless given in --extr option;
-    #   if followed by braced argument: copy its content
-    #
-    excl = r'begin|end|item'
-    if options.extr:
-        excl += r'|' + options.extr_re
-    re_macro = r'\\(?!(?:' + excl + r')' + end_mac + r')' + macro_name
-                # 'x(?!y)' matches 'x' not followed by 'y'
-    re_macro_arg = re_macro + sp_braced
-    while mysearch(re_macro_arg, text):
-        # macros with braced argument might be nested
-        text = mysub(re_macro_arg, mark_deleted + r'\1' + mark_deleted, text)
-    text = mysub(re_macro + skip_space_macro, mark_deleted, text)
-
-    #   handle \item without [...] option,
-    #   or also with option, if not parms.keep_item_labels
-    #   - in itemize environment:
-    #     use values from parms.default_item_labs
-    #   - LAB:ENUMERATE in enumerate environment:
-    #     replace by values from parms.default_item_enum_labs
+    #   final steps, performed separately for each output of
+    #   tex2txt_multi(); argument extr_re: as options.extr_re, or None
     #
-    itemize_dict = {'itemize': parms.default_item_labs,
-                    'enumerate': parms.default_item_enum_labs}
-
-    # a stack to follow nested environments
-    # - if a lonely \item appears: pretend to be in itemize
-    itemize_stack = [itemize_dict['itemize']]
-
-    # this regular expression matches an \item
-    # (\item may skip arbitrary subsequent space) ...
-    if parms.keep_item_labels:
-        # do not match \item with [...] option (done below at LAB:ITEMS)
-        expr = r'(\\item' + end_mac + r'(?!' + sp_bracketed + r')\s*)'
-    else:
-        # \item option may be present
-        expr = r'(\\item' + end_mac + r'(?:' + sp_bracketed + r')?\s*)'
-    # ... and \begin / \end for environments listed in itemize_dict
-    expr += (r'|(?:\\(begin|end)' + skip_space
-                + r'\{(' + r'|'.join(itemize_dict.keys()) + r')\})')
+    def finish_macros(text, extr_re):
+        #   delete remaining \xxx macros unless given in --extr option;
+        #   if followed by braced argument: copy its content
+        #
+        begin_stage('clean-up')
+        excl = r'begin|end|item'
+        if extr_re:
+            excl += r'|' + extr_re
+        re_macro = r'\\(?!(?:' + excl + r')' + end_mac + r')' + macro_name
+                    # 'x(?!y)' matches 'x' not followed by 'y'
+        re_macro_arg = re_macro + sp_braced
+        while mysearch(re_macro_arg, text):
+            # macros with braced argument might be nested
+            profile_round()
+            text = mysub(re_macro_arg, mark_deleted + r'\1' + mark_deleted,
+                            text)
+        text = mysub(re_macro + skip_space_macro, mark_deleted, text)
+
+        #   handle \item without [...] option,
+        #   or also with option, if not parms.keep_item_labels
+        #   - in itemize environment:
+        #     use values from parms.default_item_labs
+        #   - LAB:ENUMERATE in enumerate environment:
+        #     replace by values from parms.default_item_enum_labs
+        #
+        begin_stage('items')
+        itemize_dict = {'itemize': parms.default_item_labs,
+                        'enumerate': parms.default_item_enum_labs}
+
+        # a stack to follow nested environments
+        # - if a lonely \item appears: pretend to be in itemize
+        itemize_stack = [itemize_dict['itemize']]
+
+        # this regular expression matches an \item
+        # (\item may skip arbitrary subsequent space) ...
+        if parms.keep_item_labels:
+            # do not match \item with [...] option (done below at LAB:ITEMS)
+            expr = r'(\\item' + end_mac + r'(?!' + sp_bracketed + r')\s*)'
+        else:
+            # \item option may be present
+            expr = r'(\\item' + end_mac + r'(?:' + sp_bracketed + r')?\s*)'
+        # ... and \begin / \end for environments listed in itemize_dict
+        expr += (r'|(?:\\(begin|end)' + skip_space
+                    + r'\{(' + r'|'.join(itemize_dict.keys()) + r')\})')
 
-    def f(m):
-        if m.group(1):
-            # an \item: return value from active label collection, rotate
-            lab = itemize_stack[-1][0]
-            itemize_stack[-1] = itemize_stack[-1][1:] + itemize_stack[-1][:1]
-            return ' ' + lab + ' '
-        if m.group(3) == 'begin':
-            # entering an environment (group 2 is in sp_bracketed)
-            itemize_stack.append(itemize_dict[m.group(4)])
-        elif len(itemize_stack) > 1:
-            # leaving an environment
-            itemize_stack.pop()
-        return mark_deleted
-    text = mysub(expr, f, text)
-
-    #   delete remaining environment frames outside of equations
-    #   - only after treatment of macros: protect line break before \begin;
-    #     here we also delete placeholders \begin{%} from above
-    #   - only after handling of itemize vs. enumerate
-    #
-    text = mysub(re_begin_env, mark_deleted, text)
-    text = mysub(re_end_env, mark_deleted, text)
-
-    #   LAB:ITEMS
-    #   \item(s) with [.] label may pose problems with interpunction checking
-    #   - one can simply remove the \item[...] label
-    #       - active, if parms.keep_item_labels == False
-    #   - one can look backwards in the text and repeat a present
-    #     interpunction sign after the item label
-    #       - active, if parms.item_label_repeat_punct == True
-    #       - works well with (German version of) LanguageTool
-    #       - this also checks text in the label
-    #       - this should be done after removal of all environment frames
-    #         between \item and a previous sentence
-    #   (\item[...] may skip arbitrary subsequent space)
-    #
-    if parms.keep_item_labels:
-        if parms.item_label_repeat_punct:
-            # try with preceding interpunction [.,;:!?] ...
-            def f(m):
-                # "manually" build replacement for r'\1 \3\2 ':
-                # otherwise, out-of-order inclusion r'\2' would deteriorate
-                # line number tracking
-                t1 = text_from_match(m, 1, text)
-                t3 = text_from_match(m, 3, text)
-                t3 = text_add_frame(' ', m.group(2) + ' ', t3)
-                return text_combine(t1, t3)
-            text = mysub(r'(((?<!\\)[.,;:!?])(?:\s|' + mark_deleted
-                            + r')*)\\item' + sp_bracketed + r'\s*', f, text)
-        # ... otherwise simply extract the text in \item[...]
-        text = mysub(r'\\item' + sp_bracketed + r'\s*', r' \1 ', text)
+        def f(m):
+            if m.group(1):
+                # an \item: return value from active label collection, rotate
+                lab = itemize_stack[-1][0]
+                itemize_stack[-1] = (itemize_stack[-1][1:]
+                                        + itemize_stack[-1][:1])
+                return ' ' + lab + ' '
+            if m.group(3) == 'begin':
+                # entering an environment (group 2 is in sp_bracketed)
+                itemize_stack.append(itemize_dict[m.group(4)])
+            elif len(itemize_stack) > 1:
+                # leaving an environment
+                itemize_stack.pop()
+            return mark_deleted
+        text = mysub(expr, f, text)
+
+        #   delete remaining environment frames outside of equations
+        #   - only after treatment of macros: protect line break before \begin;
+        #     here we also delete placeholders \begin{%} from above
+        #   - only after handling of itemize vs. enumerate
+        #
+        text = mysub(re_begin_env, mark_deleted, text)
+        text = mysub(re_end_env, mark_deleted, text)
+
+        #   LAB:ITEMS
+        #   \item(s) with [.] label may pose problems with interpunction
+        #   checking
+        #   - one can simply remove the \item[...] label
+        #       - active, if parms.keep_item_labels == False
+        #   - one can look backwards in the text and repeat a present
+        #     interpunction sign after the item label
+        #       - active, if parms.item_label_repeat_punct == True
+        #       - works well with (German version of) LanguageTool
+        #       - this also checks text in the label
+        #       - this should be done after removal of all environment frames
+        #         between \item and a previous sentence
+        #   (\item[...] may skip arbitrary subsequent space)
+        #
+        if parms.keep_item_labels:
+            if parms.item_label_repeat_punct:
+                # try with preceding interpunction [.,;:!?] ...
+                def f(m):
+                    # "manually" build replacement for r'\1 \3\2 ':
+                    # otherwise, out-of-order inclusion r'\2' would deteriorate
+                    # line number tracking
+                    t1 = text_from_match(m, 1, text)
+                    t3 = text_from_match(m, 3, text)
+                    t3 = text_add_frame(' ', m.group(2) + ' ', t3)
+                    return text_combine(t1, t3)
+                text = mysub(r'(((?<!\\)[.,;:!?])(?:\s|' + mark_deleted
+                                + r')*)\\item' + sp_bracketed + r'\s*',
+                                f, text)
+            # ... otherwise simply extract the text in \item[...]
+            text = mysub(r'\\item' + sp_bracketed + r'\s*', r' \1 ', text)
+        return text
 
 
     ##################################################################
@@ -1723,35 +2653,15 @@ def tex2txt(txt, options):
     #   - space in phrase to be replaced is arbitrary (but within current
     #     paragraph)
     #
+    #   - all lines are compiled into few regular expressions,
+    #     see LAB:REPL_MATCHER
+    #
     def do_option_repl(text):
-        (lines, fname) = options.repl
-        for lin in lines:
-            i = lin.find('#')
-            if i >= 0:
-                lin = lin[:i]
-            lin = lin.split()
-
-            t = s = ''
-            for i in range(len(lin)):
-                if lin[i] == '&':
-                    break
-                t += s + re.escape(lin[i])
-                        # protect e.g. '.' and '$'
-                s = r'(?:[ \t]*\n[ \t]*|[ \t]+)'
-                        # at least one space character, but stay in paragraph
-            if not t:
-                continue
-            if t[0].isalpha():
-                t = r'\b' + t       # require word boundary
-            if t[-1].isalpha():
-                t = t + r'\b'
-
-            r = ' '.join(lin[i+1:])
-            if re.search(r'(?<!\\)%', r):
-                fatal('please use escaped \\% for replacement in file "'
-                                    + fname + '"', r)
-            r = re.sub('\\\\', '\\\\\\\\', r)       # \ ==> \\
-            text = mysub(t, r, text)
+        for (expr, table) in repl_matcher(options.repl):
+            if type(table) is str:
+                text = mysub(expr, table, text)
+            else:
+                text = mysub(expr, lambda m: table[repl_normalize(m)], text)
         return text
 
 
@@ -1763,9 +2673,11 @@ def tex2txt(txt, options):
 
     #   work to be done just before output
     #
-    def before_output(text):
+    def before_output(text, repl):
+        begin_stage('output')
         # if braces {...} did remain somewhere: delete them
         while mysearch(braced, text):
+            profile_round()
             text = mysub(braced, mark_deleted + r'\1' + mark_deleted, text)
 
         # remove mark_deleted:
@@ -1775,7 +2687,8 @@ def tex2txt(txt, options):
         text = mysub(mark_deleted, '', text)
 
         # option --repl
-        if options.repl:
+        if repl and options.repl:
+            begin_stage('option --repl')
             text = do_option_repl(text)
 
         # resolve backslash escapes for {, }, $, %, _, &, #
@@ -1793,37 +2706,685 @@ def tex2txt(txt, options):
                 + mark_verbatim[0] + r'(\d+)' + mark_verbatim[1], f, text)
         return text
 
-    if options.extr:
-        # on option --extr: only print arguments of these macros
-        expr = (r'\\(?:' + options.extr_re + r')(?:' + sp_bracketed
-                        + r')*' + sp_braced)
-        text = extract_repls(expr, r'\2', text)
-
-    text = before_output(text)
-    if warning_or_error.msg:
-        # there was a problem: include message, clear for next call
-        text = text_add_frame(warning_or_error.msg, '', text)
-        warning_or_error.msg = ''
-    return text
+    def finish(text, extr_re, repl=True):
+        text = finish_macros(text, extr_re)
+        if extr_re:
+            # on option --extr: only print arguments of these macros
+            expr = (r'\\(?:' + extr_re + r')(?:' + sp_bracketed
+                            + r')*' + sp_braced)
+            text = extract_repls(expr, r'\2', text)
+
+        text = before_output(text, repl)
+        if warning_or_error.msg:
+            # there was a problem: include message, clear for next call
+            text = text_add_frame(warning_or_error.msg, '', text)
+            warning_or_error.msg = ''
+        return text
+
+    if extrs is None:
+        return finish(text, options.extr_re if options.extr else None)
+
+    # tex2txt_multi(): main text and extractions from the same text;
+    # an extraction of declared macros needs a separate run,
+    # since these macros are already resolved above
+    declared = set(name for (name, _, _, _) in
+                        parms.system_macros() + parms.project_macros())
+    msg = warning_or_error.msg
+    ret = [finish(text, options.extr_re if options.extr else None)]
+    for extr in extrs:
+        names = [m for m in extr.split(',') if m]
+        if not names or declared.intersection(names + options.extr_list):
+            ret.append(None)
+            continue
+        warning_or_error.msg = msg
+        ret.append(finish(text, '|'.join(names), repl=False))
+    return ret
 
 ####################################################
 #
-#   end of function tex2txt()
+#   end of function tex2txt_core()
 #
 ####################################################
 
+#   LAB:CACHE
+#   persistent on-disk result cache for tex2txt()
+#   - one file per result, named by a SHA-256 key computed from input text,
+#     contents of the files from options --defs and --repl, the options
+#     that influence the result, and the source code of this script
+#   - file format: header, UTF-8 text, little-endian int32 number array;
+#     thus a cache hit is a single read
+#   - if the total size of the cache directory exceeds the limit,
+#     least recently used entries are deleted
+#
+cache_magic = b'T2TC'
+cache_version = 1
+cache_header = struct.Struct('<4sBBxxII')
+        # magic, version, flags, pad, length of text in bytes, # of numbers
+cache_flag_char = 1
+cache_suffix = '.t2tc'
+cache_default_size = 200 * 1024 * 1024      # bytes
+
+cache_state = Aux()
+cache_state.source_hash = None
+def cache_source_hash():
+    # hash of this script: changes of parms.* in the script invalidate cache
+    if cache_state.source_hash is None:
+        try:
+            with open(__file__, mode='rb') as f:
+                cache_state.source_hash = hashlib.sha256(f.read()).digest()
+        except:
+            cache_state.source_hash = b'?'
+    return cache_state.source_hash
+
+def cache_key(txt, options):
+    h = hashlib.sha256()
+    def add(s):
+        if type(s) is str:
+            s = s.encode('utf-8', errors='surrogatepass')
+        # length prefix avoids ambiguities at concatenation
+        h.update(str(len(s)).encode('ascii') + b':' + s)
+    add(cache_source_hash())
+    add(txt)
+    add(options.defs.code or '')
+    add(''.join(options.repl[0]) if options.repl else '')
+    add(repr((options.lang, options.extr, bool(options.char),
+                    bool(options.unkn), options.placeholders,
+                    options.regex, bool(options.atomic))))
+    return h.hexdigest()
+
+def cache_read(directory, key, compact=False):
+    fn = os.path.join(directory, key + cache_suffix)
+    try:
+        with open(fn, mode='rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        (magic, version, flags, ntxt, nnum) = cache_header.unpack_from(data)
+        if (magic != cache_magic or version != cache_version
+                or len(data) != cache_header.size + ntxt + 4 * nnum):
+            return None
+        beg = cache_header.size
+        txt = data[beg:beg+ntxt].decode('utf-8', errors='surrogatepass')
+        nums = array.array('i')
+        nums.frombytes(data[beg+ntxt:])
+        if sys.byteorder != 'little':
+            nums.byteswap()
+    except (struct.error, UnicodeDecodeError, ValueError):
+        return None
+    try:
+        # mark entry as recently used
+        os.utime(fn)
+    except OSError:
+        pass
+    if compact:
+        # compact array as from tex2txt_core(), see LAB:LOWMEM
+        return (txt, nums_compact(nums))
+    return (txt, nums.tolist())
+
+def cache_write(directory, key, text, options):
+    (txt, nums) = text
+    txt = txt.encode('utf-8', errors='surrogatepass')
+    nums = array.array('i', nums)
+    if sys.byteorder != 'little':
+        nums.byteswap()
+    flags = cache_flag_char if options.char else 0
+    data = (cache_header.pack(cache_magic, cache_version, flags,
+                                len(txt), len(nums))
+                + txt + nums.tobytes())
+    fn = os.path.join(directory, key + cache_suffix)
+    tmp = fn + '.' + str(os.getpid())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp, mode='wb') as f:
+            f.write(data)
+        os.replace(tmp, fn)
+    except OSError:
+        warning('could not write cache file "' + fn + '"')
+        return
+    cache_evict(directory, options.cache_size or cache_default_size)
+
+def cache_evict(directory, limit):
+    entries = []
+    total = 0
+    try:
+        for e in os.scandir(directory):
+            if not e.name.endswith(cache_suffix):
+                continue
+            st = e.stat()
+            entries.append((st.st_mtime, st.st_size, e.path))
+            total += st.st_size
+    except OSError:
+        return
+    entries.sort()
+    for (_, size, path) in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+#   LAB:REGIONS
+#   find "safe" blank lines where the LaTeX text can be split into regions;
+#   apart from state carried across regions (rotation of equation
+#   replacements, extraction of footnotes etc. to the end of text),
+#   each region can be converted separately with the same result
+#   - a blank line is safe, if it is outside of
+#       - {} braces, environments (except those in region_top_environments,
+#         e.g. document), and maths $...$, $$...$$, \(...\), \[...\],
+#       - [] brackets that might form an optional macro argument
+#         (bracket following a declared macro with arguments 'O' or 'P',
+#         a heading macro, \item, \begin{...}, \\, or a preceding argument),
+#       - verbatim parts and % comments,
+#     and if not directly following a % comment
+#   - argument headings: also split before a line starting with a heading
+#     macro like \section under the same conditions, if the previous line
+#     ends with a letter, digit or punctuation mark that cannot belong to
+#     a macro
+#   - return list of offsets where regions start (empty, if no safe blank
+#     line was found or if \item appears outside of environments)
+#
+region_top_environments = ('document',)
+region_heading_prev = re.compile(r'(?:(?<![\\a-zA-Z])[a-zA-Z]+'
+                                    + r'|(?<!\\)[\d.,;:!?)\]}\'"-])[ \t]*\Z')
+
+def region_starts(txt, options, headings=False):
+    set_declarations(options)
+    names = [name for (name, args, _, _) in (parms.system_macros()
+                                                + parms.project_macros())
+                    if 'O' in args or 'P' in args]
+    names += list(parms.heading_macros()) + ['item']
+    re_bracket_macro = re.compile(r'(?:' + r'|'.join(names) + r')')
+    re_heading = re.compile(r'(?:' + r'|'.join(parms.heading_macros()) + r')')
+    re_top_env = (begin_lbr + r'(?:' + r'|'.join(region_top_environments)
+                    + r')\}')
+
+    expr = (r'(?P<blank>\n[ \t]*(?=\n))'
+        + r'|(?P<comment>%.*)'
+        + r'|(?P<verb>\\verb' + end_mac + r'\*?(?P<vdel>[^\s*]).*?(?P=vdel))'
+        + r'|(?P<verbatim>' + begin_lbr + r'verbatim(?P<vast>\*?)\}'
+                + r'(?:.|\n)*?\\end\{verbatim(?P=vast)\})'
+        + r'|(?P<top>(?:' + re_top_env + r')|(?:'
+                + re_top_env.replace('begin', 'end', 1) + r'))'
+        + r'|(?P<begin>' + re_begin_env + r')'
+        + r'|(?P<end>' + re_end_env + r')'
+        + r'|(?P<linebreak>\\\\)'
+        + r'|(?P<mopen>\\[(\[])|(?P<mclose>\\[)\]])'
+        + r'|\\(?P<mac>' + macro_name + r'\*?)'
+        + r'|(?P<esc>\\(?:.|\n)?)'
+        + r'|(?P<dd>\$\$)|(?P<d>\$)'
+        + r'|(?P<lbr>\{)|(?P<rbr>\})|(?P<lbk>\[)|(?P<rbk>\])'
+        + r'|(?P<other>[^\s\\{}\[\]$%]+)')
+
+    starts = []
+    env = brace = bracket = math = 0
+    dollar = dollar_dollar = False
+    chains = set()      # brace depths, at which [...] may be an argument
+    comment_end = -1
+    for m in re.finditer(expr, txt):
+        kind = m.lastgroup
+        if kind == 'blank':
+            chains.clear()
+            if not (env or brace or bracket or math or dollar
+                        or dollar_dollar or comment_end == m.start(0)):
+                # after a % comment, the line break might be removed
+                # at the end of a region, see LAB:COMMENTS
+                starts.append(m.start(0) + 1)
+            continue
+        if kind == 'comment':
+            comment_end = m.end(0)
+            continue
+        if kind in ('verb', 'verbatim', 'top'):
+            continue
+        if kind == 'lbr':
+            brace += 1
+            continue
+        if kind == 'rbr':
+            brace = max(brace - 1, 0)
+            chains = set(c for c in chains if c <= brace)
+            continue
+        if bracket:
+            # inside of a possible optional argument
+            if kind == 'lbk':
+                bracket += 1
+            elif kind == 'rbk':
+                bracket -= 1
+            continue
+        if kind == 'lbk':
+            if brace in chains:
+                bracket = 1
+            continue
+        chains.discard(brace)
+        if kind == 'begin':
+            env += 1
+            chains.add(brace)
+        elif kind == 'end':
+            env = max(env - 1, 0)
+        elif kind == 'linebreak':
+            chains.add(brace)
+        elif kind == 'mopen':
+            math += 1
+        elif kind == 'mclose':
+            math = max(math - 1, 0)
+        elif kind == 'mac':
+            name = m.group('mac')
+            if name == 'item' and not env:
+                # \item may skip blank lines, compare LAB:ENUMERATE
+                return []
+            if (headings and re_heading.fullmatch(name)
+                    and not (env or brace or bracket or math or dollar
+                                or dollar_dollar)):
+                beg = txt.rfind('\n', 0, m.start(0)) + 1
+                if (beg > 0 and not txt[beg:m.start(0)].strip()
+                        and comment_end != beg - 1
+                        and region_heading_prev.search(txt,
+                                    txt.rfind('\n', 0, beg - 1) + 1, beg - 1)):
+                    starts.append(beg)
+            if (re_bracket_macro.fullmatch(name)
+                    or re_bracket_macro.fullmatch(name.rstrip('*'))):
+                chains.add(brace)
+        elif kind == 'dd':
+            dollar_dollar = not dollar_dollar
+        elif kind == 'd':
+            dollar = not dollar
+    return starts
+
+#   LAB:PARALLEL
+#   conversion of a single document in parallel processes (Options.jobs)
+#   - the text is split at safe blank lines and before headings, see
+#     LAB:REGIONS; neighbouring regions are collected into chunks
+#   - number arrays of the chunks are shifted by the line or character
+#     offset of the chunk, and the results are joined with text_combine()
+#   - extraction of macro arguments to the end of text (e.g. \footnote):
+#     a worker puts a line with mark_tail in front of each extracted text;
+#     the converted text is split at these lines into segments, and the
+#     extracted segments of all chunks are appended in the order of serial
+#     conversion: by round of the macro loop, macro, and chunk
+#   - if the order of the extracted texts of serial conversion cannot be
+#     restored (a macro found in extracted text of one chunk and in the
+#     main text of a later chunk), the document is converted serially
+#   - rotation of placeholders for maths parts: first, all chunks are
+#     converted independently; from the numbers of rotations in each
+#     stage and segment (see math_rotation), the rotation states of serial
+#     conversion are computed, and chunks that have inserted placeholders
+#     with another state are converted again
+#     (never with option --placeholders local, see LAB:PLACEHOLDERS)
+#   - options --extr and --unkn need the whole text: serial conversion
+#   - warnings of the workers are printed in order of the chunks,
+#     the message in the text only once at the beginning
+#
+parallel_min_chunk = 20000      # minimum size of a chunk in characters
+
+#   return list of chunk starts, or None for serial conversion
+#
+def parallel_chunks(txt, options, jobs):
+    if options.extr or options.unkn or mark_tail in txt:
+        return None
+    size = max(parallel_min_chunk, len(txt) // (4 * jobs))
+    starts = [0]
+    for beg in region_starts(txt, options,
+                                headings=options.placeholders != 'local'):
+        if beg - starts[-1] >= size and len(txt) - beg >= size:
+            starts.append(beg)
+    return starts if len(starts) > 1 else None
+
+#   in a worker: for each text extracted to the end of text, key (round,
+#   macro index) and list of origins of the matches: None for main text,
+#   or key of the extracted text containing the match
+#
+parallel_tails = Aux()
+parallel_tails.active = False
+
+def parallel_tail_add(e, key, expr, text):
+    txt = text_get_txt(text)
+    marks = [m.start(0) for m in re.finditer(re.escape(mark_tail), txt)]
+    origins = []
+    for m in rx.finditer(expr, txt):
+        seg = bisect.bisect_right(marks, m.start(0))
+        origins.append(parallel_tails.keys[seg-1] if seg else None)
+    parallel_tails.keys.append(key)
+    parallel_tails.origins.append(origins)
+    return text_add_frame('\n' + mark_tail + '\n', '', e)
+
+#   split converted text of a worker at the lines with mark_tail:
+#   return list of segments, or None if the marks have not been preserved
+#
+def parallel_tail_split(text, char):
+    (txt, nums) = text
+    marks = [m.start(0) for m in re.finditer(re.escape(mark_tail), txt)]
+    if len(marks) != len(parallel_tails.keys):
+        return None
+    segs = []
+    (beg, first) = (0, 0)
+    for p in marks:
+        end = p + len(mark_tail) + 1
+        if txt[p-1:p] != '\n' or txt[end-1:end] != '\n':
+            return None
+        if char:
+            (stop, next_first) = (p, end)
+        else:
+            stop = txt.count('\n', 0, p)
+            next_first = stop + 1
+        segs.append((txt[beg:p-1], nums[first:stop]))
+        (beg, first) = (end, next_first)
+    segs.append((txt[beg:], nums[first:]))
+    return segs
+
+parallel_worker = Aux()
+
+def parallel_worker_init(options):
+    parallel_worker.options = options
+
+def parallel_worker_convert(job):
+    (txt, starts) = job
+    options = parallel_worker.options
+    count = warning_or_error.count
+    save_stderr = sys.stderr
+    sys.stderr = io.StringIO()
+    math_rotation.starts = starts
+    parallel_tails.active = True
+    parallel_tails.keys = []
+    parallel_tails.origins = []
+    try:
+        text = tex2txt_core(txt, options)
+    except SystemExit:
+        text = None
+    finally:
+        err = sys.stderr.getvalue()
+        sys.stderr = save_stderr
+        math_rotation.starts = None
+        parallel_tails.active = False
+    warned = warning_or_error.count != count
+    segs = None
+    if text and warned:
+        # remove message added by tex2txt_core()
+        msg = parms.warning_error_msg
+        n = len(msg) if options.char else msg.count('\n')
+        text = (text[0][len(msg):], text[1][n:])
+    if text:
+        segs = parallel_tail_split(text, options.char)
+        if segs is None:
+            # cannot split: convert whole document serially
+            err = None
+    return (segs, math_rotation.counts, math_rotation.used, warned, err,
+                parallel_tails.keys, parallel_tails.origins)
+
+#   order of segments in serial conversion: list of (chunk, segment),
+#   or None if this order cannot be restored
+#
+def parallel_order(res):
+    tails = sorted((key, k, seg + 1) for (k, r) in enumerate(res)
+                        for (seg, key) in enumerate(r[5]))
+    for key in set(key for (key, _, _) in tails):
+        # matches of macro with this key in chunk order, and in order of
+        # serial conversion: main texts of all chunks before extracted texts
+        found = [(k, o) for (k, r) in enumerate(res) if key in r[5]
+                    for o in r[6][r[5].index(key)]]
+        if found != sorted(found, key=lambda x: (x[1] is not None,
+                                                    x[1] or (), x[0])):
+            return None
+    return ([(k, 0) for k in range(len(res))]
+                + [(k, seg) for (_, k, seg) in tails])
+
+#   rotation states at start of stages for serial conversion:
+#   return list per chunk of lists per stage of lists of (inline, display)
+#   per segment; argument order as from parallel_order()
+#
+def parallel_rotations(res, order):
+    (ni, nd) = (len(parms.inline_math), len(parms.display_math))
+    starts = [[[(0, 0)] * (len(r[5]) + 1) for _ in r[1]] for r in res]
+    (i, d) = (0, 0)
+    for stage in range(len(res[0][1])):
+        for (k, seg) in order:
+            starts[k][stage][seg] = (i, d)
+            counts = res[k][1][stage]
+            if seg < len(counts):
+                i = (i + counts[seg][0]) % ni
+                d = (d + counts[seg][1]) % nd
+    return starts
+
+def tex2txt_parallel(txt, options):
+    starts = parallel_chunks(txt, options, options.jobs)
+    if not starts:
+        return tex2txt_core(txt, options)
+    ends = starts[1:] + [len(txt)]
+    chunks = [txt[beg:end] for (beg, end) in zip(starts, ends)]
+
+    import multiprocessing
+    begin_stage('parallel')
+    with multiprocessing.Pool(min(options.jobs, len(chunks)),
+                                initializer=parallel_worker_init,
+                                initargs=(options,)) as pool:
+        res = pool.map(parallel_worker_convert,
+                                [(c, None) for c in chunks])
+        order = None
+        if all(r[0] for r in res):
+            order = parallel_order(res)
+        if order:
+            if len(set(len(r[1]) for r in res)) != 1:
+                fatal('tex2txt_parallel(): different numbers of stages')
+            serial = parallel_rotations(res, order)
+            redo = []
+            for (k, r) in enumerate(res):
+                own = parallel_rotations([r], [(0, seg) for seg in
+                                                range(len(r[5]) + 1)])[0]
+                if any(u and own[s][seg] != serial[k][s][seg]
+                            for (s, used) in enumerate(r[2])
+                            for (seg, u) in enumerate(used)):
+                    redo.append(k)
+            for (k, r) in zip(redo, pool.map(parallel_worker_convert,
+                                [(chunks[k], serial[k]) for k in redo])):
+                res[k] = r
+    if any(r[4] is None for r in res) or (all(r[0] for r in res)
+                                            and not order):
+        return tex2txt_core(txt, options)
+
+    if options.char and options.lowmem:
+        (combine, add_frame) = (text_combine_compact, text_add_frame_compact)
+    elif options.char:
+        (combine, add_frame) = (text_combine_char, text_add_frame_char)
+    else:
+        (combine, add_frame) = (text_combine_lins, text_add_frame_lins)
+    for r in res:
+        sys.stderr.write(r[4])
+        if r[0] is None:
+            sys.exit(1)
+    def shift(k, seg):
+        beg = starts[k]
+        off = beg if options.char else txt.count('\n', 0, beg)
+        t = res[k][0][seg]
+        return (t[0], [n + off if n >= 0 else n - off for n in t[1]])
+    text = None
+    for (k, seg) in order:
+        t = shift(k, seg)
+        text = combine(text, t) if text else t
+    # like serial conversion: number at end of last chunk
+    text[1][-1] = shift(len(res) - 1, -1)[1][-1]
+    if any(r[3] for r in res):
+        warning_or_error.count += 1
+        text = add_frame(parms.warning_error_msg, '', text)
+    return text
+
+#   main entry point of the module
+#   - argument txt: input text string
+#   - argument options: options
+#   - return: tuple (text string, number array)
+#
+def tex2txt(txt, options):
+    convert = tex2txt_parallel if (options.jobs or 1) > 1 else tex2txt_core
+    if not options.cache_dir:
+        return profile_run(txt, options, convert, txt, options)
+    key = cache_key(txt, options)
+    text = cache_read(options.cache_dir, key,
+                        compact=options.char and options.lowmem)
+    if text is not None:
+        return text
+    count = warning_or_error.count
+    text = profile_run(txt, options, convert, txt, options)
+    if warning_or_error.count == count:
+        # do not store results with warnings: messages would be lost
+        cache_write(options.cache_dir, key, text, options)
+    return text
+
+#   LAB:MULTI
+#   conversion with several outputs from a single pass, compare LAB:BOTH
+#   - argument extrs: list of comma-separated macro lists as for option
+#     --extr
+#   - return: list of tuples (text string, (line numbers, char offsets)),
+#     first the main text, then an extraction for each entry of extrs
+#   - the extractions share the whole conversion except for the final
+#     steps; for an extraction of declared macros, or if options.extr
+#     contains declared macros, tex2txt_core() is run again
+#   - as for a separate run with option --extr, but without option
+#     --repl, the replacements from options.repl are not applied to the
+#     extractions
+#   - options.char, options.jobs and options.cache_dir are ignored
+#
+def tex2txt_multi(txt, options, extrs):
+    if options.unkn:
+        raise_error('problem', 'multiple outputs not possible with'
+                        + ' option --unkn', xit=1)
+    def run():
+        texts = tex2txt_core(txt, options, extrs)
+        for (i, extr) in enumerate(extrs):
+            if texts[i+1] is None:
+                opts = copy.copy(options)
+                opts.extr = extr
+                opts.repl = None
+                texts[i+1] = tex2txt_core(txt, opts, [])[0]
+        return texts
+    return profile_run(txt, options, run)
+
 #   output of text string and line number information
+#   - for a project (see LAB:PROJECT), each number is preceded by
+#     the file name and ':'
+#   - nums_format 'bin' or 'rle': fn is a binary stream, see LAB:NUMS_FORMAT
 #
-def write_output(text, ft, fn):
+def write_output(text, ft, fn, project=None, char=False,
+                    nums_format='text'):
     if ft:
         ft.write(text_get_txt(text))
-    if fn:
-        for n in text_get_num(text):
+    if fn and nums_format != 'text':
+        write_numbers(text_get_num(text), fn, char, nums_format == 'rle')
+    elif fn:
+        nums = text_get_num(text)
+        if project:
+            nums = project_numbers(project, nums, char)
+        else:
+            nums = ((None, n) for n in nums)
+        for (fid, n) in nums:
             s = str(abs(n))
             if n < 0:
                 s += '+'
+            if fid is not None:
+                s = project.files[fid] + ':' + s
             fn.write(s + '\n')
 
+#   LAB:NUMS_FORMAT
+#   binary format of number array on option --nums-format bin or rle
+#   - header nums_header, followed by little-endian int32 values
+#   - format bin: the numbers
+#   - format rle: triples (end, first, step) for runs of numbers
+#     first, first + step, ..., where end is the index after the run
+#   - read_numbers() returns a sequence object for all formats;
+#     binary files are memory-mapped, thus reading needs no parsing
+#
+nums_magic = b'T2TN'
+nums_version = 1
+nums_header = struct.Struct('<4sBBxxII')
+        # magic, version, flags, pad, # of numbers, # of int32 values
+nums_flag_char = 1
+nums_flag_rle = 2
+
+def write_numbers(nums, f, char, rle):
+    if rle:
+        data = array.array('i')
+        i = 0
+        while i < len(nums):
+            step = nums[i+1] - nums[i] if i + 1 < len(nums) else 0
+            j = i + 1
+            while j < len(nums) and nums[j] - nums[j-1] == step:
+                j += 1
+            data.extend((j, nums[i], step))
+            i = j
+    else:
+        data = array.array('i', nums)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    flags = ((nums_flag_char if char else 0)
+                | (nums_flag_rle if rle else 0))
+    f.write(nums_header.pack(nums_magic, nums_version, flags, len(nums),
+                                len(data)))
+    f.write(data.tobytes())
+
+class NumberFile:
+    def __init__(self, fn):
+        self.fn = fn
+        self.mmap = None
+        with open(fn, mode='rb') as f:
+            head = f.read(nums_header.size)
+            if (len(head) == nums_header.size
+                    and head.startswith(nums_magic)):
+                self.read_binary(f, head)
+                return
+        # text format
+        f = myopen(fn, encoding='utf-8')
+        words = f.read().split()
+        f.close()
+        try:
+            self.data = array.array('i', (-int(s[:-1]) if s.endswith('+')
+                                            else int(s) for s in words))
+        except ValueError:
+            raise_error('problem', 'bad number in file "' + fn + '"', xit=1)
+        (self.char, self.rle, self.length) = (None, False, len(self.data))
+
+    def read_binary(self, f, head):
+        (_, version, flags, self.length, n) = nums_header.unpack(head)
+        size = nums_header.size + 4 * n
+        if version != nums_version or os.fstat(f.fileno()).st_size != size:
+            raise_error('problem', 'bad binary number file "' + self.fn
+                            + '"', xit=1)
+        self.char = bool(flags & nums_flag_char)
+        self.rle = bool(flags & nums_flag_rle)
+        if n == 0:
+            self.data = array.array('i')
+        elif sys.byteorder == 'little':
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.mmap)[nums_header.size:].cast('i')
+        else:
+            self.data = array.array('i')
+            self.data.frombytes(f.read())
+            self.data.byteswap()
+        if self.rle:
+            self.ends = self.data[0::3]
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= self.length:
+            raise IndexError('NumberFile index out of range')
+        if not self.rle:
+            return self.data[i]
+        k = bisect.bisect_right(self.ends, i)
+        beg = self.ends[k-1] if k else 0
+        return self.data[3*k+1] + self.data[3*k+2] * (i - beg)
+
+    def close(self):
+        if self.mmap:
+            if self.rle:
+                self.ends.release()
+            self.data.release()
+            self.mmap.close()
+            self.mmap = None
+
+def read_numbers(fn):
+    return NumberFile(fn)
+
 #   function for translation of line and column numbers
 #
 def translate_numbers(tex, plain, charmap, starts, lin, col):
@@ -1837,9 +3398,8 @@ def translate_numbers(tex, plain, charmap, starts, lin, col):
     n = starts[lin - 1]
 
     # add column number col
-    s = plain[n:]
-    i = s.find('\n')
-    if i >= 0 and col > i or i < 0 and col > len(s):
+    i = plain.find('\n', n)
+    if i >= 0 and col > i - n or i < 0 and col > len(plain) - n:
         # line is not that long
         return None
     n += col - 1
@@ -1857,9 +3417,8 @@ def translate_numbers(tex, plain, charmap, starts, lin, col):
     # get line and column in tex
     if n > len(tex):
         return None
-    s = tex[:n]
-    lin = s.count('\n') + 1
-    col = len(s) - (s.rfind('\n') + 1)
+    lin = tex.count('\n', 0, n) + 1
+    col = n - (tex.rfind('\n', 0, n) + 1)
 
     r = Aux()
     r.lin = lin
@@ -1872,6 +3431,422 @@ def translate_numbers(tex, plain, charmap, starts, lin, col):
 def get_line_starts(s):
     return list(m.start(0) for m in re.finditer(r'\n', '\n' + s))
 
+#   translation of many positions at once
+#   - translate_offsets(): list of offsets in plain (counting from zero)
+#   - translate_positions(): list of (lin, col) tuples in plain,
+#     argument starts from get_line_starts(plain)
+#   - return list with tuple (lin, col, flag) for each position,
+#     same meaning as for translate_numbers(), or None if translation
+#     was not successful
+#   - line numbers are looked up with bisect; for many positions,
+#     numpy.searchsorted() is used if NumPy is installed and charmap is
+#     a list or an array
+#
+translate_numpy_min = 10000     # minimum number of positions for NumPy
+
+def translate_offsets(tex, plain, charmap, offsets):
+    if (len(offsets) >= translate_numpy_min
+            and type(charmap) in (list, array.array)):
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy:
+            return translate_offsets_numpy(numpy, tex, charmap, offsets)
+    newlines = [m.start(0) for m in re.finditer(r'\n', tex)]
+    ret = []
+    for off in offsets:
+        if off is None or off < 0 or off >= len(charmap):
+            ret.append(None)
+            continue
+        n = charmap[off]
+        flag = n < 0
+        n = abs(n)
+        if n > len(tex):
+            ret.append(None)
+            continue
+        i = bisect.bisect_left(newlines, n)
+        col = n - (newlines[i-1] + 1 if i > 0 else 0)
+        ret.append((i + 1, max(1, col), flag))
+    return ret
+
+def translate_offsets_numpy(numpy, tex, charmap, offsets):
+    newlines = numpy.array([m.start(0) for m in re.finditer(r'\n', tex)],
+                                dtype=numpy.int64)
+    cmap = numpy.asarray(charmap, dtype=numpy.int64)
+    offs = numpy.array([-1 if o is None else o for o in offsets],
+                                dtype=numpy.int64)
+    valid = (offs >= 0) & (offs < len(cmap))
+    n = cmap[numpy.where(valid, offs, 0)] if len(cmap) else offs * 0
+    flag = n < 0
+    n = numpy.abs(n)
+    valid &= n <= len(tex)
+    i = numpy.searchsorted(newlines, n, side='left')
+    prev = numpy.where(i > 0, newlines[numpy.maximum(i - 1, 0)]
+                                    if len(newlines) else -1, -1)
+    col = numpy.maximum(n - (prev + 1), 1)
+    return [(int(a), int(b), bool(c)) if v else None
+                for (a, b, c, v) in zip(i + 1, col, flag, valid)]
+
+def translate_positions(tex, plain, charmap, starts, positions):
+    offsets = []
+    for (lin, col) in positions:
+        if lin < 1 or col < 1 or lin > len(starts):
+            offsets.append(None)
+            continue
+        n = starts[lin - 1]
+        if lin < len(starts):
+            length = starts[lin] - 1 - n
+        else:
+            length = len(plain) - n
+        offsets.append(n + col - 1 if col <= length else None)
+    return translate_offsets(tex, plain, charmap, offsets)
+
+#   LAB:SCAN
+#   fast scanners for options --unkn and --extr on option --scan
+#   - only % comments, verbatim parts and maths parts are skipped,
+#     the remaining text is scanned for macros and environments
+#   - scan_unknowns(): list of (name, count, line numbers) for macros
+#     '\\name' and environments '\\begin{name}' that are not declared,
+#     compare LAB:MACROS; result may slightly differ from option --unkn
+#     that looks at the text after all other conversions
+#   - scan_extractions(): list of (macro name, argument, line number)
+#     for the first braced argument of each macro in options.extr;
+#     the argument is returned as LaTeX text
+#   - set_declarations() is called, so the same restrictions as for
+#     tex2txt() apply
+#
+scan_skip = (r'(?P<comment>(?<!\\)%.*)'
+        + r'|(?P<verb>\\verb' + end_mac + r'\*?(?P<vdel>[^\s*]).*?(?P=vdel))'
+        + r'|(?P<verbatim>' + begin_lbr + r'verbatim(?P<vast>\*?)\}'
+                + r'(?:.|\n)*?\\end\{verbatim(?P=vast)\})')
+scan_maths = (r'(?P<maths>(?<!\\)\$\$(?:[^$\\]|\\.|\n)*\$\$'
+        + r'|(?<!\\)\$(?:[^$\\]|\\.|\n)*\$'
+        + r'|\\\((?:.|\n)*?\\\)|\\\[(?:.|\n)*?\\\])')
+
+# macros handled without declaration, compare LAB:ACCENTS and LAB:SPACE
+#
+scan_known_macros = ('begin', 'end', 'item', 'verb', 'quad', 'qquad',
+        'thinspace', 'medspace', 'thickspace',
+        'b', 'c', 'd', 'H', 'k', 'r', 'u', 'v')
+scan_known_environments = ('itemize', 'enumerate', 'verbatim', r'verbatim\*')
+
+def scan_equations():
+    names = '|'.join(e[0] for e in parms.equation_environments())
+    return (r'(?P<equation>' + begin_lbr + r'(?P<equ>' + names + r')\}'
+                + r'(?:.|\n)*?\\end\{(?P=equ)\})')
+
+def scan_unknowns(txt, options):
+    set_declarations(options)
+    macs = r'|'.join(['(?:' + name + ')' for (name, _, _, _) in
+                        parms.system_macros() + parms.project_macros()]
+                    + ['(?:' + name + ')' for name in parms.heading_macros()]
+                    + list(scan_known_macros))
+    envs = r'|'.join(['(?:' + e[0] + ')' for e in
+                        parms.equation_environments() + parms.environments()
+                        + parms.environment_begins()]
+                    + list(scan_known_environments))
+    re_known_mac = re.compile(r'(?:' + macs + r')\*?')
+    re_known_env = re.compile(r'(?:' + envs + r')')
+    expr = (scan_skip + r'|' + scan_maths + r'|' + scan_equations()
+        + r'|\\begin' + skip_space + r'\{(?P<env>' + environ_name + r')\}'
+        + r'|\\(?P<mac>' + macro_name + r')'
+        + r'|\\.')
+    starts = get_line_starts(txt)
+    found = {}
+    for m in re.finditer(expr, txt):
+        if m.group('mac'):
+            name = m.group('mac')
+            if re_known_mac.fullmatch(name):
+                continue
+            name = '\\' + name
+        elif m.group('env'):
+            name = m.group('env')
+            if re_known_env.fullmatch(name):
+                continue
+            name = '\\begin{' + name + '}'
+        else:
+            continue
+        found.setdefault(name, []).append(
+                            bisect.bisect_right(starts, m.start(0)))
+    macs = sorted(n for n in found if not n.startswith('\\begin{'))
+    envs = sorted(n for n in found if n.startswith('\\begin{'))
+    return [(n, len(found[n]), found[n]) for n in macs + envs]
+
+def scan_extractions(txt, options):
+    set_declarations(options)
+    if not options.extr_list:
+        return []
+    expr = (scan_skip + r'|' + scan_maths + r'|' + scan_equations()
+        + r'|\\(?P<mac>' + options.extr_re + r')' + end_mac
+                + r'(?:' + sp_bracketed + r')*' + sp_braced
+        + r'|\\.')
+    starts = get_line_starts(txt)
+    ret = []
+    for m in re.finditer(expr, txt):
+        if m.group('mac'):
+            # the argument is the last group, see sp_braced
+            ret.append((m.group('mac'), m.group(m.re.groups),
+                            bisect.bisect_right(starts, m.start(0))))
+    return ret
+
+#   output of scan results on options --scan and --unkn or --extr:
+#   lines with fields separated by tabulators
+#
+def write_scan(txt, options, f):
+    if options.unkn:
+        for (name, count, lines) in scan_unknowns(txt, options):
+            f.write(name + '\t' + str(count) + '\t'
+                        + ','.join(str(n) for n in lines) + '\n')
+    else:
+        for (mac, arg, lin) in scan_extractions(txt, options):
+            f.write(str(lin) + '\t\\' + mac + '\t'
+                        + ' '.join(arg.split()) + '\n')
+
+#   LAB:PROJECT
+#   expansion of file inclusions for conversion of a whole project
+#   - macros \input{x} and \include{x} (see project_inclusion_macros)
+#     are replaced by the content of file x, or x.tex if x does not end
+#     with '.tex'; file names are relative to directory of root file
+#   - inclusions in % comments and verbatim parts are not expanded
+#   - function skip(name): if True, the macro is not expanded
+#   - read_project() returns an Aux object with
+#       files: list of file names, index is file id
+#       texts: list of file contents
+#       tex: expanded LaTeX text
+#       segments: list of (start in tex, file id, start in file)
+#   - project_origin() maps a position in project.tex to
+#     (file id, position in file)
+#
+project_inclusion_macros = ('include', 'input')
+
+def inclusion_expr(macros):
+    return (scan_skip
+        + r'|\\(?:' + r'|'.join(macros) + r')' + end_mac
+                + skip_space + r'\{(?P<file>[^{}]*)\}'
+        + r'|\\.')
+
+def read_project(root, encoding, skip=None):
+    expr = inclusion_expr(project_inclusion_macros)
+    project = Aux()
+    project.files = []
+    project.texts = []
+    project.segments = []
+    parts = []
+    aux = Aux()
+    aux.length = 0
+    directory = os.path.dirname(root)
+
+    def add(fid, beg, end):
+        if end > beg:
+            project.segments.append((aux.length, fid, beg))
+            parts.append(project.texts[fid][beg:end])
+            aux.length += end - beg
+
+    def expand(fn, stack):
+        if fn in stack:
+            raise_error('problem', 'cyclic inclusion of file "' + fn
+                            + '" in file "' + stack[-1] + '"', xit=1)
+        if fn in project.files:
+            fid = project.files.index(fn)
+        else:
+            f = myopen(fn, encoding=encoding)
+            project.texts.append(f.read())
+            f.close()
+            project.files.append(fn)
+            fid = len(project.files) - 1
+        txt = project.texts[fid]
+        last = 0
+        for m in re.finditer(expr, txt):
+            if m.group('file') is None:
+                continue
+            name = inclusion_name(m.group('file'), directory)
+            if skip and skip(name):
+                continue
+            add(fid, last, m.start(0))
+            expand(name, stack + [fn])
+            last = m.end(0)
+        add(fid, last, len(txt))
+
+    expand(root, [])
+    project.tex = ''.join(parts)
+    project.starts = [s[0] for s in project.segments]
+    return project
+
+def project_origin(project, pos):
+    i = max(bisect.bisect_right(project.starts, pos) - 1, 0)
+    if not project.segments:
+        return (0, 0)
+    (beg, fid, fbeg) = project.segments[i]
+    return (fid, min(fbeg + pos - beg, len(project.texts[fid])))
+
+#   translate number array from tex2txt() for project.tex into list of
+#   (file id, number) with number of same meaning (and sign) as before
+#
+def project_numbers(project, nums, char):
+    if not char:
+        tex_starts = get_line_starts(project.tex)
+        file_starts = [get_line_starts(t) for t in project.texts]
+    ret = []
+    for n in nums:
+        sign = -1 if n < 0 else 1
+        if char:
+            (fid, pos) = project_origin(project, abs(n) - 1)
+            ret.append((fid, sign * (pos + 1)))
+            continue
+        lin = min(abs(n), len(tex_starts))
+        (fid, pos) = project_origin(project, tex_starts[lin - 1])
+        ret.append((fid, sign * bisect.bisect_right(file_starts[fid], pos)))
+    return ret
+
+#   character offsets from tex2txt() for project.tex as number array for
+#   one file of a project: positions in other files are replaced by 1
+#   (compare translate_numbers()); entries are looked up on access, thus
+#   there is no array of the length of the text for each file
+#
+class ProjectCharmap:
+    def __init__(self, project, charmap, fid):
+        self.project = project
+        self.charmap = charmap
+        self.fid = fid
+
+    def __len__(self):
+        return len(self.charmap)
+
+    def __getitem__(self, i):
+        n = self.charmap[i]
+        (fid, pos) = project_origin(self.project, abs(n) - 1)
+        if fid != self.fid:
+            return 1
+        return -(pos + 1) if n < 0 else pos + 1
+
+#   LAB:INCLUSIONS
+#   inclusion graph of a set of files, e.g., for option --include of shell.py
+#   - the files are scanned with the tokenizer of LAB:PROJECT, not by a
+#     conversion with tex2txt(); inclusions in % comments and verbatim
+#     parts are ignored, definitions and replacements are not applied
+#   - file names as in LAB:PROJECT, but relative to argument directory
+#     (default: names are taken as given)
+#   - files of one level of the breadth-first search are read and
+#     scanned by a pool of inclusion_threads threads
+#   - macros: names of inclusion macros, default project_inclusion_macros
+#   - function skip(name): if True, the file is not included
+#   - cache: name of JSON file with the inclusions of each file; an entry
+#     is used if size and modification time of the file are unchanged
+#     (the file is not read), or if the SHA256 hash of the content is
+#     unchanged (the file is not scanned)
+#   - inclusion_graph() returns an Aux object with
+#       files: list of file names in order of breadth-first search
+#       edges: dictionary file name -> list of included file names
+#       texts: dictionary file name -> file content, for files read
+#   - write_dependencies() writes the graph as Make rules
+#     'file: included files', thus a target depending on the root file
+#     is remade after change of any file included directly or indirectly
+#
+inclusion_threads = 8
+inclusion_cache_version = 1
+
+def inclusion_name(name, directory=None):
+    name = name.strip()
+    if not name.endswith('.tex'):
+        name += '.tex'
+    if directory:
+        name = os.path.join(directory, name)
+    return name
+
+def scan_inclusions(txt, directory=None, macros=project_inclusion_macros):
+    return [inclusion_name(m.group('file'), directory)
+                for m in re.finditer(inclusion_expr(macros), txt)
+                if m.group('file') is not None]
+
+def read_inclusion_cache(fn):
+    try:
+        with open(fn, encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (not isinstance(cache, dict)
+            or cache.get('version') != inclusion_cache_version):
+        return {}
+    return cache.get('files', {})
+
+def write_inclusion_cache(fn, files):
+    tmp = fn + '.' + str(os.getpid())
+    with open(tmp, mode='w', encoding='utf-8') as f:
+        json.dump({'version': inclusion_cache_version, 'files': files}, f,
+                    indent=1, sort_keys=True)
+    os.replace(tmp, fn)
+
+def inclusion_graph(roots, encoding, skip=None, cache=None, directory=None,
+                        macros=project_inclusion_macros):
+    import concurrent.futures
+    entries = read_inclusion_cache(cache) if cache else {}
+    changed = Aux()
+    changed.flag = False
+    graph = Aux()
+    graph.files = []
+    graph.edges = {}
+    graph.texts = {}
+
+    def scan(fn):
+        # return (content or None, included files, cache entry)
+        try:
+            st = os.stat(fn)
+            stamp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        except OSError:
+            stamp = {}
+        entry = entries.get(fn, {})
+        if (stamp and entry.get('macros') == list(macros)
+                and all(entry.get(k) == v for (k, v) in stamp.items())):
+            return (None, entry['includes'], entry)
+        f = myopen(fn, encoding=encoding)
+        txt = f.read()
+        f.close()
+        digest = hashlib.sha256(txt.encode('utf-8',
+                                    'surrogatepass')).hexdigest()
+        if (entry.get('sha256') == digest
+                and entry.get('macros') == list(macros)):
+            includes = entry['includes']
+        else:
+            includes = scan_inclusions(txt, directory, macros)
+        changed.flag = True
+        return (txt, includes, dict(stamp, sha256=digest, includes=includes,
+                                    macros=list(macros)))
+
+    seen = set()
+    level = list(roots)
+    with concurrent.futures.ThreadPoolExecutor(inclusion_threads) as pool:
+        while level:
+            todo = []
+            for fn in level:
+                if fn in seen or (skip and skip(fn)):
+                    continue
+                seen.add(fn)
+                todo.append(fn)
+            level = []
+            for (fn, (txt, includes, entry)) in zip(todo,
+                                                    pool.map(scan, todo)):
+                graph.files.append(fn)
+                graph.edges[fn] = [n for n in includes
+                                        if not (skip and skip(n))]
+                if txt is not None:
+                    graph.texts[fn] = txt
+                entries[fn] = entry
+                level += graph.edges[fn]
+    if cache and changed.flag:
+        write_inclusion_cache(cache, entries)
+    return graph
+
+def write_dependencies(graph, f):
+    for fn in graph.files:
+        if graph.edges[fn]:
+            f.write(make_quote(fn) + ': '
+                    + ' '.join(make_quote(n) for n in graph.edges[fn]) + '\n')
+
+def make_quote(fn):
+    return re.sub(r'([ #:$])', lambda m: '$$' if m.group(1) == '$'
+                                    else '\\' + m.group(1), fn)
+
 #   function for reading replacement file
 #
 def read_replacements(fn, encoding):
@@ -1882,6 +3857,194 @@ def read_replacements(fn, encoding):
     f.close()
     return (lines, fn)
 
+#   LAB:REPL_MATCHER
+#   compiled phrase replacements for option --repl
+#   - the lines of the file are applied one after the other; in order
+#     to save scans of the text, consecutive lines are collected in groups
+#     that can be applied in a single scan with the same result:
+#     no phrase in a group may overlap with another phrase of the group
+#     or with the replacement of a preceding phrase, and only the last
+#     phrase of a group may delete text or change a word boundary
+#   - the phrases of a group are merged into a regular expression
+#     with trie structure, the replacement is found by the matched
+#     phrase with normalized space
+#   - result: list of (regular expression, table), table is a dictionary
+#     of replacements, or a replacement template for a single line
+#   - the result is cached by file name and modification time
+#
+repl_sep = r'(?:[ \t]*\n[ \t]*|[ \t]+)'
+        # at least one space character, but stay in paragraph
+repl_matcher_cache = {}
+
+def repl_normalize(m):
+    return re.sub(r'[ \t\n]+', ' ', m.group(0))
+
+def repl_matcher(repl):
+    (lines, fname) = repl
+    try:
+        st = os.stat(fname)
+        key = (os.path.abspath(fname), st.st_mtime_ns, st.st_size)
+    except (OSError, TypeError, ValueError):
+        key = None
+    if key in repl_matcher_cache and repl_matcher_cache[key][0] == lines:
+        return repl_matcher_cache[key][1]
+    ret = repl_compile(lines, fname)
+    if key:
+        repl_matcher_cache[key] = (list(lines), ret)
+    return ret
+
+def repl_parse(lin, fname):
+    # return (phrase, replacement) with single spaces, or None
+    i = lin.find('#')
+    if i >= 0:
+        lin = lin[:i]
+    lin = lin.split()
+    i = lin.index('&') if '&' in lin else len(lin)
+    if i == 0:
+        return None
+    r = ' '.join(lin[i+1:])
+    if re.search(r'(?<!\\)%', r):
+        fatal('please use escaped \\% for replacement in file "'
+                            + fname + '"', r)
+    return (' '.join(lin[:i]), r)
+
+def repl_regex(phrase):
+    t = repl_sep.join(re.escape(w) for w in phrase.split(' '))
+                # protect e.g. '.' and '$'
+    if phrase[0].isalpha():
+        t = r'\b' + t       # require word boundary
+    if phrase[-1].isalpha():
+        t = t + r'\b'
+    return t
+
+def repl_trie_regex(phrases):
+    trie = {}
+    for p in phrases:
+        node = trie
+        for c in p:
+            node = node.setdefault(c, {})
+        node[''] = p
+    def f(node, top):
+        alts = []
+        for (c, sub) in node.items():
+            if not c:
+                alts.append(r'\b' if sub[-1].isalpha() else '')
+                continue
+            x = repl_sep if c == ' ' else re.escape(c)
+            if top and c.isalpha():
+                x = r'\b' + x
+            alts.append(x + f(sub, False))
+        if len(alts) == 1:
+            return alts[0]
+        return '(?:' + '|'.join(alts) + ')'
+    return f(trie, True)
+
+def repl_compile(lines, fname):
+    groups = []
+    def close(grp):
+        if len(grp.phrases) == 1:
+            (p, r) = grp.phrases[0]
+            groups.append((repl_regex(p),
+                            r.replace('\\', '\\\\')))    # \ ==> \\
+        elif grp.phrases:
+            groups.append((repl_trie_regex(p for (p, _) in grp.phrases),
+                            dict(grp.phrases)))
+    grp = None
+    for lin in lines:
+        x = repl_parse(lin, fname)
+        if not x:
+            continue
+        (p, r) = x
+        if grp is None or repl_conflict(grp, p):
+            if grp:
+                close(grp)
+            grp = repl_group()
+        grp.phrases.append((p, r))
+        repl_group_add(grp, p, True)
+        if r:
+            repl_group_add(grp, r, False)
+        if (not r or repl_word(p[0]) != repl_word(r[0])
+                or repl_word(p[-1]) != repl_word(r[-1])):
+            # text deleted or word boundary changed:
+            # may create new matches for following phrases
+            close(grp)
+            grp = None
+    if grp:
+        close(grp)
+    return groups
+
+def repl_word(c):
+    return bool(re.match(r'\w', c))
+
+#   a group of compatible lines
+#   - texts: phrases and replacements, separated by line breaks
+#   - parts: phrase or replacement -> start and end bound by \b
+#   - pre, suf: (proper prefix or suffix, adjacent character is word
+#     character, bound by \b at start or end) of phrases and replacements
+#   - a phrase only is bound by \b at start or end, if it begins
+#     or ends with a letter, compare repl_regex()
+#
+def repl_group():
+    grp = Aux()
+    grp.phrases = []
+    grp.texts = ''
+    grp.parts = {}
+    grp.pre = set()
+    grp.suf = set()
+    return grp
+
+def repl_group_add(grp, t, phrase):
+    beg = phrase and t[0].isalpha()
+    end = phrase and t[-1].isalpha()
+    grp.texts += t + '\n'
+    (b, e) = grp.parts.get(t, (True, True))
+    grp.parts[t] = (b and beg, e and end)
+    for i in range(1, len(t)):
+        grp.pre.add((t[:i], repl_word(t[i]), beg))
+        grp.suf.add((t[-i:], repl_word(t[-i-1]), end))
+
+#   can phrase p overlap with a phrase or replacement of the group
+#   in some text?
+#
+def repl_conflict(grp, p):
+    beg = p[0].isalpha()
+    end = p[-1].isalpha()
+    n = len(p)
+    # p inside of other text t: \b of p must be possible
+    i = grp.texts.find(p)
+    while i >= 0:
+        before = grp.texts[i-1] if i > 0 else '\n'
+        after = grp.texts[i+n]
+        if not (beg and repl_word(before) or end and repl_word(after)):
+            return True
+        i = grp.texts.find(p, i + 1)
+    for i in range(n):
+        # other text t inside of p
+        for j in range(i + 1, n + 1):
+            x = grp.parts.get(p[i:j])
+            if x and not (x[0] and i > 0 and repl_word(p[i-1])
+                            or x[1] and j < n and repl_word(p[j])):
+                return True
+        if i == 0:
+            continue
+        # end of p overlaps with start of t: p[i:] == t[:n-i]
+        word = repl_word(p[i-1])
+        for nxt in (False, True):
+            for bnd in (False, True):
+                if ((end and nxt) or (bnd and word)
+                        or (p[i:], nxt, bnd) not in grp.pre):
+                    continue
+                return True
+        # start of p overlaps with end of t: p[:n-i] == t[-(n-i):]
+        word = repl_word(p[n-i])
+        for prv in (False, True):
+            for bnd in (False, True):
+                if ((beg and prv) or (bnd and word)
+                        or (p[:n-i], prv, bnd) not in grp.suf):
+                    continue
+                return True
+    return False
+
 #   function for reading definition file
 #
 def read_definitions(fn, encoding):
@@ -1896,6 +4059,8 @@ def read_definitions(fn, encoding):
 #
 class Definitions:
     def __init__(self, code, name):
+        self.code = code            # kept for LAB:CACHE
+        self.name = name
         self.project_macros = ()
         self.system_macros = ()
         self.heading_macros = ()
@@ -1928,7 +4093,18 @@ class Options:
             defs=None,      # or set by read_definitions()
             extr=None,      # or string: comma-separated macro list
             lang=None,      # or set to language code
-            unkn=False):    # True: print unknowns
+            unkn=False,     # True: print unknowns
+            cache_dir=None, # or directory for result cache, see LAB:CACHE
+            cache_size=None,    # or maximum cache size in bytes
+            jobs=None,      # or number of processes, see LAB:PARALLEL
+            placeholders='rotate',      # or 'local', see LAB:PLACEHOLDERS
+            timeout=None,   # or seconds, see LAB:TIMEOUT
+            regex='re',     # or 'regex', see LAB:REGEX
+            atomic=False,   # True: atomic groups, see LAB:REGEX
+            profile=None,   # or function for report, see LAB:PROFILE
+            heatmap=False,  # True: cost per line, see LAB:HEATMAP
+            memory=False,   # True: memory in report, see LAB:MEMORY
+            lowmem=False):  # True: compact arrays, see LAB:LOWMEM
         self.repl = repl
         self.char = char
         self.defs = defs
@@ -1938,12 +4114,300 @@ class Options:
         self.extr = extr
         self.lang = lang
         self.unkn = unkn
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.jobs = jobs
+        self.placeholders = placeholders
+        self.timeout = timeout
+        self.regex = regex
+        self.atomic = atomic
+        self.profile = profile
+        self.heatmap = heatmap
+        self.memory = memory
+        self.lowmem = lowmem
+
+#   LAB:BATCH
+#   conversion of multiple files on option --outdir
+#   - for input file x.tex, output is written to outdir/x.tex.txt,
+#     and on option --nums ext, numbers are written to outdir/x.tex.ext
+#   - if outdir/x.tex.txt would lie outside of outdir, e.g., for x.tex
+#     given as /a/x.tex or ../x.tex, output is written to outdir/a/x.tex.txt
+#     or outdir/__/x.tex.txt, respectively
+#   - option --jobs: number of worker processes; each worker reads
+#     the files from options --defs and --repl only once
+#
+batch_text_ext = 'txt'
+batch_parent_dir = '__'     # replaces '..' in mapped paths, see below
+
+def batch_output_name(outdir, file, ext):
+    # no files outside of outdir, compare checks.sh: an absolute path or
+    # a path leaving the current directory is mapped into outdir
+    fn = os.path.normpath(os.path.join(outdir, file + '.' + ext))
+    top = os.path.abspath(outdir)
+    if os.path.commonpath([os.path.abspath(fn), top]) == top:
+        return fn
+    parts = os.path.normpath(os.path.splitdrive(file)[1]).split(os.sep)
+    parts = [batch_parent_dir if p == os.pardir else p for p in parts if p]
+    return os.path.join(outdir, *parts) + '.' + ext
+
+def batch_convert(file, options, cmdline):
+    # convert one file, return error message or None
+    try:
+        fn_txt = batch_output_name(cmdline.outdir, file, batch_text_ext)
+        f = myopen(file, encoding=cmdline.ienc)
+        txt = f.read()
+        f.close()
+        try:
+            os.makedirs(os.path.dirname(fn_txt) or os.curdir, exist_ok=True)
+        except OSError:
+            raise_error('problem', 'could not create directory for "'
+                            + fn_txt + '"', xit=1)
+        if multi_mode(cmdline):
+            outs = multi_outputs(cmdline)
+            texts = tex2txt_multi(txt, options, [e for (e, _) in outs])
+            names = [''] + [name + '.' for (_, name) in outs]
+            for (pre, (t, (lins, chars))) in zip(names, texts):
+                batch_write(cmdline, file, pre, (t, lins), cmdline.nums,
+                                False)
+                if cmdline.char_nums:
+                    batch_write(cmdline, file, pre, (t, chars),
+                                    cmdline.char_nums, True, txt=False)
+        else:
+            text = tex2txt(txt, options)
+            batch_write(cmdline, file, '', text, cmdline.nums, cmdline.char)
+    except SystemExit:
+        # message already printed by raise_error()
+        return 'error while converting file "' + file + '"'
+    except ConversionTimeout as e:
+        warning_or_error.msg = ''
+        raise_error('problem', 'file "' + file + '": ' + str(e))
+        return 'error while converting file "' + file + '"'
+    return None
+
+def batch_write(cmdline, file, pre, text, nums_ext, char, txt=True):
+    # write text to outdir/file.pre + 'txt', numbers to outdir/file.pre + ext
+    ft = fn = None
+    if txt:
+        ft = myopen(batch_output_name(cmdline.outdir, file,
+                        pre + batch_text_ext), encoding='utf-8', mode='w')
+    if nums_ext:
+        fn = open_nums(batch_output_name(cmdline.outdir, file,
+                        pre + nums_ext), cmdline)
+    write_output(text, ft, fn, char=char, nums_format=cmdline.nums_format)
+    if ft:
+        ft.close()
+    if fn:
+        fn.close()
 
-#   function to be called for stand-alone script
+batch_worker = Aux()
+
+def batch_worker_init(cmdline):
+    batch_worker.cmdline = cmdline
+    batch_worker.options = create_options(cmdline)
+
+def batch_worker_convert(file):
+    err = batch_convert(file, batch_worker.options, batch_worker.cmdline)
+    return (err, profile_take(file))
+
+def batch_main(cmdline):
+    jobs = min(cmdline.jobs or 1, len(cmdline.file))
+    if jobs <= 1:
+        options = create_options(cmdline)
+        res = [(batch_convert(f, options, cmdline), profile_take(f))
+                    for f in cmdline.file]
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(jobs, initializer=batch_worker_init,
+                                    initargs=(cmdline,)) as pool:
+            res = list(pool.imap(batch_worker_convert, cmdline.file))
+    if cmdline.profile:
+        write_profile(cmdline.profile, [r for (_, rs) in res for r in rs])
+    errs = [e for (e, _) in res if e]
+    if errs:
+        raise_error('problem', '\n'.join(errs), xit=1)
+
+#   LAB:TRANSLATE
+#   translation of numbers in the output of a checker on option --translate
+#   - the checker output is read from standard input and written to
+#     standard output, with each match of the given regular expression
+#     modified as follows
+#   - the first two unnamed groups of the expression contain line number
+#     and column number in a plain text file
+#   - without option --char: after the line number, the original line
+#     number is inserted as ' [17]'; the text till end of second group
+#     is removed, compare checks.sh
+#   - on option --char: line number and column number are replaced by
+#     original numbers in brackets, or by '[?]'
+#   - files are located as in batch mode (see LAB:BATCH): for input file
+#     x.tex, numbers from outdir/x.tex.ext on option --nums ext,
+#     and plain text from outdir/x.tex.txt
+#   - with several input files, a group (?P<file>...) has to select
+#     x.tex or outdir/x.tex.txt
+#   - each file is only read once, when it is first needed
+#
+class TranslationIndex:
+    def __init__(self, file, cmdline):
+        fn_nums = batch_output_name(cmdline.outdir, file, cmdline.nums)
+        self.nums = read_numbers(fn_nums)
+        if not cmdline.char:
+            return
+        f = myopen(file, encoding=cmdline.ienc)
+        self.tex = f.read()
+        f.close()
+        f = myopen(batch_output_name(cmdline.outdir, file, batch_text_ext),
+                        encoding='utf-8')
+        plain = f.read()
+        f.close()
+        self.plain_len = len(plain)
+        self.starts = get_line_starts(plain)
+        self.newlines = [m.start(0) for m in re.finditer(r'\n', self.tex)]
+
+    def line(self, lin):
+        # original line number, with '+' if position may be larger
+        if lin < 1 or lin > len(self.nums):
+            return None
+        n = self.nums[lin-1]
+        return str(abs(n)) + ('+' if n < 0 else '')
+
+    def position(self, lin, col):
+        # original (line, column, flag), compare translate_positions()
+        if lin < 1 or col < 1 or lin > len(self.starts):
+            return None
+        n = self.starts[lin-1]
+        end = (self.starts[lin] - 1 if lin < len(self.starts)
+                    else self.plain_len)
+        n += col - 1
+        if n >= end or n >= len(self.nums):
+            return None
+        n = self.nums[n]
+        flag = n < 0
+        n = abs(n)
+        if n > len(self.tex):
+            return None
+        i = bisect.bisect_left(self.newlines, n)
+        col = n - (self.newlines[i-1] + 1 if i > 0 else 0)
+        return (i + 1, max(1, col), flag)
+
+def translate_main(cmdline, fin, fout):
+    if not cmdline.outdir or not cmdline.nums or not cmdline.file:
+        raise_error('problem', 'option --translate needs options --outdir'
+                        + ' and --nums, and input files', xit=1)
+    try:
+        expr = re.compile(cmdline.translate)
+    except re.error as e:
+        raise_error('problem', 'bad expression for option --translate: '
+                        + str(e), xit=1)
+    groups = [i for i in range(1, expr.groups + 1)
+                    if i not in expr.groupindex.values()]
+    if len(groups) < (2 if cmdline.char else 1):
+        raise_error('problem', 'expression for option --translate needs'
+                        + ' groups for line and column numbers', xit=1)
+    if 'file' not in expr.groupindex and len(cmdline.file) > 1:
+        raise_error('problem', 'expression for option --translate needs'
+                        + ' a group (?P<file>...) for several input files',
+                        xit=1)
+
+    names = {}
+    for file in cmdline.file:
+        names[os.path.normpath(file)] = file
+        names[batch_output_name(cmdline.outdir, file, batch_text_ext)] = file
+    indexes = {}
+    def get_index(m):
+        if 'file' in expr.groupindex:
+            file = names.get(os.path.normpath(m.group('file')))
+        else:
+            file = cmdline.file[0]
+        if file is None:
+            return None
+        if file not in indexes:
+            indexes[file] = TranslationIndex(file, cmdline)
+        return indexes[file]
+
+    def f_lin(m):
+        index = get_index(m)
+        n = index.line(int(m.group(groups[0]))) if index else None
+        if n is None:
+            return m.group(0)
+        g = groups[1] if len(groups) > 1 else groups[0]
+        s = m.string
+        return (s[m.start(0):m.end(groups[0])] + ' [' + n + ']'
+                    + s[max(m.end(g), m.end(groups[0])):m.end(0)])
+
+    def f_char(m):
+        (g1, g2) = groups[:2]
+        index = get_index(m)
+        r = (index.position(int(m.group(g1)), int(m.group(g2)))
+                    if index else None)
+        if r:
+            mark = '+' if r[2] else ''
+            (s1, s2) = (str(r[0]) + mark, str(r[1]) + mark)
+        else:
+            (s1, s2) = ('?', '?')
+        s = m.string
+        return (s[m.start(0):m.start(g1)] + '[' + s1 + ']'
+                    + s[m.end(g1):m.start(g2)] + '[' + s2 + ']'
+                    + s[m.end(g2):m.end(0)])
+
+    f = f_char if cmdline.char else f_lin
+    for lin in fin:
+        fout.write(expr.sub(f, lin))
+        fout.flush()
+    for index in indexes.values():
+        index.nums.close()
+
+#   options --char-nums and --extr-out, see LAB:MULTI
+#
+def multi_mode(cmdline):
+    return bool(cmdline.char_nums or cmdline.extr_out)
+
+def multi_outputs(cmdline):
+    # list of (macro list, name) from options --extr-out
+    ret = []
+    for s in cmdline.extr_out or []:
+        (macs, _, name) = s.partition(':')
+        if not macs or not name:
+            raise_error('problem', 'bad argument "' + s
+                            + '" for option --extr-out', xit=1)
+        ret.append((macs, name))
+    return ret
+
+#   open file for numbers according to option --nums-format
+#
+def open_nums(fn, cmdline):
+    if cmdline.nums_format == 'text':
+        return myopen(fn, encoding='utf-8', mode='w')
+    return myopen(fn, encoding=None, mode='wb')
+
+#   create Options object from command line
+#
+def create_options(cmdline):
+    return Options(
+                repl=read_replacements(cmdline.repl, encoding=cmdline.ienc),
+                char=cmdline.char,
+                defs=read_definitions(cmdline.defs, encoding='utf-8'),
+                                    # the Python code should be UTF-8
+                extr=cmdline.extr,
+                lang=cmdline.lang,
+                unkn=cmdline.unkn,
+                cache_dir=None if cmdline.heatmap else cmdline.cache_dir,
+                cache_size=cmdline.cache_size * 1024 * 1024
+                                if cmdline.cache_size else None,
+                jobs=None if cmdline.outdir else cmdline.jobs,
+                placeholders=cmdline.placeholders,
+                timeout=cmdline.timeout,
+                regex=cmdline.regex,
+                atomic=cmdline.atomic,
+                profile=profile_reports.append
+                            if cmdline.profile or cmdline.heatmap else None,
+                heatmap=bool(cmdline.heatmap),
+                memory=cmdline.memory,
+                lowmem=cmdline.low_memory)
+
+#   parser for command line of stand-alone script
 #
-def main():
+def create_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument('file', nargs='?')
+    parser.add_argument('file', nargs='*')
     parser.add_argument('--repl')
     parser.add_argument('--nums')
     parser.add_argument('--char', action='store_true')
@@ -1952,39 +4416,137 @@ def main():
     parser.add_argument('--lang')
     parser.add_argument('--ienc')
     parser.add_argument('--unkn', action='store_true')
-    cmdline = parser.parse_args()
+    parser.add_argument('--cache-dir')
+    parser.add_argument('--cache-size', type=int)
+    parser.add_argument('--outdir')
+    parser.add_argument('--jobs', type=int)
+    parser.add_argument('--placeholders', choices=['rotate', 'local'],
+                            default='rotate')
+    parser.add_argument('--project', action='store_true')
+    parser.add_argument('--nums-format', choices=['text', 'bin', 'rle'],
+                            default='text')
+    parser.add_argument('--translate')
+    parser.add_argument('--char-nums')
+    parser.add_argument('--extr-out', action='append')
+    parser.add_argument('--scan', action='store_true')
+    parser.add_argument('--timeout', type=float)
+    parser.add_argument('--regex', choices=['re', 'regex'], default='re')
+    parser.add_argument('--atomic', action='store_true')
+    parser.add_argument('--profile')
+    parser.add_argument('--heatmap')
+    parser.add_argument('--memory', action='store_true')
+    parser.add_argument('--low-memory', action='store_true')
+    return parser
+
+#   does the command line require reading of standard input?
+#
+def needs_stdin(cmdline):
+    return not cmdline.file or bool(cmdline.translate)
+
+#   function to be called for stand-alone script
+#   - argv: command-line arguments, default: sys.argv[1:]
+#   - stdin, stdout: text streams replacing standard input and output,
+#     compare t2t_daemon.py
+#
+def main(argv=None, stdin=None, stdout=None):
+    cmdline = create_parser().parse_args(argv)
 
     if not cmdline.ienc:
         cmdline.ienc = 'utf-8'
 
-    options = Options(
-                repl=read_replacements(cmdline.repl, encoding=cmdline.ienc),
-                char=cmdline.char,
-                defs=read_definitions(cmdline.defs, encoding='utf-8'),
-                                    # the Python code should be UTF-8
-                extr=cmdline.extr,
-                lang=cmdline.lang,
-                unkn=cmdline.unkn)
-
-    if cmdline.file:
-        f = myopen(cmdline.file, encoding=cmdline.ienc)
+    if cmdline.project and (cmdline.outdir or len(cmdline.file) != 1):
+        raise_error('problem', 'option --project needs exactly one input file'
+                        + ' and no option --outdir', xit=1)
+    if cmdline.project and cmdline.nums_format != 'text':
+        raise_error('problem', 'option --project needs --nums-format text',
+                        xit=1)
+    if multi_mode(cmdline) and (cmdline.char or cmdline.unkn):
+        raise_error('problem', 'options --char-nums and --extr-out'
+                        + ' not possible with options --char and --unkn',
+                        xit=1)
+    if cmdline.extr_out and not cmdline.outdir:
+        raise_error('problem', 'option --extr-out needs option --outdir',
+                        xit=1)
+    if cmdline.scan and (not (cmdline.unkn or cmdline.extr)
+                            or cmdline.outdir or cmdline.nums
+                            or cmdline.project or multi_mode(cmdline)):
+        raise_error('problem', 'option --scan needs option --unkn or --extr'
+                        + ' and no options --outdir, --nums, --project,'
+                        + ' --char-nums, --extr-out', xit=1)
+    if cmdline.heatmap and (cmdline.outdir or cmdline.project
+                            or cmdline.scan or cmdline.translate):
+        raise_error('problem', 'option --heatmap not possible with options'
+                        + ' --outdir, --project, --scan, --translate', xit=1)
+    if cmdline.memory and not cmdline.profile:
+        raise_error('problem', 'option --memory needs option --profile',
+                        xit=1)
+    multi_outputs(cmdline)
+    if cmdline.translate:
+        # checker output is expected in UTF-8 like the plain text
+        fin = stdin or open(sys.stdin.fileno(), encoding='utf-8')
+        fout = stdout or open(sys.stdout.fileno(), mode='w', encoding='utf-8')
+        translate_main(cmdline, fin, fout)
+        return
+    if cmdline.outdir:
+        if not cmdline.file:
+            raise_error('problem', 'option --outdir needs input files', xit=1)
+        batch_main(cmdline)
+        return
+    if len(cmdline.file) > 1:
+        raise_error('problem', 'multiple input files need option --outdir',
+                        xit=1)
+
+    options = create_options(cmdline)
+
+    project = None
+    if cmdline.project:
+        project = read_project(cmdline.file[0], encoding=cmdline.ienc)
+        txt = project.tex
+    elif cmdline.file:
+        f = myopen(cmdline.file[0], encoding=cmdline.ienc)
         txt = f.read()
         f.close()
+    elif stdin:
+        txt = stdin.read()
     else:
         # reopen stdin in text mode: handling of '\r', proper decoding
         txt = open(sys.stdin.fileno(), encoding=cmdline.ienc).read()
 
     if cmdline.nums:
-        cmdline.nums = myopen(cmdline.nums, encoding='utf-8', mode='w')
+        cmdline.nums = open_nums(cmdline.nums, cmdline)
 
-    # ensure UTF-8 output under Windows, too
-    sout = open(sys.stdout.fileno(), mode='w', encoding='utf-8')
-    text = tex2txt(txt, options)
-    write_output(text, sout, cmdline.nums)
+    if stdout:
+        sout = stdout
+    else:
+        # ensure UTF-8 output under Windows, too
+        sout = open(sys.stdout.fileno(), mode='w', encoding='utf-8')
+    try:
+        if cmdline.scan:
+            write_scan(txt, options, sout)
+        elif multi_mode(cmdline):
+            (t, (lins, chars)) = tex2txt_multi(txt, options, [])[0]
+            write_output((t, lins), sout, cmdline.nums, project, False,
+                            cmdline.nums_format)
+            f = open_nums(cmdline.char_nums, cmdline)
+            write_output((t, chars), None, f, project, True,
+                            cmdline.nums_format)
+            f.close()
+        else:
+            text = tex2txt(txt, options)
+            write_output(text, sout, cmdline.nums, project, cmdline.char,
+                            cmdline.nums_format)
+    except ConversionTimeout as e:
+        warning_or_error.msg = ''
+        raise_error('problem', str(e), xit=1)
+    finally:
+        name = cmdline.file[0] if cmdline.file else '-'
+        if cmdline.heatmap and profile_reports:
+            write_heatmap(cmdline.heatmap, name, txt, profile_reports[-1])
+        if cmdline.profile:
+            write_profile(cmdline.profile, profile_take(name))
     if cmdline.nums:
         cmdline.nums.close()
 
 if __name__ == '__main__':
     # used as stand-alone script
     main()
-